@@ -0,0 +1,95 @@
+"""
+Benchmark the report thumbnail paths on a folder of photos.
+
+    python bench_thumbnails.py <photos_folder> [--size 162] [--repeat 3]
+
+Runs image_utils.resize_image_fixed (full decode + exif_transpose + LANCZOS)
+and image_utils.resize_image_fast (JPEG draft/reduce) over every source photo
+and prints the time per photo plus the pixel difference between the two
+thumbnails, to confirm they are visually equivalent at the embedded size.
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from PIL import Image, ImageChops, ImageStat
+
+from image_utils import resize_image_fixed, resize_image_fast, is_thumbnail
+
+
+def list_photos(folder):
+    return [
+        os.path.join(folder, f) for f in sorted(os.listdir(folder))
+        if f.lower().endswith((".jpg", ".jpeg", ".png")) and not is_thumbnail(f)
+    ]
+
+
+def time_path(fn, photos, out_dir, size, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for src in photos:
+            fn(src, os.path.join(out_dir, os.path.basename(src) + ".jpg"), size, size)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def compare(ref_dir, fast_dir, photos):
+    """Mean and max per-channel absolute difference (0-255) between the two outputs."""
+    means = []
+    worst = 0
+    for src in photos:
+        name = os.path.basename(src) + ".jpg"
+        with Image.open(os.path.join(ref_dir, name)) as a, Image.open(os.path.join(fast_dir, name)) as b:
+            if a.size != b.size:
+                return None, None
+            diff = ImageChops.difference(a.convert("RGB"), b.convert("RGB"))
+            stat = ImageStat.Stat(diff)
+            means.append(sum(stat.mean) / len(stat.mean))
+            worst = max(worst, max(hi for lo, hi in stat.extrema))
+    return (sum(means) / len(means) if means else 0.0), worst
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("folder")
+    parser.add_argument("--size", type=int, default=162)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    photos = list_photos(args.folder)
+    if not photos:
+        print(f"No photos found in {args.folder}")
+        return 1
+
+    work = tempfile.mkdtemp(prefix="bench_thumbs_")
+    try:
+        ref_dir = os.path.join(work, "fixed")
+        fast_dir = os.path.join(work, "fast")
+        os.makedirs(ref_dir)
+        os.makedirs(fast_dir)
+
+        with Image.open(photos[0]) as first:
+            print(f"{len(photos)} photos, first is {first.size[0]}x{first.size[1]}, target {args.size}x{args.size}")
+
+        t_fixed = time_path(resize_image_fixed, photos, ref_dir, args.size, args.repeat)
+        t_fast = time_path(resize_image_fast, photos, fast_dir, args.size, args.repeat)
+        mean_diff, max_diff = compare(ref_dir, fast_dir, photos)
+
+        n = len(photos)
+        print(f"resize_image_fixed: {t_fixed * 1000 / n:8.1f} ms/photo")
+        print(f"resize_image_fast : {t_fast * 1000 / n:8.1f} ms/photo  ({t_fixed / t_fast:.1f}x faster)")
+        if mean_diff is None:
+            print("Outputs differ in size!")
+            return 1
+        print(f"pixel difference  : mean {mean_diff:.2f} / 255, max {max_diff} / 255")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
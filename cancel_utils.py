@@ -0,0 +1,38 @@
+import threading
+
+
+class SyncCancelled(BaseException):
+    """
+    Raised inside a download or render once its CancelToken fires.
+    Like asyncio.CancelledError it is a BaseException, so the broad
+    `except Exception` blocks around I/O do not swallow it.
+    """
+
+
+class CancelToken:
+    """One per sync cycle; the engine cancels it on stop/pause."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason = None
+
+    def cancel(self, reason=None):
+        self.reason = reason
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def wait(self, timeout):
+        """Sleeps up to timeout seconds; returns True early if cancelled."""
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise SyncCancelled(self.reason or "cancelled")
+
+
+def check_cancelled(cancel):
+    if cancel is not None:
+        cancel.raise_if_cancelled()
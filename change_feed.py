@@ -0,0 +1,88 @@
+import threading
+import requests
+from logger import log, debug
+from config import LONGPOLL_TIMEOUT
+from site_profiles import default
+import metrics
+
+
+class ChangeListener(threading.Thread):
+    """
+    Long-polls the server's changes endpoint and calls on_change(days) as
+    soon as new files land.
+
+        GET <base_url>changes?since=<cursor>&timeout=<s>
+        -> {"cursor": n, "changes": [{"day", "kind", "name"}, ...], "reset": bool}
+
+    The first request (no cursor) returns immediately with the current
+    cursor. on_change is also called after every (re)connect or "reset",
+    since events may have been missed while disconnected. A server without
+    the endpoint (404) ends the thread; the engine then keeps polling at
+    its normal interval. on_state(connected) reports connection changes.
+    base_url defaults to the default site profile's server; name labels the
+    thread and log lines when several profiles each run a listener.
+    """
+
+    def __init__(self, on_change, on_state=None, timeout=LONGPOLL_TIMEOUT, base_url=None, name=None):
+        super().__init__(name=f"change-feed-{name}" if name else "change-feed", daemon=True)
+        self.base_url = base_url or default().base_url
+        self.label = f" ({name})" if name else ""
+        self.on_change = on_change
+        self.on_state = on_state
+        self.timeout = timeout
+        self.cursor = None
+        self.connected = False
+        self.supported = True
+        self._stopping = threading.Event()
+        self._session = requests.Session()
+
+    def stop(self):
+        self._stopping.set()
+        # abort a long-poll in progress
+        self._session.close()
+
+    def _set_connected(self, connected):
+        if connected == self.connected:
+            return
+        self.connected = connected
+        log(f"Change feed{self.label} connected" if connected
+            else f"Change feed{self.label} disconnected — falling back to polling")
+        if self.on_state:
+            self.on_state(connected)
+
+    def run(self):
+        backoff = 1
+        while not self._stopping.is_set():
+            params = {"timeout": self.timeout}
+            if self.cursor is not None:
+                params["since"] = self.cursor
+            try:
+                res = self._session.get(self.base_url + "changes", params=params, timeout=self.timeout + 10)
+                if res.status_code == 404:
+                    log(f"Server{self.label} has no changes endpoint — staying on interval polling")
+                    self.supported = False
+                    self._set_connected(False)
+                    return
+                res.raise_for_status()
+                body = res.json()
+            except Exception as e:
+                if self._stopping.is_set():
+                    break
+                debug(f"Change feed{self.label} request failed: {e}")
+                self._set_connected(False)
+                self._stopping.wait(backoff)
+                backoff = min(backoff * 2, 60)
+                continue
+
+            backoff = 1
+            reconnected = not self.connected
+            self.cursor = body.get("cursor", self.cursor)
+            self._set_connected(True)
+            changes = body.get("changes") or []
+            if changes or reconnected or body.get("reset"):
+                days = sorted({c.get("day") for c in changes if c.get("day")})
+                if changes:
+                    metrics.inc("sync_push_wakeups_total")
+                    debug(f"Change feed{self.label}: {len(changes)} new files for {days}")
+                self.on_change(days)
+        self._set_connected(False)
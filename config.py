@@ -6,7 +6,8 @@ APPDATA_DIR = os.path.join(os.getenv("APPDATA"), APP_NAME)
 os.makedirs(APPDATA_DIR, exist_ok=True)
 
 
-BASE_URL = "https://birdportal.pythonanywhere.com/records/"
+# SYNC_BASE_URL points the app at another server, e.g. standin_server.py for offline tests
+BASE_URL = os.environ.get("SYNC_BASE_URL", "https://birdportal.pythonanywhere.com/records/")
 
 
 SYNC_DIR = os.path.join(APPDATA_DIR, "sync")
@@ -14,7 +15,14 @@ LOCAL_DIR = os.path.join(SYNC_DIR, "records")
 os.makedirs(LOCAL_DIR, exist_ok=True)
 
 DOWNLOADED_DB = os.path.join(SYNC_DIR, "downloaded_files.json")
+RENDER_STATE_DIR = os.path.join(SYNC_DIR, "render_state")
+os.makedirs(RENDER_STATE_DIR, exist_ok=True)
 LOG_FILE = os.path.join(APPDATA_DIR, "sync.log")
+LOG_LEVEL = os.environ.get("SYNC_LOG_LEVEL", "INFO")
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+LOG_ROTATE_DAILY = True
+LOG_RING_SIZE = 500
 SETTINGS_FILE = os.path.join(APPDATA_DIR, "settings.json")
 
 DEFAULT_OUTPUT_DIR = os.path.join(LOCAL_DIR, "reports")
@@ -24,5 +32,83 @@ os.makedirs(OUTPUT_DIR, exist_ok=True)
 TEMPLATE_ORIG = os.path.join(os.path.dirname(__file__), "template.docx")
 
 LOOP_INTERVAL = 10
+
+# push channel (change_feed.py): long-poll the server's changes endpoint and
+# sync as soon as files land; interval polling relaxes to PUSH_FALLBACK_INTERVAL
+# while the feed is connected
+PUSH_CHANGES = True
+LONGPOLL_TIMEOUT = 25
+PUSH_FALLBACK_INTERVAL = 300
+
+# localhost status/control endpoint (status_server.py); port 0 disables it.
+# POST actions need the per-install token in STATUS_TOKEN_FILE (created on first start)
+STATUS_HOST = "127.0.0.1"
+STATUS_PORT = 8765
+STATUS_TOKEN_FILE = os.path.join(APPDATA_DIR, "status_token")
 MEDIA_EXT = ".png"
+# decode photos at reduced scale when building report thumbnails (see image_utils.resize_image_fast)
+FAST_THUMBNAILS = True
 EMU_PER_PIXEL = 9525
+
+# Thumbnail-first photo sync: photos are first fetched as ?size=THUMBNAIL_SIZE
+# server thumbnails (enough for the report); originals go to <day>/originals/.
+# FETCH_ORIGINALS: "background" (a few per sync cycle), "on_finalize" (when
+# the day's report is finalized) or "never".
+SERVER_THUMBNAILS = True
+THUMBNAIL_SIZE = 162
+FETCH_ORIGINALS = "background"
+ORIGINALS_PER_CYCLE = 20
+
+# download_queue: a queued file gains one priority band per this many seconds waited
+DOWNLOAD_AGING_SECONDS = 60
+# while downloading, re-list today's folder this often so new uploads jump the queue
+RELIST_TODAY_SECONDS = 30
+# verified files deleted from the server per delete_files request
+CLEANUP_BATCH_SIZE = 50
+CLEANUP_RETRY_SECONDS = 600
+
+# downloaded records are ingested into <day>/records.jsonl (record_store);
+# True also keeps the original data/*.json files for audit
+KEEP_RAW_RECORDS = False
+
+# retention_utils: finalized days are packed into ARCHIVE_DIR/<day>.zip after
+# ARCHIVE_AFTER_DAYS days, or sooner while SYNC_DIR is over DISK_BUDGET_MB (0 = no budget)
+ARCHIVE_DIR = os.path.join(SYNC_DIR, "archive")
+ARCHIVE_AFTER_DAYS = 7
+ARCHIVE_JPEG_QUALITY = 80
+DISK_BUDGET_MB = 2048
+RETENTION_INTERVAL = 3600
+# temp render files older than this are treated as left behind by a crash
+TEMP_SWEEP_MIN_AGE = 600
+
+# report size: photos over REPORT_MAX_IMAGE_PX or JPEGs over REPORT_JPEG_MAX_KB are
+# embedded as JPEG at REPORT_JPEG_QUALITY; a full render over REPORT_SIZE_BUDGET_KB
+# re-encodes its photos through REPORT_BUDGET_STEPS [(quality, scale), ...] (0 = no budget)
+REPORT_JPEG_QUALITY = 80
+REPORT_MAX_IMAGE_PX = 480
+REPORT_JPEG_MAX_KB = 64
+REPORT_SIZE_BUDGET_KB = 4096
+REPORT_BUDGET_STEPS = [(70, 1.0), (55, 0.8), (40, 0.6)]
+# render word/*.xml paragraph by paragraph (xml_stream_utils) instead of loading
+# the template into python-docx; peak memory then stays flat with document size
+STREAMING_RENDER = True
+
+# site_profiles: extra sites served by this install (see site_profiles.py)
+PROFILES_FILE = os.path.join(APPDATA_DIR, "profiles.json")
+# with several profiles, one profile's downloads yield to the next after this long
+PROFILE_TURN_SECONDS = 120
+# connections kept per host in the HTTP pool shared by all profiles
+HTTP_POOL_SIZE = 8
+
+# local_watch: records/photos dropped into <day>/data or <day>/photos by hand are
+# ingested and rendered once the folder is quiet for LOCAL_WATCH_DEBOUNCE seconds;
+# LOCAL_WATCH_POLL is the scan interval when ReadDirectoryChangesW is unavailable
+LOCAL_WATCH = True
+LOCAL_WATCH_POLL = 2
+LOCAL_WATCH_DEBOUNCE = 1.0
+
+# notify_utils: a burst on one topic within NOTIFY_COALESCE_SECONDS is one toast, a
+# topic is shown at most every NOTIFY_MIN_INTERVAL seconds, NOTIFY_QUEUE_SIZE topics wait
+NOTIFY_QUEUE_SIZE = 20
+NOTIFY_COALESCE_SECONDS = 2.0
+NOTIFY_MIN_INTERVAL = 10
@@ -1,25 +1,10 @@
 
 import os
-import json
-from config import LOCAL_DIR
-from logger import log
+from record_store import load_records
+from site_profiles import current
 
 def load_day_records_local(date_str):
-    data_folder = os.path.join(LOCAL_DIR, date_str, "data")
-    records = []
-    if not os.path.exists(data_folder):
-        return records
-    for fname in sorted(os.listdir(data_folder)):
-        if not fname.lower().endswith(".json"):
-            continue
-        try:
-            with open(os.path.join(data_folder, fname), "r", encoding="utf-8") as f:
-                rec = json.load(f)
-                rec["_filename"] = fname
-                records.append(rec)
-        except Exception as e:
-            log(f"Could not read {fname}: {e}")
-    return records
+    return load_records(date_str)
 
 def find_shift_sign_photos(date_str):
     result = {
@@ -29,7 +14,7 @@ def find_shift_sign_photos(date_str):
         "shift_2_signout": None
     }
     records = load_day_records_local(date_str)
-    photo_dir = os.path.join(__import__('config').LOCAL_DIR, date_str, "photos")
+    photo_dir = os.path.join(current().local_dir, date_str, "photos")
     for r in records:
         r_type = r.get("type")
         shift = str(r.get("shift", ""))
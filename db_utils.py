@@ -1,20 +1,45 @@
 import os
 import json
-from config import DOWNLOADED_DB
 from logger import log
+from site_profiles import current
 
 def load_download_db():
-    if not os.path.exists(DOWNLOADED_DB):
+    path = current().downloaded_db
+    if not os.path.exists(path):
         return {}
     try:
-        return json.load(open(DOWNLOADED_DB, encoding="utf-8"))
+        return json.load(open(path, encoding="utf-8"))
     except Exception as e:
         log(f"Failed loading download DB: {e}")
         return {}
 
 def save_download_db(db):
+    # written aside and swapped in, so a crash never leaves half a db
+    path = current().downloaded_db
     try:
-        with open(DOWNLOADED_DB, "w", encoding="utf-8") as f:
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
             json.dump(db, f, indent=4)
+        os.replace(path + ".tmp", path)
     except Exception as e:
         log(f"Failed saving DB: {e}")
+
+def render_state_path(day):
+    return os.path.join(current().render_state_dir, f"{day}.json")
+
+def load_render_state(day):
+    path = render_state_path(day)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        log(f"Failed loading render state for {day}: {e}")
+        return {}
+
+def save_render_state(day, state):
+    try:
+        with open(render_state_path(day), "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+    except Exception as e:
+        log(f"Failed saving render state for {day}: {e}")
@@ -1,20 +1,31 @@
 import os
-import shutil
-import uuid
+import io
 import json
+import hashlib
 import zipfile
 import re
+import time
 from datetime import datetime
 from docx import Document
 from docx.shared import Pt, Inches
 from docx.oxml.ns import qn
 
-from logger import log
-from config import TEMPLATE_ORIG, OUTPUT_DIR, LOCAL_DIR
+from logger import log, debug, is_enabled, DEBUG
+from site_profiles import current
 from data_utils import find_shift_sign_photos, load_day_records_local
-from image_utils import resize_image_fixed
-from xml_utils import inject_images_into_docx, ensure_dir
-from db_utils import save_download_db, load_download_db
+from image_utils import make_thumbnail, thumbnail_path, is_thumbnail
+from xml_utils import inject_images_into_docx, inject_images_into_members, ensure_dir, normalize_docx_zip
+from xml_utils import read_docx_members, pack_docx_members, placeholders_in_paragraphs
+from xml_stream_utils import stream_render_docx
+from mem_utils import PeakRss
+from config import STREAMING_RENDER
+from db_utils import save_download_db, load_download_db, load_render_state, save_render_state
+from fingerprint_utils import compute_render_fingerprint
+from slot_utils import index_slots, patch_slots
+from image_prep import ThumbnailBatch
+from report_size_utils import optimize_report
+from cancel_utils import SyncCancelled, check_cancelled
+import metrics
 
 
 
@@ -29,35 +40,46 @@ def inline_replace_paragraph(paragraph, target, replacement):
     return True
 
 
-def replace_text_placeholders(doc, mapping):
-    for p in doc.paragraphs:
-        for key, val in mapping.items():
-            if key in p.text:
-                inline_replace_paragraph(p, key, val)
-
-    for table in doc.tables:
+def table_paragraphs(tables, cancel=None):
+    """(paragraph, cell) for every cell paragraph of tables, nested tables included."""
+    for table in tables:
         for row in table.rows:
+            check_cancelled(cancel)
             for cell in row.cells:
                 for p in cell.paragraphs:
-                    for key, val in mapping.items():
-                        if key in p.text:
-                            inline_replace_paragraph(p, key, val)
+                    yield p, cell
+                yield from table_paragraphs(cell.tables, cancel)
+
+
+def _replace_in_paragraph(paragraph, mapping):
+    # paragraph.text is an XPath walk; read it again only after a replacement
+    text = paragraph.text
+    for key, val in mapping.items():
+        if key in text:
+            inline_replace_paragraph(paragraph, key, val)
+            text = paragraph.text
+
+
+def replace_text_placeholders(doc, mapping, cancel=None):
+    for p in doc.paragraphs:
+        check_cancelled(cancel)
+        _replace_in_paragraph(p, mapping)
+
+    for p, _ in table_paragraphs(doc.tables, cancel):
+        _replace_in_paragraph(p, mapping)
 
     try:
         for section in doc.sections:
             for p in section.header.paragraphs:
-                for key, val in mapping.items():
-                    if key in p.text:
-                        inline_replace_paragraph(p, key, val)
+                _replace_in_paragraph(p, mapping)
             for p in section.footer.paragraphs:
-                for key, val in mapping.items():
-                    if key in p.text:
-                        inline_replace_paragraph(p, key, val)
+                _replace_in_paragraph(p, mapping)
     except Exception:
         pass
 
 
 def insert_image_at_placeholder(doc, placeholder, image_path, width_inches=2.8):
+    # image_path may also be the image bytes
 
     width = Inches(width_inches)
     inserted = 0
@@ -80,7 +102,7 @@ def insert_image_at_placeholder(doc, placeholder, image_path, width_inches=2.8):
                     r.text = ""
                 p = paragraph
             run = p.add_run()
-            run.add_picture(image_path, width=width)
+            run.add_picture(io.BytesIO(image_path) if isinstance(image_path, bytes) else image_path, width=width)
             inserted += 1
         except Exception as e:
             log(f"Image insert failed at {placeholder}: {e}")
@@ -89,12 +111,9 @@ def insert_image_at_placeholder(doc, placeholder, image_path, width_inches=2.8):
         if placeholder in clean_text(p.text):
             clear_and_insert(p)
 
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for p in cell.paragraphs:
-                    if placeholder in clean_text(p.text):
-                        clear_and_insert(p, cell)
+    for p, cell in table_paragraphs(doc.tables):
+        if placeholder in clean_text(p.text):
+            clear_and_insert(p, cell)
 
     try:
         for section in doc.sections:
@@ -119,17 +138,14 @@ def force_arial(doc, size_pt=11):
                 run._element.rPr.rFonts.set(qn("w:eastAsia"), "Arial")
             except Exception:
                 pass
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for p in cell.paragraphs:
-                    for run in p.runs:
-                        try:
-                            run.font.name = "Arial"
-                            run.font.size = Pt(size_pt)
-                            run._element.rPr.rFonts.set(qn("w:eastAsia"), "Arial")
-                        except Exception:
-                            pass
+    for p, _ in table_paragraphs(doc.tables):
+        for run in p.runs:
+            try:
+                run.font.name = "Arial"
+                run.font.size = Pt(size_pt)
+                run._element.rPr.rFonts.set(qn("w:eastAsia"), "Arial")
+            except Exception:
+                pass
 
 
 def safe_save_docx(base_path):
@@ -153,10 +169,11 @@ def safe_save_docx(base_path):
 
 
 def find_placeholders_in_docx_xml(docx_path, placeholders):
-
+    # docx_path may also be the docx bytes
     counts = {p: 0 for p in placeholders}
+    source = io.BytesIO(docx_path) if isinstance(docx_path, bytes) else docx_path
     try:
-        with zipfile.ZipFile(docx_path, 'r') as z:
+        with zipfile.ZipFile(source, 'r') as z:
             parts = [
                 'word/document.xml',
                 'word/header1.xml', 'word/footer1.xml',
@@ -180,15 +197,19 @@ def find_placeholders_in_docx_xml(docx_path, placeholders):
                     except re.error:
                         pass
     except Exception as e:
-        log(f"find_placeholders_in_docx_xml: failed to inspect {docx_path}: {e}")
+        log(f"find_placeholders_in_docx_xml: failed to inspect {docx_path if isinstance(docx_path, str) else 'docx'}: {e}")
     return counts
 
 
 
 
-def build_pic_placeholders_map(date_str, desired_w=162, desired_h=162):
+def build_pic_placeholders_map(date_str, desired_w=162, desired_h=162, resize_fn=make_thumbnail):
+    """
+    Map (pic_NNN) placeholders to photos of the day. With resize_fn=None the
+    source photos are returned as-is and no thumbnails are written.
+    """
 
-    photos_dir = os.path.join(LOCAL_DIR, date_str, "photos")
+    photos_dir = os.path.join(current().local_dir, date_str, "photos")
     mapping = {}
     if not os.path.exists(photos_dir):
         return mapping
@@ -196,6 +217,9 @@ def build_pic_placeholders_map(date_str, desired_w=162, desired_h=162):
     for fname in sorted(os.listdir(photos_dir)):
         if not fname.lower().endswith((".jpg", ".jpeg", ".png")):
             continue
+        # skip our own thumbnails, otherwise every render adds another _162 generation
+        if is_thumbnail(fname):
+            continue
         src = os.path.join(photos_dir, fname)
 
         name_root = os.path.splitext(fname)[0]
@@ -206,10 +230,15 @@ def build_pic_placeholders_map(date_str, desired_w=162, desired_h=162):
         placeholder1 = f"(pic_{digits})"
         placeholder2 = f"(pic_{int(digits)})" if digits.isdigit() else placeholder1
 
-        base, ext = os.path.splitext(src)
-        resized_path = base + "_162.jpg"
+        if resize_fn is None:
+            mapping[placeholder1] = src
+            if placeholder2 != placeholder1:
+                mapping[placeholder2] = src
+            continue
+
+        resized_path = thumbnail_path(src)
         try:
-            resize_image_fixed(src, resized_path, desired_w, desired_h)
+            resize_fn(src, resized_path, desired_w, desired_h)
             mapping[placeholder1] = resized_path
             if placeholder2 != placeholder1:
                 mapping[placeholder2] = resized_path
@@ -361,34 +390,27 @@ def process_record_updates(date_str, local_dir, resize_fn, logger):
     Reads local JSON records for date_str and builds:
       - text_map: mapping placeholder -> string value (per-cage counts and totals)
       - pic_map: mapping pic placeholders like (pic_613) -> resized image path
+        (the source photo path when resize_fn is None)
     """
     text_map = {}
     pic_map = {}
+    # the active site profile may bring its own registry
+    site = current()
+    places_cages = site.places or PLACES_CAGES
+    total_placeholders = site.total_placeholders() or PLACE_TOTAL_PLACEHOLDERS
 
-    data_folder = os.path.join(local_dir, date_str, "data")
     photos_folder = os.path.join(local_dir, date_str, "photos")
 
-    records = []
-    if os.path.exists(data_folder):
-        for fname in sorted(os.listdir(data_folder)):
-            if not fname.lower().endswith(".json"):
-                continue
-            try:
-                with open(os.path.join(data_folder, fname), "r", encoding="utf-8") as f:
-                    r = json.load(f)
-                    r["_filename"] = fname
-                    records.append(r)
-            except Exception as e:
-                logger(f"process_record_updates: failed reading {fname}: {e}")
+    records = load_day_records_local(date_str)
 
     
-    for place, cages in PLACES_CAGES.items():
+    for place, cages in places_cages.items():
         for c in cages:
             text_map[f"(1c{c})"] = "0"
             text_map[f"(2c{c})"] = "0"
 
     
-    for key, tpl in PLACE_TOTAL_PLACEHOLDERS.items():
+    for key, tpl in total_placeholders.items():
         tot_ph, my_ph, loc_ph = tpl
         text_map[tot_ph] = "0"
         text_map[my_ph] = "0"
@@ -400,25 +422,31 @@ def process_record_updates(date_str, local_dir, resize_fn, logger):
             "myna_shift1": 0, "local_shift1": 0, "total_shift1": 0,
             "myna_shift2": 0, "local_shift2": 0, "total_shift2": 0
         }
-        for place in PLACES_CAGES.keys()
+        for place in places_cages.keys()
     }
 
     
+    # per-record tracing is only formatted when DEBUG is enabled
+    trace = is_enabled(DEBUG)
+
     for r in records:
         if r.get("type") != "record_update":
             continue
 
-        logger(f"[DEBUG] Loaded JSON record: {json.dumps(r, indent=2)}")
+        if trace:
+            debug(f"Loaded JSON record: {json.dumps(r, indent=2)}")
 
         shift = str(r.get("shift", "1")).strip()
 
         try:
             cage_no = int(r.get("cage_number"))
         except:
-            logger("[DEBUG] Invalid cage number")
+            if trace:
+                debug("Invalid cage number")
             continue
 
-        logger(f"[DEBUG] Extracted cage number: {cage_no} for shift {shift}")
+        if trace:
+            debug(f"Extracted cage number: {cage_no} for shift {shift}")
 
         try:
             myna = int(str(r.get("myna_captured") or "0"))
@@ -432,23 +460,23 @@ def process_record_updates(date_str, local_dir, resize_fn, logger):
         total = myna + local
 
         ph = f"({shift}c{cage_no})"
-        logger(f"[DEBUG] Placeholder for this cage: {ph}")
-
-        if ph in text_map:
-            logger(f"[DEBUG] Placeholder FOUND in text_map: {ph}")
-        else:
-            logger(f"[DEBUG] Placeholder NOT FOUND in text_map: {ph}")
+        if trace:
+            debug(f"Placeholder for this cage: {ph}")
+            found = "FOUND" if ph in text_map else "NOT FOUND"
+            debug(f"Placeholder {found} in text_map: {ph}")
 
         text_map[ph] = f"{myna}M,{local}L"
-        logger(f"[DEBUG] Updated placeholder {ph} -> {myna}M,{local}L")
+        if trace:
+            debug(f"Updated placeholder {ph} -> {myna}M,{local}L")
 
         opp_shift = "1" if shift == "2" else "2"
         opp_ph = f"({opp_shift}c{cage_no})"
         text_map[opp_ph] = "0"
-        logger(f"[DEBUG] Zeroed opposite shift placeholder: {opp_ph}")
+        if trace:
+            debug(f"Zeroed opposite shift placeholder: {opp_ph}")
 
         
-        for place, cages in PLACES_CAGES.items():
+        for place, cages in places_cages.items():
             if cage_no in cages:
                 if shift == "1":
                     place_agg[place]["myna_shift1"] += myna
@@ -464,9 +492,10 @@ def process_record_updates(date_str, local_dir, resize_fn, logger):
         photo = r.get("photo")
         if photo:
             src = os.path.join(photos_folder, photo)
-            if os.path.exists(src):
-                base, ext = os.path.splitext(src)
-                dst = base + "_162.jpg"
+            if os.path.exists(src) and resize_fn is None:
+                pic_map[f"(pic_{cage_no})"] = src
+            elif os.path.exists(src):
+                dst = thumbnail_path(src)
                 try:
                     resize_fn(src, dst, 162, 162)
                     pic_map[f"(pic_{cage_no})"] = dst
@@ -478,10 +507,10 @@ def process_record_updates(date_str, local_dir, resize_fn, logger):
     for place, agg in place_agg.items():
         for shift in ("1", "2"):
             key = f"{place}_{shift}"
-            if key not in PLACE_TOTAL_PLACEHOLDERS:
+            if key not in total_placeholders:
                 continue
 
-            total_ph, myna_ph, local_ph = PLACE_TOTAL_PLACEHOLDERS[key]
+            total_ph, myna_ph, local_ph = total_placeholders[key]
 
             if shift == "1":
                 t = agg["total_shift1"]
@@ -502,26 +531,290 @@ def process_record_updates(date_str, local_dir, resize_fn, logger):
 
 
 
-def create_partial_report_with_shift_signs(date_str):
-    log(f"Creating partial report for {date_str}")
+def prepare_thumbnails(placeholder_source_map, width=162, height=162):
+    """
+    Resize every distinct source photo once (on the image pool) and return
+    placeholder -> thumbnail path (the source itself if resizing fails, None
+    if the source is missing).
+    """
+    return ThumbnailBatch(placeholder_source_map, width, height).result_map()
 
-    
-    sign_map = find_shift_sign_photos(date_str)
 
-    
+# -------------------------
+# Pure render
+# -------------------------
+class DayModel:
+    """
+    Everything one report render needs, already resolved: the day, the text
+    placeholder values derived from its records and the image bytes per
+    placeholder (None for a missing photo). No paths, no profile.
+    """
+
+    def __init__(self, date_str, text, images):
+        self.date = date_str
+        self.text = dict(text)
+        self.images = dict(images)
+
+    def mapping(self):
+        """Text replacements for the python-docx pass (date keys included)."""
+        human_date = datetime.strptime(self.date, "%Y-%m-%d").strftime("%d %B %Y")
+        mapping = {"(date)": self.date, "(date_with_month)": human_date}
+        mapping.update(self.text)
+        return mapping
+
+    def xml_mapping(self):
+        """String replacements for the raw XML: record values also replace their bare variants."""
+        mapping = self.mapping()
+        for k, v in self.text.items():
+            if k.startswith("(") and k.endswith(")"):
+                mapping[k[1:-1]] = v
+        return mapping
+
+
+class CompiledTemplate:
+    """A report template loaded into memory once; renders never touch the file."""
+
+    def __init__(self, data):
+        self.data = data
+        self.hash = hashlib.sha256(data).hexdigest()
+
+
+_compiled_templates = {}
+
+
+def compile_template(template_path):
+    """CompiledTemplate of template_path, cached until the file changes."""
+    st = os.stat(template_path)
+    key = (os.path.abspath(template_path), st.st_mtime_ns, st.st_size)
+    compiled = _compiled_templates.get(key)
+    if compiled is None:
+        with open(template_path, "rb") as f:
+            compiled = CompiledTemplate(f.read())
+        _compiled_templates.clear()
+        _compiled_templates[key] = compiled
+    return compiled
+
+
+def render_docx(model, template, out=None, cancel=None, streaming=False):
+    """
+    Renders model into template and returns the docx bytes (also written to
+    the stream out when given). Uses no globals and no temporary files, so it
+    can run in a worker process, and the same model and template always give
+    byte-identical output. With streaming=True the XML parts are streamed
+    (render_docx_streaming) instead of loaded into python-docx; with out
+    given nothing is returned then, so the report is never held in memory.
+    Failing to open the template or to run the text pass raises; later
+    passes fall back like the file-based render did.
+    """
+    if streaming:
+        target = out if out is not None else io.BytesIO()
+        render_docx_streaming(model, template, target, cancel)
+        return None if out is not None else target.getvalue()
+
+    mapping = model.mapping()
+
+    doc = Document(io.BytesIO(template.data))
+    replace_text_placeholders(doc, mapping, cancel)
+    buf = io.BytesIO()
+    doc.save(buf)
+    text_docx = buf.getvalue()
+    log(f"Applied {len(mapping)} visible text replacements via python-docx")
+
     try:
-        doc = Document(TEMPLATE_ORIG)
+        expected_phs = sorted({k for k in mapping if k.startswith("(") and k.endswith(")")})
+        xml_counts = find_placeholders_in_docx_xml(text_docx, expected_phs)
+        missing = [p for p, c in xml_counts.items() if c == 0]
+        present = [p for p, c in xml_counts.items() if c > 0]
+        log(f"XML placeholder scan: {len(present)} found, {len(missing)} missing (checked {len(expected_phs)})")
+        if missing:
+            log(f"Missing placeholders (sample up to 30): {missing[:30]}")
+    except Exception as e:
+        log(f"XML placeholder scan failed: {e}")
+
+    mapping_for_xml = model.xml_mapping()
+    log(f"XML text replacements prepared: {len(mapping_for_xml)} entries (includes non-parenthesized variants)")
+
+    check_cancelled(cancel)
+    try:
+        members = inject_images_into_members(read_docx_members(text_docx), model.images, mapping_for_xml)
+        data = pack_docx_members(members)
+    except Exception as e:
+        log(f"XML injection failed: {e}")
+        data = text_docx
+
+    try:
+        doc_final = Document(io.BytesIO(data))
+        # each python-docx scan walks the whole document; only scan for what is left
+        remaining = placeholders_in_paragraphs(
+            read_docx_members(data), [p for p, img in model.images.items() if img and "(" in p]
+        )
+        for placeholder, img_data in model.images.items():
+            if placeholder in remaining:
+                inserted = insert_image_at_placeholder(doc_final, placeholder, img_data, width_inches=1.8)
+                if inserted:
+                    log(f"Fallback inserted {placeholder} via python-docx (count={inserted})")
+        force_arial(doc_final)
+        buf = io.BytesIO()
+        doc_final.save(buf)
+        data = buf.getvalue()
     except Exception as e:
-        log(f"Failed to open template {TEMPLATE_ORIG}: {e}")
+        log(f"Post python-docx formatting failed: {e}")
+
+    # python-docx stamps zip entries with the current time
+    data = pack_docx_members(read_docx_members(data))
+    if out is not None:
+        out.write(data)
+    return data
+
+
+def render_docx_streaming(model, template, out, cancel=None):
+    """
+    render_docx() without python-docx: word/*.xml parts are streamed paragraph
+    by paragraph from the template into out (a path or writable stream), so
+    peak memory does not grow with the size of document.xml.
+    """
+    mapping = model.mapping()
+    renderer = stream_render_docx(io.BytesIO(template.data), out, mapping, model.xml_mapping(), model.images, cancel)
+    log(f"Streamed render: {len(mapping)} text replacements over {renderer.paragraphs} paragraphs")
+
+
+def _read_bytes(path, label):
+    if not path:
+        return None
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError as e:
+        log(f"Could not read image for {label}: {e}")
         return None
 
-    
-    human_date = datetime.strptime(date_str, "%Y-%m-%d").strftime("%d %B %Y")
 
-    
+def read_thumbnail_bytes(batch, cancel=None):
+    """
+    placeholder -> image bytes of a ThumbnailBatch. Each thumbnail is read as
+    its job finishes, so reading overlaps the resizing still running on the
+    pool and a cancel is noticed between photos. A DayModel holds every image
+    before the render starts, so the render itself no longer overlaps the
+    resizing as the python-docx text pass once did.
+    """
+    data = {}
+    for src, thumb in batch.as_completed():
+        check_cancelled(cancel)
+        data[thumb] = _read_bytes(thumb, os.path.basename(src))
+    images = {}
+    for placeholder, thumb in batch.result_map().items():
+        if thumb and thumb not in data:
+            # reused thumbnails are not yielded by as_completed()
+            data[thumb] = _read_bytes(thumb, placeholder)
+        images[placeholder] = data.get(thumb) if thumb else None
+    return images
+
+
+def patch_previous_partial(date_str, render_state, inputs, mapping, placeholder_source_map):
+    """
+    Incremental render: splice changed text values into the slots of the
+    previous partial and inject only photos that were missing last time.
+    Returns (path, slot_map), or None when a full rebuild is needed.
+    """
+    slot_map = render_state.get("slots")
+    prev_output = render_state.get("output")
+    if not slot_map or not prev_output or not os.path.exists(prev_output):
+        return None
+    if slot_map.get("template_hash") != inputs["template"]:
+        log("Template changed since the last render — full rebuild.")
+        return None
+
+    old_text = render_state.get("text", {})
+    new_text = inputs["text"]
+    changed_keys = sorted(
+        k for k in set(old_text) | set(new_text) if old_text.get(k) != new_text.get(k)
+    )
+
+    old_images = render_state.get("images", {})
+    new_images = {}
+    for placeholder in set(old_images) | set(inputs["images"]):
+        before = old_images.get(placeholder)
+        after = inputs["images"].get(placeholder)
+        if before == after:
+            continue
+        if before is None and after is not None:
+            new_images[placeholder] = placeholder_source_map.get(placeholder)
+            continue
+        log(f"Image for {placeholder} changed or disappeared — full rebuild.")
+        return None
+
+    final_docx = safe_save_docx(os.path.join(current().output_dir, f"Daily_Report_{date_str}_partial.docx"))
+    tmp_docx = final_docx + ".patch"
+    try:
+        new_slot_map = patch_slots(prev_output, tmp_docx, slot_map, changed_keys, mapping)
+        if new_slot_map is None:
+            return None
+
+        if new_images:
+            image_map = prepare_thumbnails(new_images, 162, 162)
+            inject_images_into_docx(tmp_docx, tmp_docx, image_map)
+            # also sees placeholders split across runs, which the XML scan misses
+            leftover = placeholders_in_paragraphs(read_docx_members(tmp_docx), list(image_map))
+            if leftover:
+                log(f"Incremental image injection left {sorted(leftover)} — full rebuild.")
+                return None
+            # the new drawings moved the byte ranges
+            new_slot_map = index_slots(tmp_docx, current().template, mapping)
+
+        os.replace(tmp_docx, final_docx)
+    except Exception as e:
+        log(f"Incremental render failed, falling back to full rebuild: {e}")
+        return None
+    finally:
+        if os.path.exists(tmp_docx):
+            try:
+                os.remove(tmp_docx)
+            except Exception:
+                pass
+
+    if new_images:
+        try:
+            # photos just embedded already follow the image policy; no second lossy pass
+            optimize_report(final_docx, budget_kb=None)
+        except Exception as e:
+            log(f"Report size optimization failed for {final_docx}: {e}")
+    log(f"Incremental render: {len(changed_keys)} text changes, {len(new_images)} new images -> {final_docx}")
+    return final_docx, new_slot_map
+
+
+def create_partial_report_with_shift_signs(date_str, cancel=None):
+    """
+    Renders records/<date_str> of the active profile into its
+    Daily_Report_<date_str>_partial.docx, as a wrapper over the pure API:
+    resolve_day_inputs() reads the day's records and photos, the thumbnails
+    become a DayModel and render_docx() renders it. The render cache stays
+    here because it needs the previous output and the render state on disk,
+    which the pure API never sees: the fingerprint skip and the incremental
+    patch before the render, the slot index and render state after it.
+
+    cancel: optional CancelToken, checked between render phases and inside
+    the text pass; SyncCancelled propagates to the caller and no partial
+    output or render state is written.
+    """
+    started = time.perf_counter()
+    with PeakRss() as rss:
+        mode, path = _render_partial(date_str, cancel)
+    metrics.inc("render_total", mode=mode)
+    metrics.set_gauge("render_last_seconds", round(time.perf_counter() - started, 3))
+    metrics.set_gauge("render_peak_rss_bytes", rss.peak, mode=mode)
+    metrics.set_gauge("render_rss_growth_bytes", rss.growth, mode=mode)
+    log(f"Render {mode} for {date_str}: peak RSS {rss.peak / 1048576:.0f} MB (+{rss.growth / 1048576:.0f} MB)")
+    return path
+
+
+def resolve_day_inputs(date_str):
+    """(text placeholder values, image placeholder -> source photo path) of a day."""
+    site = current()
+    sign_map = find_shift_sign_photos(date_str)
+
     try:
         text_map_updates, pic_map_from_records = process_record_updates(
-            date_str, LOCAL_DIR, resize_image_fixed, log
+            date_str, site.local_dir, None, log
         )
         text_map_updates = text_map_updates or {}
         pic_map_from_records = pic_map_from_records or {}
@@ -531,122 +824,119 @@ def create_partial_report_with_shift_signs(date_str):
         text_map_updates = {}
         pic_map_from_records = {}
 
-    
-    placeholder_image_map = {
-        "(shift_1_signin)": None,
-        "(shift_1_signout)": None,
-        "(shift_2_signin)": None,
-        "(shift_2_signout)": None
-    }
-
+    placeholder_source_map = {}
     for k in ["shift_1_signin", "shift_1_signout", "shift_2_signin", "shift_2_signout"]:
         src = sign_map.get(k)
-        if src and os.path.exists(src):
-            base, ext = os.path.splitext(src)
-            resized = base + "_162.jpg"
-            try:
-                resize_image_fixed(src, resized, 162, 162)
-                placeholder_image_map[f"({k})"] = resized
-                log(f"Resized sign {k}: {resized}")
-            except Exception as e:
-                log(f"Sign resize failed for {src}: {e}")
-                placeholder_image_map[f"({k})"] = src
-        else:
-            placeholder_image_map[f"({k})"] = None
+        placeholder_source_map[f"({k})"] = src if src and os.path.exists(src) else None
 
-    
     try:
-        pic_map = build_pic_placeholders_map(date_str, desired_w=162, desired_h=162)
+        pic_map = build_pic_placeholders_map(date_str, desired_w=162, desired_h=162, resize_fn=None)
     except Exception as e:
         log(f"build_pic_placeholders_map failed: {e}")
         pic_map = {}
 
-    
-    merged_pic_map = {}
-    merged_pic_map.update(pic_map)
-    merged_pic_map.update(pic_map_from_records or {})
+    # photos named in records win over photos matched by file name
+    placeholder_source_map.update(pic_map)
+    placeholder_source_map.update(pic_map_from_records)
+    return text_map_updates, placeholder_source_map
 
-    
-    placeholder_image_map.update(merged_pic_map)
 
-    
-    mapping_for_xml = {
-        "(date)": date_str,
-        "(date_with_month)": human_date
-    }
+def _save_render(date_str, render_state, fingerprint, inputs, output, slot_map):
+    render_state.update({
+        "fingerprint": fingerprint,
+        "output": output,
+        "text": inputs["text"],
+        "images": inputs["images"],
+        "slots": slot_map,
+        "rendered_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    })
+    save_render_state(date_str, render_state)
 
-    
-    mapping_for_xml.update(text_map_updates)
 
-    
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-    tmp_text_docx = os.path.join(OUTPUT_DIR, f"temp_text_{date_str}_{uuid.uuid4().hex}.docx")
+def _render_partial(date_str, cancel):
+    """create_partial_report_with_shift_signs() body; returns (mode, path)."""
+    site = current()
+    log(f"Creating partial report for {date_str}" + (f" ({site.name})" if site.name != "default" else ""))
     try:
-        replace_text_placeholders(doc, mapping_for_xml)
-        doc.save(tmp_text_docx)
-        log(f"Applied {len(mapping_for_xml)} visible text replacements via python-docx")
-    except Exception as e:
-        log(f"Failed saving visible-text update docx: {e}")
-        return None
+        datetime.strptime(date_str, "%Y-%m-%d")
+    except ValueError:
+        log(f"Not rendering {date_str!r}: not a YYYY-MM-DD date")
+        return "failed", None
 
-    
+    text_map_updates, placeholder_source_map = resolve_day_inputs(date_str)
+    # text mapping as the python-docx pass sees it; the fingerprint and slots use it too
+    mapping = DayModel(date_str, text_map_updates, {}).mapping()
+
+    # skip the whole render when nothing the template references has changed
+    render_state = load_render_state(date_str)
     try:
-        expected_phs = [k for k in mapping_for_xml.keys() if k.startswith("(") and k.endswith(")")]
-        expected_phs = sorted(set(expected_phs))
-        xml_counts = find_placeholders_in_docx_xml(tmp_text_docx, expected_phs)
-        missing = [p for p, c in xml_counts.items() if c == 0]
-        present = [p for p, c in xml_counts.items() if c > 0]
-        log(f"XML placeholder scan: {len(present)} found, {len(missing)} missing (checked {len(expected_phs)})")
-        if missing:
-            sample = missing[:30]
-            log(f"Missing placeholders (sample up to 30): {sample}")
+        fingerprint, inputs = compute_render_fingerprint(site.template, mapping, placeholder_source_map)
     except Exception as e:
-        log(f"XML placeholder scan failed: {e}")
-
-    
-    final_docx = os.path.join(OUTPUT_DIR, f"Daily_Report_{date_str}_partial.docx")
-    final_docx_safe = safe_save_docx(final_docx)
-
-    
-    for k, v in text_map_updates.items():
-        mapping_for_xml[k] = v
-        if k.startswith("(") and k.endswith(")"):
-            mapping_for_xml[k[1:-1]] = v
+        log(f"Render fingerprint failed, rebuilding: {e}")
+        fingerprint, inputs = None, None
+    last_output = render_state.get("output")
+    if fingerprint and render_state.get("fingerprint") == fingerprint \
+            and last_output and os.path.exists(last_output):
+        log(f"Inputs unchanged for {date_str} (fingerprint {fingerprint[:12]}) — skipping render.")
+        return "skipped", last_output
+
+    if fingerprint:
+        patched = patch_previous_partial(date_str, render_state, inputs, mapping, placeholder_source_map)
+        if patched:
+            patched_path, slot_map = patched
+            _save_render(date_str, render_state, fingerprint, inputs, patched_path, slot_map)
+            return "incremental", patched_path
+
+    # photos are resized on the image pool while the template is loaded
+    thumbnails = ThumbnailBatch(placeholder_source_map, 162, 162)
+    try:
+        template = compile_template(site.template)
+    except Exception as e:
+        thumbnails.cancel()
+        log(f"Failed to open template {site.template}: {e}")
+        return "failed", None
 
-    log(f"XML text replacements prepared: {len(mapping_for_xml)} entries (includes non-parenthesized variants)")
+    try:
+        images = read_thumbnail_bytes(thumbnails, cancel)
+    except SyncCancelled:
+        thumbnails.cancel()
+        raise
+    model = DayModel(date_str, text_map_updates, images)
+
+    os.makedirs(site.output_dir, exist_ok=True)
+    final_docx_safe = safe_save_docx(os.path.join(site.output_dir, f"Daily_Report_{date_str}_partial.docx"))
+    tmp_docx = final_docx_safe + ".part"
+    try:
+        with open(tmp_docx, "wb") as f:
+            render_docx(model, template, out=f, cancel=cancel, streaming=STREAMING_RENDER)
+        os.replace(tmp_docx, final_docx_safe)
+    except SyncCancelled:
+        raise
+    except Exception as e:
+        log(f"Render failed for {date_str}: {e}")
+        return "failed", None
+    finally:
+        if os.path.exists(tmp_docx):
+            os.remove(tmp_docx)
 
-    
+    slot_map = None
     try:
-        inject_images_into_docx(tmp_text_docx, final_docx_safe, placeholder_image_map, text_map=mapping_for_xml)
+        # also rewrites the zip deterministically
+        slot_map = index_slots(final_docx_safe, site.template, mapping)
     except Exception as e:
-        log(f"XML injection failed: {e}")
-        
+        log(f"Slot indexing failed, next render will be a full rebuild: {e}")
         try:
-            shutil.copy2(tmp_text_docx, final_docx_safe)
+            normalize_docx_zip(final_docx_safe)
         except Exception as e2:
-            log(f"Failed fallback copy: {e2}")
-            return None
+            log(f"Could not normalize zip layout of {final_docx_safe}: {e2}")
 
-    
     try:
-        doc_final = Document(final_docx_safe)
-        
-        for placeholder, img_path in placeholder_image_map.items():
-            if img_path and "(" in placeholder:
-                inserted = insert_image_at_placeholder(doc_final, placeholder, img_path, width_inches=1.8)
-                if inserted:
-                    log(f"Fallback inserted {placeholder} via python-docx (count={inserted})")
-        force_arial(doc_final)
-        doc_final.save(final_docx_safe)
+        optimize_report(final_docx_safe)
     except Exception as e:
-        log(f"Post python-docx formatting failed: {e}")
+        log(f"Report size optimization failed for {final_docx_safe}: {e}")
 
-    
-    try:
-        if os.path.exists(tmp_text_docx):
-            os.remove(tmp_text_docx)
-    except Exception:
-        pass
+    if fingerprint:
+        _save_render(date_str, render_state, fingerprint, inputs, final_docx_safe, slot_map)
 
     log(f"Saved partial: {final_docx_safe}")
-    return final_docx_safe
+    return "full", final_docx_safe
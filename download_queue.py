@@ -0,0 +1,112 @@
+import time
+import heapq
+import itertools
+from collections import namedtuple
+from config import DOWNLOAD_AGING_SECONDS
+from data_utils import load_day_records_local
+from finalize_utils import readiness_photos
+
+DownloadJob = namedtuple("DownloadJob", "day kind name band")
+
+# lower band downloads first
+RECORDS_TODAY = 0
+RECORDS = 1
+READINESS_TODAY = 2
+READINESS = 3
+OTHER_TODAY = 4
+OTHER = 5
+
+
+def shift_photos(records):
+    """Photo names of the start_shift and end_shift records (the report's sign-in/out pictures)."""
+    return {r["photo"] for r in records if r.get("type") in ("start_shift", "end_shift") and r.get("photo")}
+
+
+class DownloadScheduler:
+    """
+    Priority queue of file downloads across all active days.
+
+    Order: today's records, other days' records, photos check_report_ready
+    waits for (today first, together with today's shift sign-in/out photos
+    the partial report shows), then every other photo (today first). A day's
+    photos are only classified once its records are local, until then they
+    wait outside the heap.
+
+    Starvation: the heap key is band * aging_seconds + enqueue time, so a
+    job moves up one band for every aging_seconds it has waited and an old
+    day's photos eventually overtake a steady stream of new work for today.
+    """
+
+    def __init__(self, today, aging_seconds=DOWNLOAD_AGING_SECONDS):
+        self.today = today
+        self.aging_seconds = aging_seconds
+        self._heap = []
+        self._seq = itertools.count()
+        self._queued = set()        # (day, kind, name) in the heap or waiting
+        self._waiting_photos = {}   # day -> [name] until the day's records are in
+        self._records_left = {}     # day -> record jobs not yet done
+        self._pending = {}          # day -> jobs not yet done (incl. waiting photos)
+
+    def __len__(self):
+        return len(self._heap) + sum(len(v) for v in self._waiting_photos.values())
+
+    def is_queued(self, day, kind, name):
+        return (day, kind, name) in self._queued
+
+    def day_pending(self, day):
+        return self._pending.get(day, 0)
+
+    def _push(self, band, day, kind, name):
+        key = band * self.aging_seconds + time.monotonic()
+        heapq.heappush(self._heap, (key, next(self._seq), DownloadJob(day, kind, name, band)))
+
+    def add_day(self, day, data_files, photo_files):
+        """Queues files of day not already queued; returns how many were added."""
+        added = 0
+        for name in data_files:
+            if (day, "data", name) in self._queued:
+                continue
+            self._queued.add((day, "data", name))
+            self._push(RECORDS_TODAY if day == self.today else RECORDS, day, "data", name)
+            self._records_left[day] = self._records_left.get(day, 0) + 1
+            added += 1
+        photos = [n for n in photo_files if (day, "photos", n) not in self._queued]
+        for name in photos:
+            self._queued.add((day, "photos", name))
+        self._waiting_photos.setdefault(day, []).extend(photos)
+        added += len(photos)
+        self._pending[day] = self._pending.get(day, 0) + added
+        if not self._records_left.get(day):
+            self._release_photos(day)
+        return added
+
+    def _release_photos(self, day):
+        names = self._waiting_photos.pop(day, [])
+        if not names:
+            return
+        records = load_day_records_local(day)
+        needed = readiness_photos(records)
+        today = day == self.today
+        if today:
+            needed |= shift_photos(records)
+        for name in names:
+            if name in needed:
+                band = READINESS_TODAY if today else READINESS
+            else:
+                band = OTHER_TODAY if today else OTHER
+            self._push(band, day, "photos", name)
+
+    def pop(self):
+        """Next job, or None when nothing is left."""
+        if not self._heap:
+            return None
+        return heapq.heappop(self._heap)[2]
+
+    def done(self, job):
+        """Marks job finished (downloaded or failed)."""
+        self._queued.discard((job.day, job.kind, job.name))
+        self._pending[job.day] = self._pending.get(job.day, 1) - 1
+        if job.kind == "data":
+            self._records_left[job.day] -= 1
+            if self._records_left[job.day] <= 0:
+                self._release_photos(job.day)
@@ -3,7 +3,7 @@ import shutil
 from datetime import datetime
 from logger import log
 from db_utils import save_download_db, load_download_db
-from config import OUTPUT_DIR
+from site_profiles import current
 
 def check_report_ready(date_str, local_loader):
 
@@ -12,7 +12,7 @@ def check_report_ready(date_str, local_loader):
         log(f"No records found locally for {date_str} — cannot finalize.")
         return False
 
-    photos_dir = os.path.join(__import__('config').LOCAL_DIR, date_str, "photos")
+    photos_dir = os.path.join(current().local_dir, date_str, "photos")
 
     found_shift2_end = False
     for r in records:
@@ -46,13 +46,24 @@ def check_report_ready(date_str, local_loader):
     log(f"All checks passed — {date_str} is ready to finalize.")
     return True
 
+def readiness_photos(records):
+    """Photo names check_report_ready requires: the shift 2 end_shift photo and every record_update photo."""
+    names = set()
+    for r in records:
+        rtype = r.get("type")
+        if rtype == "record_update" or (rtype == "end_shift" and str(r.get("shift", "")) == "2"):
+            if r.get("photo"):
+                names.add(r["photo"])
+    return names
+
 def finalize_report(date_str, partial_docx_path=None):
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-    final_dir = os.path.join(OUTPUT_DIR, "final")
+    output_dir = current().output_dir
+    os.makedirs(output_dir, exist_ok=True)
+    final_dir = os.path.join(output_dir, "final")
     os.makedirs(final_dir, exist_ok=True)
 
     if partial_docx_path is None:
-        partial_docx_path = os.path.join(OUTPUT_DIR, f"Daily_Report_{date_str}_partial.docx")
+        partial_docx_path = os.path.join(output_dir, f"Daily_Report_{date_str}_partial.docx")
 
     if not os.path.exists(partial_docx_path):
         log(f"Partial doc not found to finalize: {partial_docx_path}")
@@ -0,0 +1,108 @@
+import os
+import re
+import json
+import hashlib
+import zipfile
+from logger import log
+
+
+_TAG_RE = re.compile(r"<[^>]+>")
+
+# (path, mtime_ns, size) -> {"hash": ..., "text": ...}
+_template_cache = {}
+
+# path -> (mtime_ns, size, sha256) of source photos; a few days' worth
+_photo_hashes = {}
+_PHOTO_HASHES_MAX = 4096
+
+
+def file_sha256(path, chunk_size=65536):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def photo_sha256(path):
+    """file_sha256 of a source photo, cached until the file changes."""
+    st = os.stat(path)
+    key = os.path.abspath(path)
+    cached = _photo_hashes.get(key)
+    if cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size):
+        return cached[2]
+    digest = file_sha256(path)
+    if len(_photo_hashes) >= _PHOTO_HASHES_MAX:
+        _photo_hashes.clear()
+    _photo_hashes[key] = (st.st_mtime_ns, st.st_size, digest)
+    return digest
+
+
+def template_info(template_path):
+    """
+    Returns {"hash": sha256 of the template file,
+             "text": visible text of every word/*.xml part with tags stripped}.
+    The text is used to tell which placeholders the template actually contains,
+    including placeholders Word has split across several runs.
+    Cached until the template file changes.
+    """
+    st = os.stat(template_path)
+    key = (os.path.abspath(template_path), st.st_mtime_ns, st.st_size)
+    info = _template_cache.get(key)
+    if info is not None:
+        return info
+
+    parts_text = []
+    with zipfile.ZipFile(template_path, "r") as z:
+        for name in sorted(z.namelist()):
+            if not (name.startswith("word/") and name.endswith(".xml")):
+                continue
+            data = z.read(name).decode("utf-8", errors="ignore")
+            parts_text.append(_TAG_RE.sub("", data))
+
+    info = {"hash": file_sha256(template_path), "text": "\n".join(parts_text)}
+    _template_cache.clear()
+    _template_cache[key] = info
+    return info
+
+
+def compute_render_fingerprint(template_path, text_map, image_map):
+    """
+    Fingerprint of the effective inputs of one render:
+      - the template content hash
+      - every text_map entry whose key occurs in the template
+      - the content hash of every image whose placeholder occurs in the template
+    Entries the template never references do not change the fingerprint.
+
+    Returns (fingerprint, inputs) where inputs is
+    {"template": hash, "text": referenced text entries,
+     "images": referenced image placeholder -> content hash (None when missing)}.
+    """
+    info = template_info(template_path)
+    visible = info["text"]
+
+    # the XML pass also replaces the bare "1c471" form of "(1c471)"
+    texts = {
+        k: str(v) for k, v in text_map.items()
+        if k in visible or (k.startswith("(") and k.endswith(")") and k[1:-1] in visible)
+    }
+
+    image_hashes = {}
+    for placeholder, path in image_map.items():
+        if placeholder not in visible:
+            continue
+        if path and os.path.exists(path):
+            try:
+                image_hashes[placeholder] = photo_sha256(path)
+            except Exception as e:
+                log(f"Could not hash image {path}: {e}")
+                image_hashes[placeholder] = None
+        else:
+            image_hashes[placeholder] = None
+
+    inputs = {"template": info["hash"], "text": texts, "images": image_hashes}
+    payload = json.dumps(inputs, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest(), inputs
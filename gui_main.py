@@ -3,16 +3,29 @@ from tkinter import filedialog
 import threading
 import json
 import os
-import time
 from datetime import datetime
 import subprocess
 
-from logger import log
+from logger import log, debug
 from config import SETTINGS_FILE
-from plyer import notification
 from PIL import Image
 import pystray
 from ui_layout import ModernUI
+from sync_events import subscribe, drain, ProgressCounts, ShiftStateChanged, ReportRendered, EngineStateChanged
+from sync_engine import SyncEngine, RUNNING, PAUSED
+from status_server import StatusServer
+from import_utils import import_source
+from notify_utils import Notifier
+import site_profiles
+
+
+def reports_folder_unset():
+    site = site_profiles.default()
+    return site.output_dir == site.default_output_dir
+
+
+UI_POLL_MS = 500
+IDLE_POLL_MS = 5000
 
 
 class SyncGUI(tk.Tk):
@@ -30,16 +43,18 @@ class SyncGUI(tk.Tk):
         # ------------------------------------
         self.settings = self.load_settings()
 
-        # Apply saved report folder to config
-        import config
+        # Apply saved report folder to the default site profile
         saved_dir = self.settings.get("REPORTS_DIR", "")
         if saved_dir and os.path.exists(saved_dir):
-            config.OUTPUT_DIR = saved_dir
+            site_profiles.default().output_dir = saved_dir
         else:
-            log("DEBUG: No saved REPORTS_DIR — using default AppData reports folder")
+            debug("No saved REPORTS_DIR — using default AppData reports folder")
 
         self.tray_icon = None
         self.is_hidden_to_tray = False
+        self.idle = False
+        self._ui_loop_job = None
+        self._pill_job = None
 
         # intercept close button and minimize action
         self.protocol("WM_DELETE_WINDOW", self.minimize_to_tray)
@@ -49,19 +64,24 @@ class SyncGUI(tk.Tk):
         # ------------------------------------
         # STATE VARIABLES
         # ------------------------------------
-        self.sync_running = False
-        self.sync_thread = None
-        self.paused = False
+        self.engine = SyncEngine(interval=self.settings["LOOP_INTERVAL"])
+        self.status_server = StatusServer(self.engine)
+        if self.status_server.port:
+            self.status_server.start()
+        self.notifier = Notifier().start()
         self.last_shift1 = None
         self.last_shift2 = None
+        self.last_report_path = None
+
+        # events published by the sync thread, drained by update_ui_loop
+        self.events = subscribe()
 
         # ------------------------------------
         # BUILD MODERN UI
         # ------------------------------------
         self.ui = ModernUI(self)
 
-        import config
-        if config.OUTPUT_DIR == config.DEFAULT_OUTPUT_DIR:
+        if reports_folder_unset():
             self.update_status_pill("Needs Setup")
             self.notify("Setup Required", "Reporting temporarily using a default storage location.")
 
@@ -73,6 +93,7 @@ class SyncGUI(tk.Tk):
         self.ui.report_btn.configure(command=self.select_reports_folder)
         self.ui.open_reports_btn.configure(command=self.open_reports_folder)
         self.ui.open_last_btn.configure(command=self.open_last_report)
+        self.ui.import_btn.configure(command=self.import_records)
 
         # Apply existing settings
         self.ui.interval_entry.insert(0, str(self.settings["LOOP_INTERVAL"]))
@@ -84,7 +105,7 @@ class SyncGUI(tk.Tk):
         self.after(200, self.start_sync)
 
         # Background UI update loop
-        self.after(1000, self.update_ui_loop)
+        self._ui_loop_job = self.after(1000, self.update_ui_loop)
 
         # ------------------------------------
         # TRAY SUPPORT
@@ -104,7 +125,11 @@ class SyncGUI(tk.Tk):
 
 
     def animate_pill(self):
-        if getattr(self, "is_running_anim", False):
+        # single timer chain: restarting the animation replaces the pending frame
+        if self._pill_job is not None:
+            self.after_cancel(self._pill_job)
+            self._pill_job = None
+        if getattr(self, "is_running_anim", False) and not self.idle:
             current = self.ui.status_pill.cget("text_color")
             # Pulse between two greens
             pulse_green = "#ffffff"
@@ -112,7 +137,7 @@ class SyncGUI(tk.Tk):
             self.ui.status_pill.configure(
                 text_color=pulse_light if current == pulse_green else pulse_green
             )
-            self.after(1000, self.animate_pill)
+            self._pill_job = self.after(1000, self.animate_pill)
 
     def update_status_pill(self, state):
             if state == "Running":
@@ -148,76 +173,50 @@ class SyncGUI(tk.Tk):
     # START / STOP SYNC
     # ============================================================
     def start_sync(self):
-        import config
-
-        # Check if OUTPUT_DIR still default → warn and stop
-        if config.OUTPUT_DIR == config.DEFAULT_OUTPUT_DIR:
+        # Check if the reports folder is still the default → warn and stop
+        if reports_folder_unset():
             self.update_status_pill("Needs Setup")
             self.notify("Setup Required", "Please select a Reports Folder before syncing.")
             tk.messagebox.showwarning("Reports Folder Not Set",
                 "Reports folder is currently using a default internal location.\n\n"
                 "Please select a proper destination under: 'Select Reports Folder'")
             return
-        if not self.sync_running:
-            self.sync_running = True
+        if self.engine.state != RUNNING:
             self.ui.start_stop_btn.configure(text="Stop Sync")
-
-            # Start sync loop in background
-            self.sync_thread = threading.Thread(target=self.sync_loop, daemon=True)
-            self.sync_thread.start()
-
-            log("Sync started")
+            self.engine.start()
             self.update_status_pill("Running")
 
 
     def stop_sync(self):
-        self.sync_running = False
+        # cancels a download or render in progress; the engine thread unwinds on its own
+        self.engine.stop()
         self.ui.start_stop_btn.configure(text="Start Sync")
-        log("Sync stopped")
         self.update_status_pill("Stopped")
 
 
     def toggle_start_stop(self):
-        if self.sync_running:
+        if self.engine.state == RUNNING:
             self.stop_sync()
-            self.update_status_pill("Stopped")
         else:
             self.start_sync()
-            self.update_status_pill("Running")
 
 
-    # ============================================================
-    # PAUSE / RESUME
-    # ============================================================
-    def toggle_pause_resume(self):
-        self.paused = not self.paused
-        self.ui.pause_resume_btn.configure(text="Resume" and self.update_status_pill("Running") if self.paused else "Pause" and self.update_status_pill("Paused"))
-        log("Sync paused" if self.paused else "Sync resumed")
+    def sync_now(self):
+        self.engine.sync_now()
 
 
     # ============================================================
-    # SYNC LOOP
+    # PAUSE / RESUME
     # ============================================================
-    def sync_loop(self):
-        from config import BASE_URL
-        from http_utils import safe_request
-        from sync_day import sync_day
-
-        while self.sync_running:
-            if not self.paused:
-                try:
-                    res = safe_request(BASE_URL + "list_dates")
-                    dates = res.json() if res else []
-                except:
-                    dates = []
-
-                for day in dates:
-                    if not self.sync_running:
-                        break
-                    if not self.paused:
-                        sync_day(day)
-
-            time.sleep(self.settings["LOOP_INTERVAL"])
+    def toggle_pause_resume(self):
+        if self.engine.state == PAUSED:
+            self.engine.resume()
+            self.update_status_pill("Running")
+        else:
+            self.engine.pause()
+            self.update_status_pill("Paused")
+        if hasattr(self.ui, "pause_resume_btn"):
+            self.ui.pause_resume_btn.configure(text="Resume" if self.engine.state == PAUSED else "Pause")
 
 
     # ============================================================
@@ -226,6 +225,7 @@ class SyncGUI(tk.Tk):
     def save_interval(self):
         try:
             self.settings["LOOP_INTERVAL"] = int(self.ui.interval_entry.get())
+            self.engine.set_interval(self.settings["LOOP_INTERVAL"])
             self.save_settings()
             log(f"Loop interval updated to {self.settings['LOOP_INTERVAL']} sec")
         except:
@@ -241,8 +241,7 @@ class SyncGUI(tk.Tk):
             self.settings["REPORTS_DIR"] = folder
             self.save_settings()
 
-            import config
-            config.OUTPUT_DIR = folder
+            site_profiles.default().output_dir = folder
 
             log(f"Reports directory set to: {folder}")
 
@@ -250,197 +249,131 @@ class SyncGUI(tk.Tk):
             self.start_sync()
 
     # ============================================================
-    # NOTIFICATIONS
+    # OFFLINE IMPORT
     # ============================================================
+    def import_records(self):
+        choice = tk.messagebox.askyesnocancel(
+            "Import Exported Records",
+            "Import a zip file?\n\nYes: choose a .zip export\nNo: choose an export folder")
+        if choice is None:
+            return
+        if choice:
+            path = filedialog.askopenfilename(filetypes=[("Zip archive", "*.zip")])
+        else:
+            path = filedialog.askdirectory()
+        if not path:
+            return
 
-    def notify(self, title, msg):
-        if not bool(self.ui.notifications_switch.get()):
+        if self.engine.request_import(path):
+            log(f"Import of {path} queued")
+            self.engine.sync_now()
             return
 
+        # sync is stopped: nothing else touches the download db, import right here
         def worker():
             try:
-                # Try WinNotify first
-                from winotify import Notification, audio
-                toast = Notification(
-                    app_id="DPC Word Automation",
-                    title=title,
-                    msg=msg,
-                    duration="short"
-                )
-                toast.set_audio(audio.Default, loop=False)
-                toast.show()
-                log(f"Notification: WinNotify SUCCESS")
-                return
-            except Exception as e:
-                log(f"WinNotify failed: {e}")
-
-            # Fallback to plyer
-            try:
-                from plyer import notification
-                notification.notify(
-                    title=title,
-                    message=msg,
-                    app_name="DPC Word Automation",
-                    timeout=5
-                )
-                log(f"Notification: Plyer SUCCESS")
+                result = import_source(path)
+                added = sum(sum(c.values()) for c in result["days"].values())
+                msg = f"{added} new files, {result['skipped']} already known"
+                self.after(0, lambda: self.notify("Import Finished", msg))
             except Exception as e:
-                log(f"Notification error: {e}")
-
+                log(f"Import of {path} failed: {e}")
         threading.Thread(target=worker, daemon=True).start()
 
-    # def notify(self, title, msg):
-    #     if not bool(self.ui.notifications_switch.get()):
-    #         return
-
-    #     def worker():
-    #         try:
-    #             notification.notify(
-    #                 title=title,
-    #                 message=msg,
-    #                 app_name="Daily Sync System",
-    #                 timeout=5
-    #             )
-    #         except Exception as e:
-    #             log(f"Notification error: {e}")
+    # ============================================================
+    # NOTIFICATIONS
+    # ============================================================
 
-    #     threading.Thread(target=worker, daemon=True).start()
+    def notify(self, title, msg, topic=None):
+        if not bool(self.ui.notifications_switch.get()):
+            return
+        self.notifier.notify(title, msg, topic)
 
 
     # ============================================================
-    # UI LOOP (progress + shift updates)
+    # UI LOOP (drains sync events — no file I/O on the Tk thread)
     # ============================================================
     def update_ui_loop(self):
-        self.update_progress()
-        self.detect_shift_updates()
-        self.after(1000, self.update_ui_loop)
+        for event in drain(self.events):
+            self.handle_event(event)
+        # while hidden only shift notifications matter, so drain rarely
+        self._ui_loop_job = self.after(IDLE_POLL_MS if self.idle else UI_POLL_MS, self.update_ui_loop)
 
 
     # ============================================================
-    # PROGRESS
+    # IDLE MODE (window withdrawn to tray / minimized)
     # ============================================================
-    def update_progress(self):
-        from config import DOWNLOADED_DB
-        if not os.path.exists(DOWNLOADED_DB):
+    def enter_idle(self):
+        if self.idle:
             return
+        self.idle = True
+        self.ui.pause_animations()
+        if self._pill_job is not None:
+            self.after_cancel(self._pill_job)
+            self._pill_job = None
+        self._reschedule_ui_loop(IDLE_POLL_MS)
 
-        try:
-            with open(DOWNLOADED_DB, "r") as f:
-                db = json.load(f)
-        except:
-            return
 
-        today = datetime.now().strftime("%Y-%m-%d")
-        if today not in db:
+    def leave_idle(self):
+        if not self.idle:
             return
+        self.idle = False
+        self.ui.resume_animations()
+        self.animate_pill()
+        self._reschedule_ui_loop(0)
 
-        count = len(db[today].get("data", []))
-        percent = int((count / 178) * 100)
-
-        self.ui.progress_label.configure(text=f"Progress: {count} / 178 Locations")
-        self.ui.progress.set(percent / 100)
-
-
-    # ============================================================
-    # SHIFT DETECTION (same logic as before)
-    # ============================================================
-    def detect_shift_updates(self):
-            from config import DOWNLOADED_DB, LOCAL_DIR
-
-            # log("DEBUG: detect_shift_updates() called")
-
-            if not os.path.exists(DOWNLOADED_DB):
-                # log("DEBUG: DOWNLOADED_DB does not exist → No shifts yet")
-                return
-
-            try:
-                with open(DOWNLOADED_DB, "r") as f:
-                    db = json.load(f)
-            except Exception as e:
-                # log(f"DEBUG: Failed to load download DB → {e}")
-                return
-
-            today = datetime.now().strftime("%Y-%m-%d")
-            # log(f"DEBUG: Today = {today}")
-
-            if today not in db:
-                # log("DEBUG: No records found for today in DB")
-                return
-
-            shift_events = {"1": [], "2": []}
-            day_folder = os.path.join(LOCAL_DIR, today, "data")
-            # log(f"DEBUG: Local day folder → {day_folder}")
 
-            if not os.path.exists(day_folder):
-                # log("DEBUG: Local day folder does not exist → No shifts downloaded yet")
-                return
+    def _reschedule_ui_loop(self, delay_ms):
+        if self._ui_loop_job is not None:
+            self.after_cancel(self._ui_loop_job)
+        self._ui_loop_job = self.after(delay_ms, self.update_ui_loop)
 
-            data_files = db[today].get("data", [])
-            # log(f"DEBUG: Files listed in DB → {len(data_files)}")
 
-            for name in data_files:
-                if not name.endswith(".json"):
-                    continue
-
-                path = os.path.join(day_folder, name)
-                # log(f"DEBUG: Checking file → {path}")
-
-                if not os.path.exists(path):
-                    # log("DEBUG: FILE NOT FOUND LOCALLY — CRITICAL PATH ISSUE")
-                    continue
-
-                try:
-                    with open(path, "r") as f:
-                        rec = json.load(f)
-                except Exception as e:
-                    # log(f"DEBUG: Failed to load JSON {name} → {e}")
-                    continue
-
-                rtype = rec.get("type")
-                shift = str(rec.get("shift", ""))
-                ts_str = rec.get("timestamp")
+    def handle_event(self, event):
+        today = datetime.now().strftime("%Y-%m-%d")
 
-                # log(f"DEBUG: JSON {name} -> type={rtype}, shift={shift}, ts={ts_str}")
+        if isinstance(event, ProgressCounts):
+            if event.day == today:
+                self.update_progress(event.data)
 
-                if rtype not in ("start_shift", "end_shift"):
-                    continue
-                if shift not in ("1", "2"):
-                    continue
+        elif isinstance(event, ShiftStateChanged):
+            if event.day == today:
+                self.update_shift_state(event.shift, event.state)
 
-                try:
-                    event_time = datetime.strptime(ts_str, "%Y-%m-%d %H:%M:%S")
-                except:
-                    event_time = datetime.now()
+        elif isinstance(event, ReportRendered):
+            if event.final:
+                self.last_report_path = event.path
 
-                shift_events[shift].append({"type": rtype, "time": event_time})
+        elif isinstance(event, EngineStateChanged):
+            # pause/stop from the tray menu arrive here rather than via the buttons
+            self.update_status_pill(event.state.capitalize())
 
-            # SHOW FOUND SHIFT EVENTS
-            # log(f"DEBUG: Shift event counts → Shift1={len(shift_events['1'])}, Shift2={len(shift_events['2'])}")
 
-            for shift in ("1", "2"):
-                if not shift_events[shift]:
-                    # log(f"DEBUG: No events for shift {shift}")
-                    continue
+    # ============================================================
+    # PROGRESS
+    # ============================================================
+    def update_progress(self, count):
+        percent = int((count / 178) * 100)
 
-                latest = sorted(shift_events[shift], key=lambda e: e["time"])[-1]
-                new_state = "IN" if latest["type"] == "start_shift" else "OUT"
+        self.ui.progress_label.configure(text=f"Progress: {count} / 178 Locations")
+        self.ui.progress.set(percent / 100)
 
-                # log(f"DEBUG: Shift-{shift} latest state → {new_state}")
 
-                label = self.ui.shift1_status if shift == "1" else self.ui.shift2_status
-                last_state_attr = "last_shift1" if shift == "1" else "last_shift2"
-                last = getattr(self, last_state_attr)
+    # ============================================================
+    # SHIFT STATE
+    # ============================================================
+    def update_shift_state(self, shift, new_state):
+        label = self.ui.shift1_status if shift == "1" else self.ui.shift2_status
+        last_state_attr = "last_shift1" if shift == "1" else "last_shift2"
+        if getattr(self, last_state_attr) == new_state:
+            return
 
-                if last is None:
-                    # First shift event — update UI and notify
-                    setattr(self, last_state_attr, new_state)
-                    label.configure(
-                        text=f"Signed {'IN' if new_state=='IN' else 'OUT'}",
-                        text_color="green" if new_state == "IN" else "red"
-                    )
-                    self.notify(f"Shift Update", f"Shift-{shift} Signed {'IN' if new_state=='IN' else 'OUT'}")
-                    # log(f"DEBUG: First notification -> Shift-{shift} {new_state}")
-                    continue
+        setattr(self, last_state_attr, new_state)
+        label.configure(
+            text=f"Signed {'IN' if new_state=='IN' else 'OUT'}",
+            text_color="green" if new_state == "IN" else "red"
+        )
+        self.notify(f"Shift Update", f"Shift-{shift} Signed {'IN' if new_state=='IN' else 'OUT'}", topic="shift")
 
 
 
@@ -454,6 +387,10 @@ class SyncGUI(tk.Tk):
             os.startfile(folder)
 
     def open_last_report(self):
+        if self.last_report_path and os.path.exists(self.last_report_path):
+            os.startfile(self.last_report_path)
+            return
+
         folder = os.path.join(self.settings["REPORTS_DIR"], "final")
         if not os.path.exists(folder):
             return
@@ -477,6 +414,7 @@ class SyncGUI(tk.Tk):
         self.overrideredirect(False)
         self.withdraw()  # Hide window
         self.is_hidden_to_tray = True
+        self.enter_idle()
 
         # Create tray icon image
         try:
@@ -487,13 +425,18 @@ class SyncGUI(tk.Tk):
             image = Image.new('RGB', (64, 64), color='black')
 
         def restore(icon, item):
-            self.restore_from_tray()
+            # pystray calls this on its own thread; Tk must only be touched from the main loop
+            self.after(0, self.restore_from_tray)
 
         def exit_app(icon, item):
             self.force_close()
 
+        def sync_now(icon, item):
+            self.engine.sync_now()
+
         menu = pystray.Menu(
             pystray.MenuItem("Restore", restore),
+            pystray.MenuItem("Sync Now", sync_now),
             pystray.MenuItem("Exit", exit_app)
         )
 
@@ -519,11 +462,13 @@ class SyncGUI(tk.Tk):
         self.tray_icon = None
 
         self.deiconify()  # Show window again
+        self.leave_idle()
         self.after(10, self.lift)
 
 
     def force_close(self):
-        self.sync_running = False
+        self.engine.stop()
+        self.notifier.stop()
 
         if self.tray_icon:
             self.tray_icon.stop()
@@ -534,5 +479,8 @@ class SyncGUI(tk.Tk):
 
 
 if __name__ == "__main__":
+    # the image preparation pool spawns worker processes from the frozen exe
+    import multiprocessing
+    multiprocessing.freeze_support()
     app = SyncGUI()
     app.mainloop()
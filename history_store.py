@@ -0,0 +1,284 @@
+import os
+import re
+import threading
+from datetime import date
+import numpy as np
+from logger import log, debug
+import record_store
+from site_profiles import current
+
+# Multi-day cage counts of a profile in one columnar file:
+#
+#     <profile sync_dir>/cage_history.npz
+#     days    int32 (D,)              date ordinals, sorted
+#     counts  int32 (D, 2, 2, slots)  [day, shift 1/2, myna/local, cage - first_cage]
+#     first_cage int32
+#
+# Cages map to dense slots (458..642 with the built-in registry), so a day
+# is one row and any range of days is a slice. A day is rewritten whole from
+# its records whenever finish_day processes new ones; counts are summed per
+# (shift, cage) like the report's place totals.
+#
+# Roll-ups never loop over days or cages in Python: the slots are put in
+# place order once (PlaceIndex), so every place is a contiguous slice and
+# np.add.reduceat sums all places at once; weeks and months are contiguous
+# runs of the sorted day axis and are reduced the same way.
+
+STORE_NAME = "cage_history.npz"
+SHIFTS = ("1", "2")
+KINDS = ("myna", "local")
+
+_DAY_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_lock = threading.Lock()
+
+
+def store_path():
+    return os.path.join(current().sync_dir, STORE_NAME)
+
+
+def registry():
+    """{place: [cage, ...]} of the active profile."""
+    if current().places:
+        return current().places
+    from doc_utils import PLACES_CAGES
+    return PLACES_CAGES
+
+
+def _count(value):
+    try:
+        return int(str(value or "0"))
+    except Exception:
+        return 0
+
+
+def day_counts(records, first_cage, slots):
+    """(2, 2, slots) int32 counts of one day's records; cages outside the slots are ignored."""
+    counts = np.zeros((len(SHIFTS), len(KINDS), slots), dtype=np.int32)
+    skipped = 0
+    for r in records:
+        if r.get("type") != "record_update":
+            continue
+        try:
+            slot = int(r.get("cage_number")) - first_cage
+        except Exception:
+            continue
+        if not 0 <= slot < slots:
+            skipped += 1
+            continue
+        shift = 1 if str(r.get("shift", "1")).strip() == "2" else 0
+        counts[shift, 0, slot] += _count(r.get("myna_captured"))
+        counts[shift, 1, slot] += _count(r.get("local_released"))
+    if skipped:
+        debug(f"History: {skipped} records with a cage outside {first_cage}..{first_cage + slots - 1}")
+    return counts
+
+
+class CageHistory:
+    """The counts of one profile, loaded in memory."""
+
+    def __init__(self, first_cage, slots, days=None, counts=None):
+        self.first_cage = int(first_cage)
+        self.days = np.zeros(0, dtype=np.int32) if days is None else days
+        self.counts = np.zeros((0, len(SHIFTS), len(KINDS), slots), dtype=np.int32) if counts is None else counts
+
+    @property
+    def slots(self):
+        return self.counts.shape[-1]
+
+    @classmethod
+    def for_registry(cls, places):
+        cages = [c for cs in places.values() for c in cs]
+        return cls(min(cages), max(cages) - min(cages) + 1)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as z:
+            return cls(z["first_cage"], z["counts"].shape[-1], z["days"], z["counts"])
+
+    def save(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, days=self.days, counts=self.counts, first_cage=np.int32(self.first_cage))
+        os.replace(tmp, path)
+
+    def cover(self, places):
+        """Widens the slot range to every cage of places (a registry that grew)."""
+        cages = [c for cs in places.values() for c in cs]
+        lo = min(self.first_cage, min(cages))
+        hi = max(self.first_cage + self.slots, max(cages) + 1)
+        if (lo, hi) != (self.first_cage, self.first_cage + self.slots):
+            pad = ((0, 0), (0, 0), (0, 0), (self.first_cage - lo, hi - self.first_cage - self.slots))
+            self.counts = np.pad(self.counts, pad)
+            self.first_cage = lo
+
+    def put(self, day, counts):
+        ordinal = date.fromisoformat(day).toordinal()
+        i = int(np.searchsorted(self.days, ordinal))
+        if i < len(self.days) and self.days[i] == ordinal:
+            self.counts[i] = counts
+        else:
+            self.days = np.insert(self.days, i, ordinal)
+            self.counts = np.insert(self.counts, i, counts, axis=0)
+
+    def between(self, start, end):
+        """(days, counts) views for start <= day < end (date objects)."""
+        lo, hi = np.searchsorted(self.days, [start.toordinal(), end.toordinal()])
+        return self.days[lo:hi], self.counts[lo:hi]
+
+
+class PlaceIndex:
+    """Slot order that makes every place a contiguous slice of the cage axis."""
+
+    def __init__(self, places, first_cage, slots):
+        self.places = list(places)
+        order, starts = [], []
+        for cages in places.values():
+            starts.append(len(order))
+            order.extend(c - first_cage for c in cages if 0 <= c - first_cage < slots)
+        self.order = np.asarray(order, dtype=np.intp)
+        self.starts = np.asarray(starts, dtype=np.intp)
+        self.empty = np.diff(np.append(self.starts, len(order))) == 0
+
+    def totals(self, counts):
+        """counts (..., slots) -> (..., places)."""
+        if not len(self.order):
+            return np.zeros(counts.shape[:-1] + (len(self.places),), dtype=counts.dtype)
+        # reduceat over an empty slice returns the element at its start; those places are 0
+        out = np.add.reduceat(counts[..., self.order], np.minimum(self.starts, len(self.order) - 1), axis=-1)
+        out[..., self.empty] = 0
+        return out
+
+
+def group_starts(keys):
+    """Start offsets of the runs of equal keys (keys sorted) and the key of each run."""
+    if not len(keys):
+        return np.zeros(0, dtype=np.intp), keys
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return starts, keys[starts]
+
+
+def month_keys(days):
+    """year * 12 + month - 1 for date ordinals."""
+    # ordinals -> datetime64[D]: ordinal 719163 is 1970-01-01
+    d = (days - 719163).astype("datetime64[D]")
+    return d.astype("datetime64[M]").astype(np.int64) + 1970 * 12
+
+
+def week_keys(days):
+    """Ordinal of the Monday starting the ISO week of each date ordinal."""
+    return days - (days - 1) % 7
+
+
+def rollup(days, counts, keys):
+    """(key per group, summed counts per group) over the day axis."""
+    starts, group = group_starts(keys)
+    if not len(starts):
+        return group, np.zeros((0,) + counts.shape[1:], dtype=counts.dtype)
+    return group, np.add.reduceat(counts, starts, axis=0)
+
+
+# -------------------------
+# Profile store
+# -------------------------
+def load():
+    """CageHistory of the active profile, cached in its scratch state."""
+    scratch = current().scratch
+    history = scratch.get("cage_history")
+    if history is None:
+        path = store_path()
+        try:
+            history = CageHistory.load(path) if os.path.exists(path) else None
+        except Exception as e:
+            log(f"Could not read {path}, starting a new cage history: {e}")
+            history = None
+        if history is None:
+            history = CageHistory.for_registry(registry())
+        history.cover(registry())
+        scratch["cage_history"] = history
+    return history
+
+
+def update_day(day, records):
+    """Replaces day's counts from its records and saves the store."""
+    with _lock:
+        history = load()
+        history.put(day, day_counts(records, history.first_cage, history.slots))
+        history.save(store_path())
+
+
+def rebuild(cancel=None):
+    """Fills the store from every local and archived day of the active profile; returns the day count."""
+    from cancel_utils import check_cancelled
+    site = current()
+    days = {}
+    if os.path.isdir(site.archive_dir):
+        for name in os.listdir(site.archive_dir):
+            if name.endswith(".zip") and _DAY_RE.match(name[:-4]):
+                days[name[:-4]] = os.path.join(site.archive_dir, name)
+    if os.path.isdir(site.local_dir):
+        for name in os.listdir(site.local_dir):
+            if _DAY_RE.match(name) and os.path.isdir(os.path.join(site.local_dir, name)):
+                days[name] = None
+    with _lock:
+        history = CageHistory.for_registry(registry())
+        for day in sorted(days):
+            check_cancelled(cancel)
+            try:
+                records = record_store.load_archived_records(days[day]) if days[day] else record_store.load_records(day)
+            except Exception as e:
+                log(f"History: could not read records of {day}: {e}")
+                continue
+            history.put(day, day_counts(records, history.first_cage, history.slots))
+        history.save(store_path())
+        site.scratch["cage_history"] = history
+    log(f"Cage history rebuilt from {len(days)} days")
+    return len(days)
+
+
+# -------------------------
+# Summaries
+# -------------------------
+def monthly_summary(year):
+    """
+    {"months": ["YYYY-MM", ...], "places": [...], "place": (months, places, 2, 2),
+     "cages": (months, slots, 2, 2), "first_cage": n} for one year; axes after the
+    first two are shift, then myna/local.
+    """
+    history = load()
+    days, counts = history.between(date(year, 1, 1), date(year + 1, 1, 1))
+    keys, monthly = rollup(days, counts, month_keys(days))
+    index = PlaceIndex(registry(), history.first_cage, history.slots)
+    return {
+        "months": [f"{k // 12}-{k % 12 + 1:02d}" for k in keys.tolist()],
+        "places": index.places,
+        "place": index.totals(monthly).transpose(0, 3, 1, 2),
+        "cages": monthly.transpose(0, 3, 1, 2),
+        "first_cage": history.first_cage,
+    }
+
+
+def weekly_place_totals(start, end):
+    """(week start dates, (weeks, places, 2, 2) counts) for start <= day < end."""
+    history = load()
+    days, counts = history.between(start, end)
+    keys, weekly = rollup(days, counts, week_keys(days))
+    index = PlaceIndex(registry(), history.first_cage, history.slots)
+    return [date.fromordinal(int(k)) for k in keys], index.totals(weekly).transpose(0, 3, 1, 2)
+
+
+def format_monthly_summary(summary):
+    """Text table: one block per month, a line per place with myna/local per shift and the total."""
+    lines = []
+    width = max([len(p) for p in summary["places"]] + [5])
+    header = f"{'Place':<{width}}  {'S1 myna':>8} {'S1 local':>8} {'S2 myna':>8} {'S2 local':>8} {'Total':>8}"
+    for m, month in enumerate(summary["months"]):
+        lines += [month, header]
+        place = summary["place"][m]
+        for p, name in enumerate(summary["places"]):
+            row = place[p].reshape(-1)
+            lines.append(f"{name:<{width}}  " + " ".join(f"{v:>8}" for v in row.tolist()) + f" {int(row.sum()):>8}")
+        total = place.sum(axis=0).reshape(-1)
+        lines.append(f"{'All places':<{width}}  " + " ".join(f"{v:>8}" for v in total.tolist())
+                     + f" {int(total.sum()):>8}")
+        lines.append("")
+    return "\n".join(lines)
@@ -1,46 +1,114 @@
 
 import time
+import hashlib
 import requests
 import os
 from logger import log
-from config import BASE_URL
+from requests.adapters import HTTPAdapter
+from config import HTTP_POOL_SIZE
+from site_profiles import current
+from cancel_utils import SyncCancelled, check_cancelled
+import metrics
 
-def safe_request(url, retries=3):
+# one connection pool for every site profile and thread
+_session = requests.Session()
+_session.mount("http://", HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE))
+_session.mount("https://", HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE))
+
+def safe_request(url, retries=3, cancel=None, stream=False):
     for i in range(retries):
+        check_cancelled(cancel)
         try:
-            res = requests.get(url, timeout=10)
+            res = _session.get(url, timeout=10, stream=stream)
             if res.status_code == 200:
                 return res
             else:
                 log(f"Bad response {res.status_code}: {url}")
         except Exception as e:
             log(f"Network error accessing {url} ({i+1}/{retries}): {e}")
-        time.sleep(2)
+        # retry back-off, cut short by cancellation
+        if cancel is not None:
+            cancel.wait(2)
+        else:
+            time.sleep(2)
+    check_cancelled(cancel)
+    metrics.inc("sync_request_errors_total")
     return None
 
-def download_file(url, local_path):
-    res = safe_request(url)
+def download_file(url, local_path, cancel=None, info=None):
+    """
+    Streams url to local_path. The copy is checked against Content-Length
+    and, when the server sends it, X-Content-SHA256; a mismatch counts as a
+    failed download. info (a dict) receives the verified size and sha256.
+    """
+    res = safe_request(url, cancel=cancel, stream=True)
     if res is None:
         log(f"FAILED downloading: {url}")
+        metrics.inc("sync_download_errors_total")
         return False
     os.makedirs(os.path.dirname(local_path), exist_ok=True)
+    metrics.add_gauge("sync_downloads_in_flight", 1)
+    size = 0
+    digest = hashlib.sha256()
     try:
         with open(local_path, "wb") as f:
             for chunk in res.iter_content(1024):
+                check_cancelled(cancel)
                 f.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+
+        problem = None
+        expected_size = res.headers.get("Content-Length")
+        # with Content-Encoding the header is the compressed size
+        if expected_size and not res.headers.get("Content-Encoding") and int(expected_size) != size:
+            problem = f"size {size} != Content-Length {expected_size}"
+        expected_hash = res.headers.get("X-Content-SHA256")
+        if expected_hash and expected_hash.lower() != digest.hexdigest():
+            problem = "sha256 mismatch"
+        if problem is None and os.path.getsize(local_path) != size:
+            problem = "short write"
+        if problem:
+            log(f"Verification failed for {url}: {problem}")
+            os.remove(local_path)
+            metrics.inc("sync_download_errors_total")
+            return False
+
+        if info is not None:
+            info["size"] = size
+            info["sha256"] = digest.hexdigest()
+            info["server_hash"] = bool(expected_hash)
         log(f"Downloaded: {local_path}")
+        metrics.inc("sync_downloads_total")
+        metrics.inc("sync_download_bytes_total", size)
         return True
+    except SyncCancelled:
+        # never leave a truncated file behind for the next cycle to trust
+        try:
+            os.remove(local_path)
+        except OSError:
+            pass
+        raise
     except Exception as e:
         log(f"Failed saving download {local_path}: {e}")
+        metrics.inc("sync_download_errors_total")
         return False
+    finally:
+        metrics.add_gauge("sync_downloads_in_flight", -1)
+        res.close()
 
-def delete_from_server(day):
-    url = BASE_URL + f"{day}/delete"
+def delete_files_from_server(day, files):
+    """
+    Batch delete of individual files: files is {"data": [...], "photos": [...]}.
+    Returns the same shape listing what the server confirmed deleted,
+    or None when the request failed.
+    """
+    url = current().base_url + f"{day}/delete_files"
     try:
-        res = requests.post(url)
+        res = _session.post(url, json=files, timeout=30)
         if res.status_code == 200:
-            log(f"Server files deleted for {day}")
-        else:
-            log(f"Failed to delete server files for {day}: HTTP {res.status_code}")
+            return res.json().get("deleted", {})
+        log(f"Batch delete for {day} failed: HTTP {res.status_code}")
     except Exception as e:
-        log(f"Error deleting files on server for {day}: {e}")
+        log(f"Error in batch delete for {day}: {e}")
+    return None
@@ -0,0 +1,137 @@
+import os
+import atexit
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from logger import log
+import metrics
+from image_utils import make_thumbnail, thumbnail_path
+
+
+# one pool for the whole process; workers keep PIL imported between renders
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def pool_size():
+    # leave a core for the UI / render thread
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=pool_size())
+            log(f"Image preparation pool started with {pool_size()} workers")
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+atexit.register(shutdown_pool)
+
+
+def thumbnail_is_fresh(src, dst):
+    try:
+        return os.path.getmtime(dst) >= os.path.getmtime(src)
+    except OSError:
+        return False
+
+
+def collect_thumbnail_jobs(placeholder_source_map, width=162, height=162):
+    """
+    Deduplicated (src, dst, width, height) jobs for a render.
+    Sources whose thumbnail is already newer than the source are not redone.
+    Returns (jobs, ready) where ready maps src -> existing thumbnail.
+    """
+    jobs = []
+    ready = {}
+    seen = set()
+    for src in placeholder_source_map.values():
+        if not src or src in seen or not os.path.exists(src):
+            continue
+        seen.add(src)
+        dst = thumbnail_path(src)
+        if thumbnail_is_fresh(src, dst):
+            ready[src] = dst
+        else:
+            jobs.append((src, dst, width, height))
+    return jobs, ready
+
+
+class ThumbnailBatch:
+    """
+    Thumbnails for one render, resized on the process pool.
+
+    Jobs are submitted as soon as the batch is created, so the caller can do
+    other work (the python-docx text pass) while photos are decoded, then
+    consume results with as_completed() or result_map().
+    """
+
+    def __init__(self, placeholder_source_map, width=162, height=162):
+        self.placeholder_source_map = placeholder_source_map
+        self.jobs, self.done = collect_thumbnail_jobs(placeholder_source_map, width, height)
+        self.reused = len(self.done)
+        self._futures = {}
+        self._inline = []
+
+        if len(self.jobs) <= 1:
+            self._inline = list(self.jobs)
+            return
+        try:
+            pool = get_pool()
+            for src, dst, w, h in self.jobs:
+                self._futures[pool.submit(make_thumbnail, src, dst, w, h)] = (src, dst)
+        except Exception as e:
+            log(f"Image pool unavailable, resizing inline: {e}")
+            for fut in self._futures:
+                fut.cancel()
+            self._futures = {}
+            self._inline = list(self.jobs)
+
+    def as_completed(self):
+        """Yields (src, thumbnail) as each job finishes; thumbnail is src when resizing failed."""
+        for src, dst, w, h in self._inline:
+            try:
+                make_thumbnail(src, dst, w, h)
+                self.done[src] = dst
+            except Exception as e:
+                log(f"Resize failed for {src}: {e}")
+                self.done[src] = src
+            yield src, self.done[src]
+        self._inline = []
+
+        for fut in as_completed(list(self._futures)):
+            src, dst = self._futures.pop(fut)
+            try:
+                fut.result()
+                self.done[src] = dst
+            except Exception as e:
+                log(f"Resize failed for {src}: {e}")
+                self.done[src] = src
+            yield src, self.done[src]
+
+    def cancel(self):
+        """Drops jobs that have not started; running ones finish in the pool."""
+        for fut in self._futures:
+            fut.cancel()
+        self._futures = {}
+        self._inline = []
+
+    def result_map(self):
+        """Waits for every job; returns placeholder -> thumbnail (None for missing sources)."""
+        for _ in self.as_completed():
+            pass
+        result = {}
+        for placeholder, src in self.placeholder_source_map.items():
+            result[placeholder] = self.done.get(src) if src else None
+        metrics.inc("thumbnails_total", self.reused, result="reused")
+        metrics.inc("thumbnails_total", len(self.jobs), result="made")
+        log(f"Prepared {len(self.jobs)} thumbnails ({self.reused} reused) for {len(result)} image placeholders")
+        return result
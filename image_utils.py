@@ -1,6 +1,21 @@
 import os
+import shutil
 from PIL import Image, ImageOps
 from logger import log
+from config import FAST_THUMBNAILS
+
+THUMB_SUFFIX = "_162"
+
+
+def thumbnail_path(src):
+    """Path of the 162x162 JPEG thumbnail derived from a source photo."""
+    base, ext = os.path.splitext(src)
+    return base + THUMB_SUFFIX + ".jpg"
+
+
+def is_thumbnail(fname):
+    """True for files produced by resize_image_fixed (e.g. 001_162.jpg)."""
+    return os.path.splitext(os.path.basename(fname))[0].endswith(THUMB_SUFFIX)
 
 def resize_image_fixed(input_path, output_path, width, height):
     """Resize to fixed width/height, auto-correct orientation, and save as JPEG."""
@@ -26,3 +41,79 @@ def resize_image_fixed(input_path, output_path, width, height):
 
     except Exception as e:
         raise RuntimeError(f"Resize error for {input_path}: {e}")
+
+
+# EXIF orientation -> transpose that makes the image upright (same table as ImageOps.exif_transpose)
+_ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+def resize_image_fast(input_path, output_path, width, height):
+    """
+    Same result as resize_image_fixed at thumbnail sizes, without decoding the
+    full-resolution photo: JPEG draft mode lets libjpeg decode at 1/2, 1/4 or
+    1/8 scale, reduce() brings it close to the target, and the EXIF rotation
+    is applied to the small image instead of the multi-megapixel one.
+    output_path may also be a binary file object.
+    """
+    try:
+        with Image.open(input_path) as img:
+            orientation = img.getexif().get(0x0112, 1)
+            transpose = _ORIENTATION_TRANSPOSE.get(orientation)
+            # orientations 5-8 swap axes, so size the stored image the other way round
+            if orientation in (5, 6, 7, 8):
+                raw_w, raw_h = height, width
+            else:
+                raw_w, raw_h = width, height
+
+            if img.format == "JPEG":
+                img.draft("RGB", (raw_w, raw_h))
+
+            small = img
+            if small.mode not in ("RGB", "L"):
+                small = small.convert("RGB")
+
+            # integer box reduction while still at least 2x the target, LANCZOS for the rest
+            factor = min(small.width // (raw_w * 2), small.height // (raw_h * 2))
+            if factor > 1:
+                small = small.reduce(factor)
+
+            small = small.resize((raw_w, raw_h), Image.LANCZOS)
+            if transpose is not None:
+                small = small.transpose(transpose)
+
+            if isinstance(output_path, (str, os.PathLike)):
+                os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            small.save(output_path, format="JPEG")
+
+    except Exception as e:
+        raise RuntimeError(f"Resize error for {input_path}: {e}")
+
+
+def is_ready_thumbnail(path, width, height):
+    """True when path is already an upright width x height JPEG (e.g. a server-made thumbnail)."""
+    try:
+        with Image.open(path) as img:
+            return img.format == "JPEG" and img.size == (width, height) \
+                and img.getexif().get(0x0112, 1) == 1
+    except Exception:
+        return False
+
+
+def make_thumbnail(input_path, output_path, width, height):
+    """Thumbnail used for report images; the fast path unless FAST_THUMBNAILS is off."""
+    if is_ready_thumbnail(input_path, width, height):
+        # already the right size: copying avoids a second JPEG generation
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        shutil.copyfile(input_path, output_path)
+        return
+    if FAST_THUMBNAILS:
+        return resize_image_fast(input_path, output_path, width, height)
+    return resize_image_fixed(input_path, output_path, width, height)
@@ -0,0 +1,194 @@
+import os
+import re
+import zipfile
+import hashlib
+from logger import log
+from db_utils import save_download_db
+from image_utils import is_thumbnail
+from cancel_utils import check_cancelled
+from fingerprint_utils import file_sha256
+import record_store
+import retention_utils
+from sync_day import download_db as _db, finish_day, originals_dir
+from site_profiles import current
+import metrics
+
+# Offline bulk import of phone exports brought back on USB, as a folder or a
+# zip with the server's layout (<day>/data/*.json, <day>/photos/*). Files
+# outside a YYYY-MM-DD folder belong to the day passed in. Content already
+# known for the day (same record bytes under any name, a photo matching its
+# local copy or a verified hash) is skipped. New files go to the record store
+# and photos folder first; the download db is updated and saved once at the
+# end (also when the import is cancelled), so it never lists a file that is
+# not on disk. Each day that gained files, or still owes a render from a
+# cancelled import, is then finished once (record updates, one render,
+# finalize).
+
+_DAY_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_PHOTO_EXT = (".jpg", ".jpeg", ".png")
+
+
+def _source_entries(source):
+    """(relative path, read()) of every file in a folder or zip."""
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for f in sorted(files):
+                path = os.path.join(root, f)
+
+                def read(path=path):
+                    with open(path, "rb") as fh:
+                        return fh.read()
+                yield os.path.relpath(path, source).replace(os.sep, "/"), read
+        return
+    with zipfile.ZipFile(source) as z:
+        for info in sorted(z.infolist(), key=lambda i: i.filename):
+            if not info.is_dir():
+                yield info.filename, (lambda info=info: z.read(info))
+
+
+def classify(relpath, day=None):
+    """(day, kind, name) for an export file, or None when it is not a record or photo."""
+    parts = relpath.split("/")
+    name = parts[-1]
+    lower = name.lower()
+    if name.startswith(".") or is_thumbnail(name) or lower == record_store.STORE_NAME:
+        return None
+    if lower.endswith(".json"):
+        kind = "data"
+    elif lower.endswith(_PHOTO_EXT):
+        kind = "photos"
+    else:
+        return None
+    days = [p for p in parts[:-1] if _DAY_RE.match(p)]
+    day = days[-1] if days else day
+    return (day, kind, name) if day else None
+
+
+class _DayImport:
+    """Files and db changes of one day, applied to the db in one go."""
+
+    def __init__(self, day):
+        self.day = day
+        entry = _db().get(day, {})
+        self.store_hashes = record_store.known_hashes(day)
+        self.thumb_only = set(entry.get("thumb_photos", [])) - set(entry.get("originals", []))
+        self.photo_hashes = {v[1] for k, v in entry.get("verified", {}).items()
+                             if not k.startswith("data/") and isinstance(v, list) and len(v) == 2}
+        self.data = []
+        self.photos = []
+        self.originals = []
+
+    def add_record(self, name, raw):
+        sha = hashlib.sha256(raw).hexdigest()
+        if sha in self.store_hashes:
+            return False
+        if not record_store.ingest_bytes(self.day, name, raw):
+            return False
+        self.store_hashes[sha] = name
+        self.data.append(name)
+        return True
+
+    def add_photo(self, name, raw):
+        sha = hashlib.sha256(raw).hexdigest()
+        if sha in self.photo_hashes:
+            return False
+        if name in self.thumb_only:
+            # the server only gave us a thumbnail; the export has the full photo
+            dest = os.path.join(originals_dir(self.day), name)
+            target = self.originals
+        else:
+            dest = os.path.join(current().local_dir, self.day, "photos", name)
+            target = self.photos
+            try:
+                if os.path.getsize(dest) == len(raw) and file_sha256(dest) == sha:
+                    return False
+            except OSError:
+                pass
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        with open(dest + ".part", "wb") as f:
+            f.write(raw)
+        os.replace(dest + ".part", dest)
+        self.photo_hashes.add(sha)
+        target.append(name)
+        return True
+
+    def apply(self, db):
+        entry = db.setdefault(self.day, {"data": [], "photos": []})
+        for kind, names in (("data", self.data), ("photos", self.photos), ("originals", self.originals)):
+            known = entry.setdefault(kind, [])
+            known.extend(n for n in names if n not in known)
+        if self.data or self.photos:
+            entry["render_pending"] = True
+            # records not yet through finish_day, in case this import is cancelled
+            unfinished = entry.setdefault("import_unfinished", [])
+            unfinished.extend(n for n in self.data if n not in unfinished)
+
+
+def import_source(source, day=None, cancel=None, render=True):
+    """
+    Imports a folder or zip of exported records and photos into the active
+    profile; day is used for files outside a YYYY-MM-DD folder. Returns
+    {"days": {day: {"data": n, "photos": n, "originals": n}}, "skipped": n, "failed": n}.
+    """
+    if not os.path.exists(source):
+        raise FileNotFoundError(source)
+    log(f"Importing {source}" + (f" into {current().name}" if current().name != "default" else ""))
+    days = {}
+    unavailable = set()
+    skipped = failed = 0
+    try:
+        for relpath, read in _source_entries(source):
+            check_cancelled(cancel)
+            target = classify(relpath, day)
+            if target is None:
+                continue
+            file_day, kind, name = target
+            if file_day in unavailable:
+                failed += 1
+                continue
+            if file_day not in days:
+                # an archived day is unpacked so the import joins its records
+                if not retention_utils.rehydrate_day(_db(), file_day):
+                    unavailable.add(file_day)
+                    failed += 1
+                    continue
+                days[file_day] = _DayImport(file_day)
+            try:
+                raw = read()
+                added = days[file_day].add_record(name, raw) if kind == "data" else days[file_day].add_photo(name, raw)
+            except Exception as e:
+                log(f"Could not import {relpath}: {e}")
+                metrics.inc("import_files_total", result="failed")
+                failed += 1
+                continue
+            metrics.inc("import_files_total", result="imported" if added else "duplicate")
+            if not added:
+                skipped += 1
+    finally:
+        # one db update for the whole import; also when cancelled, so files
+        # already stored are listed and their days stay owed a render
+        db = _db()
+        for imported in days.values():
+            imported.apply(db)
+        if days:
+            save_download_db(db)
+
+    summary = {d: {"data": len(i.data), "photos": len(i.photos), "originals": len(i.originals)}
+               for d, i in sorted(days.items())}
+    added = sum(sum(v.values()) for v in summary.values())
+    label = os.path.basename(os.path.normpath(source))
+    log(f"Import of {label}: {added} new files over {len(summary)} days, "
+        f"{skipped} already known, {failed} failed")
+
+    if render:
+        for d, imported in sorted(days.items()):
+            entry = db.get(d, {})
+            # a cancelled earlier import of the same files left the day owed a render
+            if entry.get("render_pending"):
+                check_cancelled(cancel)
+                unfinished = list(entry.get("import_unfinished", []))
+                finish_day(d, unfinished, imported.photos, cancel=cancel)
+                entry.pop("import_unfinished", None)
+                save_download_db(db)
+    return {"days": summary, "skipped": skipped, "failed": failed}
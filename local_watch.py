@@ -0,0 +1,199 @@
+import os
+import re
+import time
+import threading
+from logger import log, debug
+from config import LOCAL_WATCH_POLL, LOCAL_WATCH_DEBOUNCE
+from image_utils import is_thumbnail
+
+try:
+    import win32con
+    import win32event
+    import win32file
+    import pywintypes
+except ImportError:
+    win32file = None
+
+_DAY_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_PHOTO_EXT = (".jpg", ".jpeg", ".png")
+_KINDS = ("data", "photos")
+
+
+def classify(relpath):
+    """(day, kind, name) for <day>/data/*.json or <day>/photos/<photo>, else None."""
+    parts = relpath.replace("\\", "/").split("/")
+    if len(parts) != 3 or not _DAY_RE.match(parts[0]) or parts[1] not in _KINDS:
+        return None
+    day, kind, name = parts
+    lower = name.lower()
+    if name.startswith(".") or lower.endswith((".part", ".tmp")):
+        return None
+    if kind == "data" and not lower.endswith(".json"):
+        return None
+    if kind == "photos" and (not lower.endswith(_PHOTO_EXT) or is_thumbnail(name)):
+        return None
+    return day, kind, name
+
+
+class LocalWatcher(threading.Thread):
+    """
+    Watches a profile's records folder for record and photo files dropped or
+    corrected by hand and calls on_change({day: {"data": {names}, "photos":
+    {names}}}) once the folder has been quiet for LOCAL_WATCH_DEBOUNCE.
+
+    On Windows ReadDirectoryChangesW reports changes as they happen. Elsewhere
+    (or without pywin32) the folder is polled every LOCAL_WATCH_POLL
+    seconds, and only data/photos folders whose mtime moved are listed
+    again; data folders are also re-statted, since they normally hold only
+    files not ingested yet. Events for files the sync writes itself are
+    reported too; the consumer skips what it already knows.
+    """
+
+    def __init__(self, root, on_change, name=None, poll=LOCAL_WATCH_POLL, debounce=LOCAL_WATCH_DEBOUNCE):
+        super().__init__(name=f"local-watch-{name}" if name else "local-watch", daemon=True)
+        self.root = root
+        self.on_change = on_change
+        self.poll = poll
+        self.debounce = debounce
+        self.backend = "win32" if win32file is not None else "polling"
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_event = 0.0
+        # polling state
+        self._root_mtime = None
+        self._primed = False   # after the first pass, new folders are reported in full
+        self._days = []
+        self._dirs = {}   # dir path -> (mtime_ns, {name: (size, mtime_ns)})
+
+    def stop(self):
+        self._stopping.set()
+
+    # -- collecting --
+    def _add(self, relpath):
+        target = classify(relpath)
+        if target is None:
+            return
+        day, kind, name = target
+        with self._lock:
+            self._pending.setdefault(day, {"data": set(), "photos": set()})[kind].add(name)
+            self._last_event = time.monotonic()
+
+    def _flush(self, force=False):
+        with self._lock:
+            if not self._pending:
+                return
+            if not force and time.monotonic() - self._last_event < self.debounce:
+                return
+            changes, self._pending = self._pending, {}
+        count = sum(len(n) for kinds in changes.values() for n in kinds.values())
+        debug(f"Local changes under {self.root}: {count} files over {len(changes)} days")
+        try:
+            self.on_change(changes)
+        except Exception as e:
+            log(f"Local change handler failed: {e}")
+
+    # -- polling backend --
+    def _scan_dir(self, day, kind, restat):
+        path = os.path.join(self.root, day, kind)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            self._dirs.pop(path, None)
+            return
+        known = self._dirs.get(path)
+        if known is not None and known[0] == mtime and not restat:
+            return
+        first = known is None
+        entries = {} if first else known[1]
+        names = os.listdir(path) if first or known[0] != mtime else list(entries)
+        seen = {}
+        for name in names:
+            try:
+                st = os.stat(os.path.join(path, name))
+            except OSError:
+                continue
+            seen[name] = (st.st_size, st.st_mtime_ns)
+            if (self._primed or not first) and entries.get(name) != seen[name]:
+                self._add(f"{day}/{kind}/{name}")
+        self._dirs[path] = (mtime, seen)
+
+    def poll_once(self):
+        try:
+            mtime = os.stat(self.root).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._root_mtime:
+            self._root_mtime = mtime
+            self._days = sorted(d for d in os.listdir(self.root)
+                                if _DAY_RE.match(d) and os.path.isdir(os.path.join(self.root, d)))
+        for day in self._days:
+            self._scan_dir(day, "data", restat=True)
+            self._scan_dir(day, "photos", restat=False)
+
+    def _run_polling(self):
+        # the first pass only records what is there
+        self.poll_once()
+        self._primed = True
+        while not self._stopping.wait(self.poll):
+            self.poll_once()
+            self._flush()
+
+    def _report_data_dirs(self):
+        for day in os.listdir(self.root):
+            folder = os.path.join(self.root, day, "data")
+            if _DAY_RE.match(day) and os.path.isdir(folder):
+                for name in os.listdir(folder):
+                    self._add(f"{day}/data/{name}")
+
+    # -- ReadDirectoryChangesW backend --
+    def _run_win32(self):
+        handle = win32file.CreateFile(
+            self.root, 0x0001,   # FILE_LIST_DIRECTORY
+            win32con.FILE_SHARE_READ | win32con.FILE_SHARE_WRITE | win32con.FILE_SHARE_DELETE,
+            None, win32con.OPEN_EXISTING,
+            win32con.FILE_FLAG_BACKUP_SEMANTICS | win32con.FILE_FLAG_OVERLAPPED, None
+        )
+        flags = (win32con.FILE_NOTIFY_CHANGE_FILE_NAME | win32con.FILE_NOTIFY_CHANGE_LAST_WRITE
+                 | win32con.FILE_NOTIFY_CHANGE_SIZE)
+        overlapped = pywintypes.OVERLAPPED()
+        overlapped.hEvent = win32event.CreateEvent(None, True, False, None)
+        buf = win32file.AllocateReadBuffer(64 * 1024)
+        try:
+            while not self._stopping.is_set():
+                win32file.ReadDirectoryChangesW(handle, buf, True, flags, overlapped)
+                # wake up regularly to debounce and to notice stop()
+                while win32event.WaitForSingleObject(overlapped.hEvent, int(self.debounce * 500)) \
+                        == win32event.WAIT_TIMEOUT:
+                    self._flush()
+                    if self._stopping.is_set():
+                        win32file.CancelIo(handle)
+                        return
+                n = win32file.GetOverlappedResult(handle, overlapped, True)
+                win32event.ResetEvent(overlapped.hEvent)
+                if n == 0:
+                    # buffer overflow: events were lost; data/ only holds files not ingested yet
+                    log(f"Local watch on {self.root} overflowed; re-reporting unprocessed records")
+                    self._report_data_dirs()
+                    continue
+                for action, relpath in win32file.FILE_NOTIFY_INFORMATION(buf, n):
+                    if action != 2:   # FILE_ACTION_REMOVED
+                        self._add(relpath)
+        finally:
+            win32file.CloseHandle(handle)
+
+    def run(self):
+        log(f"Watching {self.root} for local record changes ({self.backend})")
+        while not self._stopping.is_set():
+            try:
+                if self.backend == "win32":
+                    self._run_win32()
+                else:
+                    self._run_polling()
+            except Exception as e:
+                log(f"Local watch on {self.root} failed: {e}")
+                if self.backend == "win32":
+                    self.backend = "polling"
+                    continue
+                self._stopping.wait(self.poll)
+        self._flush(force=True)
@@ -1,13 +1,219 @@
-
+import os
+import queue
+import atexit
+import threading
+from collections import deque
 from datetime import datetime
-from config import LOG_FILE
+from config import LOG_FILE, LOG_LEVEL, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_ROTATE_DAILY, LOG_RING_SIZE
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+_LEVELS_BY_NAME = {v: k for k, v in LEVEL_NAMES.items()}
+
+_level = _LEVELS_BY_NAME.get(str(LOG_LEVEL).upper(), INFO)
+
+# last lines for the GUI, newest last
+_ring = deque(maxlen=LOG_RING_SIZE)
+_ring_lock = threading.Lock()
+
+_queue = queue.Queue(maxsize=10000)
+_writer = None
+_writer_lock = threading.Lock()
+_dropped = 0
+
+# lines logged per level name, for the status endpoint
+level_counts = {}
+
+_BATCH_SIZE = 500
+_FLUSH_INTERVAL = 0.5
+
+
+def set_level(level):
+    global _level
+    if isinstance(level, str):
+        level = _LEVELS_BY_NAME.get(level.upper(), INFO)
+    _level = level
+
 
-def log(msg):
+def is_enabled(level):
+    return level >= _level
+
+
+def log(msg, level=INFO):
+    """Format and enqueue one line; the file write happens on the writer thread."""
+    global _dropped
+    if level < _level:
+        return
     timestamp = datetime.now().strftime("[%Y-%m-%d %H:%M:%S]")
-    line = f"{timestamp} {msg}"
-    print(line)
+    if level == INFO:
+        line = f"{timestamp} {msg}"
+    else:
+        line = f"{timestamp} [{LEVEL_NAMES.get(level, level)}] {msg}"
+
+    with _ring_lock:
+        _ring.append(line)
+        name = LEVEL_NAMES.get(level, str(level))
+        level_counts[name] = level_counts.get(name, 0) + 1
+
+    _ensure_writer()
     try:
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(line + "\n")
-    except Exception:
-        pass
+        _queue.put_nowait(line)
+    except queue.Full:
+        _dropped += 1
+
+
+def debug(msg):
+    # callers building expensive messages should check is_enabled(DEBUG) first
+    if DEBUG >= _level:
+        log(msg, DEBUG)
+
+
+def warning(msg):
+    log(msg, WARNING)
+
+
+def error(msg):
+    log(msg, ERROR)
+
+
+def queue_depth():
+    return _queue.qsize()
+
+
+def recent_lines(n=None):
+    """Most recent log lines from the in-memory ring buffer."""
+    with _ring_lock:
+        lines = list(_ring)
+    return lines if n is None else lines[-n:]
+
+
+def flush(timeout=5.0):
+    """Block until everything logged so far is on disk."""
+    if _writer is None:
+        return
+    done = threading.Event()
+    try:
+        _queue.put(done, timeout=timeout)
+    except queue.Full:
+        return
+    done.wait(timeout)
+
+
+# -------------------------
+# Writer thread
+# -------------------------
+class _LogWriter(threading.Thread):
+    def __init__(self):
+        super().__init__(name="log-writer", daemon=True)
+        self.stopping = False
+        self._file = None
+        self._size = 0
+        self._opened_day = None
+
+    def _open(self):
+        os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
+        self._file = open(LOG_FILE, "a", encoding="utf-8")
+        self._size = self._file.tell()
+        try:
+            self._opened_day = datetime.fromtimestamp(os.path.getmtime(LOG_FILE)).date()
+        except OSError:
+            self._opened_day = datetime.now().date()
+        if self._size == 0:
+            self._opened_day = datetime.now().date()
+
+    def _rotate(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+        for i in range(LOG_BACKUP_COUNT - 1, 0, -1):
+            src = f"{LOG_FILE}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{LOG_FILE}.{i + 1}")
+        if LOG_BACKUP_COUNT > 0:
+            os.replace(LOG_FILE, f"{LOG_FILE}.1")
+        else:
+            os.remove(LOG_FILE)
+        self._open()
+
+    def _needs_rotation(self, incoming):
+        if self._size == 0:
+            return False
+        if LOG_MAX_BYTES and self._size + incoming > LOG_MAX_BYTES:
+            return True
+        return LOG_ROTATE_DAILY and self._opened_day != datetime.now().date()
+
+    def _write(self, lines):
+        data = "".join(line + "\n" for line in lines)
+        for line in lines:
+            try:
+                print(line)
+            except Exception:
+                pass
+        try:
+            if self._file is None:
+                self._open()
+            encoded = len(data.encode("utf-8"))
+            if self._needs_rotation(encoded):
+                self._rotate()
+            self._file.write(data)
+            self._file.flush()
+            self._size += encoded
+        except Exception:
+            # never let logging take the app down
+            self._file = None
+
+    def run(self):
+        global _dropped
+        while True:
+            try:
+                item = _queue.get(timeout=_FLUSH_INTERVAL)
+            except queue.Empty:
+                if self.stopping:
+                    break
+                continue
+
+            batch = []
+            waiters = []
+            while True:
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if len(batch) >= _BATCH_SIZE:
+                    break
+                try:
+                    item = _queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if _dropped:
+                batch.append(f"{datetime.now().strftime('[%Y-%m-%d %H:%M:%S]')} "
+                             f"[WARNING] log queue full, {_dropped} lines dropped")
+                _dropped = 0
+            if batch:
+                self._write(batch)
+            for w in waiters:
+                w.set()
+
+
+def _ensure_writer():
+    global _writer
+    if _writer is not None:
+        return
+    with _writer_lock:
+        if _writer is None:
+            _writer = _LogWriter()
+            _writer.start()
+
+
+def _shutdown():
+    if _writer is not None:
+        flush(timeout=2.0)
+        _writer.stopping = True
+
+
+atexit.register(_shutdown)
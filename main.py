@@ -1,33 +1,101 @@
+import sys
 import time
+import argparse
 from logger import log
-from http_utils import safe_request
-from sync_day import sync_day
-from config import BASE_URL
-
-
-def get_available_dates():
-    """Fetch available date folders from server."""
-    res = safe_request(BASE_URL + "list_dates")
-    if res is None:
-        log("Could not get date folder list")
-        return []
-    try:
-        return res.json()
-    except Exception:
-        return []
+from config import LOOP_INTERVAL, STATUS_PORT
+from sync_engine import SyncEngine, sync_all_days
+from import_utils import import_source
+import history_store
+from site_profiles import activate, get as get_profile, DEFAULT_NAME
 
 
 def main_loop():
     """
     A SINGLE cycle of sync.
-    GUI calls this repeatedly inside its own loop.
     """
-    dates = get_available_dates()
+    sync_all_days()
+
+
+def import_main(path, day=None, profile=DEFAULT_NAME):
+    site = get_profile(profile)
+    if site is None:
+        log(f"Unknown site profile: {profile}")
+        return 2
+    try:
+        with activate(site):
+            result = import_source(path, day=day)
+    except Exception as e:
+        log(f"Import of {path} failed: {e}")
+        return 1
+    for d, counts in result["days"].items():
+        print(f"{d}: {counts['data']} records, {counts['photos']} photos, {counts['originals']} originals")
+    print(f"{result['skipped']} already known, {result['failed']} failed")
+    return 1 if result["failed"] else 0
+
+
+def summary_main(year, profile=DEFAULT_NAME, rebuild=False):
+    site = get_profile(profile)
+    if site is None:
+        log(f"Unknown site profile: {profile}")
+        return 2
+    with activate(site):
+        if rebuild:
+            history_store.rebuild()
+        if year is None:
+            return 0
+        started = time.perf_counter()
+        summary = history_store.monthly_summary(year)
+        text = history_store.format_monthly_summary(summary)
+        elapsed = time.perf_counter() - started
+    print(text if summary["months"] else f"No cage history for {year} (run with --rebuild-history)")
+    log(f"Monthly summary of {year}: {len(summary['months'])} months in {elapsed * 1000:.0f} ms")
+    return 0
+
+
+def main(argv=None):
+    """Headless sync: runs the same SyncEngine the GUIs drive until Ctrl+C."""
+    parser = argparse.ArgumentParser(description="Daily sync without the GUI")
+    parser.add_argument("--once", action="store_true", help="run a single sync cycle and exit")
+    parser.add_argument("--interval", type=int, default=LOOP_INTERVAL, help="seconds between cycles")
+    parser.add_argument("--status-port", type=int, default=STATUS_PORT, help="localhost status endpoint port (0 disables)")
+    parser.add_argument("--import", dest="import_path", metavar="PATH",
+                        help="import an exported folder or zip of records and photos, then exit")
+    parser.add_argument("--day", help="day (YYYY-MM-DD) of imported files outside a day folder")
+    parser.add_argument("--profile", default=DEFAULT_NAME, help="site profile to import into or summarize")
+    parser.add_argument("--summary", type=int, metavar="YEAR",
+                        help="print monthly myna/local totals per place for YEAR from the cage history, then exit")
+    parser.add_argument("--rebuild-history", action="store_true",
+                        help="rebuild the cage history from all local and archived days first")
+    args = parser.parse_args(argv)
+
+    if args.import_path:
+        return import_main(args.import_path, args.day, args.profile)
+
+    if args.summary or args.rebuild_history:
+        return summary_main(args.summary, args.profile, args.rebuild_history)
+
+    if args.once:
+        main_loop()
+        return 0
+
+    engine = SyncEngine(interval=args.interval)
+    if args.status_port:
+        from status_server import StatusServer
+        StatusServer(engine, port=args.status_port).start()
+    engine.start()
+    try:
+        # short joins keep Ctrl+C responsive on Windows
+        while not engine.join(1.0):
+            pass
+    except KeyboardInterrupt:
+        log("Interrupted — stopping sync")
+        engine.stop()
+        engine.join(30)
+    return 0
 
-    if dates:
-        for day in dates:
-            sync_day(day)
-    else:
-        log("No new dates available.")
 
-    # DO NOT sleep here — GUI controls timing
+if __name__ == "__main__":
+    # the image preparation pool spawns worker processes from the frozen exe
+    import multiprocessing
+    multiprocessing.freeze_support()
+    sys.exit(main())
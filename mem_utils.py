@@ -0,0 +1,80 @@
+import os
+import sys
+import threading
+from logger import debug
+
+# Resident memory of this process, without psutil: GetProcessMemoryInfo on
+# Windows, /proc/self/statm elsewhere. PeakRss samples it on a thread while
+# a block runs, so the peak belongs to that block and not to the whole
+# process lifetime (PeakWorkingSetSize never goes down).
+
+SAMPLE_SECONDS = 0.02
+
+if sys.platform == "win32":
+    import ctypes
+    from ctypes import wintypes
+
+    class _PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    def current_rss():
+        counters = _PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return 0
+        return counters.WorkingSetSize
+else:
+    _PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def current_rss():
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * _PAGE
+        except Exception:
+            return 0
+
+
+class PeakRss:
+    """
+    with PeakRss() as m: ...   then m.start, m.peak and m.growth (bytes).
+    """
+
+    def __init__(self, interval=SAMPLE_SECONDS):
+        self.interval = interval
+        self.start = 0
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        self.start = self.peak = current_rss()
+        self._thread = threading.Thread(target=self._sample, name="rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+        debug(f"RSS {self.start / 1048576:.1f} MB -> peak {self.peak / 1048576:.1f} MB")
+        return False
+
+    @property
+    def growth(self):
+        return max(0, self.peak - self.start)
@@ -0,0 +1,148 @@
+import threading
+
+# Process-wide counters and gauges for the status endpoint.
+# Updates are a dict write under one lock, so instrumenting hot paths is cheap.
+
+_lock = threading.Lock()
+_counters = {}     # (name, labels) -> number
+_gauges = {}       # (name, labels) -> number
+_collectors = []   # callables returning [(name, value, labels_dict)] evaluated on read;
+                   # names ending in _total are reported as counters
+
+HELP = {
+    "sync_engine_running": "1 while the engine state is running",
+    "sync_engine_paused": "1 while the engine state is paused",
+    "sync_engine_busy": "1 while a sync cycle is in progress",
+    "sync_cycles_total": "Completed sync cycles",
+    "sync_last_cycle_seconds": "Duration of the last sync cycle",
+    "sync_active_days": "Days listed by the server in the last cycle",
+    "sync_downloads_total": "Files downloaded",
+    "sync_download_bytes_total": "Bytes downloaded",
+    "sync_downloads_in_flight": "Downloads currently in progress",
+    "sync_download_errors_total": "Downloads that failed",
+    "sync_request_errors_total": "HTTP requests that failed after retries",
+    "sync_push_wakeups_total": "Sync cycles woken by the change feed",
+    "record_store_ingested_total": "Record files ingested into the per-day record store",
+    "import_files_total": "Files seen by offline imports by result",
+    "local_changes_total": "Records and photos picked up from the local folder watch",
+    "notifications_total": "Desktop notifications by result (shown, coalesced, dropped, failed)",
+    "retention_archived_days_total": "Finalized days packed into an archive",
+    "retention_rehydrated_days_total": "Archived days unpacked again",
+    "retention_disk_bytes": "Disk used by the sync folder at the last retention pass",
+    "report_bytes": "Size of the last rendered report by component",
+    "report_media_stripped_total": "Unreferenced media removed from reports",
+    "profile_turns_total": "Sync turns per site profile",
+    "profile_turns_cut_total": "Turns that ended on the per-profile time limit",
+    "profile_turn_seconds": "Duration of the last turn per site profile",
+    "profile_downloads_total": "Files downloaded per site profile",
+    "profile_failures_total": "Turns that failed per site profile",
+    "render_total": "Partial renders by mode",
+    "render_last_seconds": "Duration of the last partial render",
+    "render_peak_rss_bytes": "Peak resident memory during the last render by mode",
+    "render_rss_growth_bytes": "Resident memory growth during the last render by mode",
+    "thumbnails_total": "Thumbnails by result",
+    "log_lines_total": "Log lines written by level",
+    "log_queue_depth": "Log lines waiting for the writer thread",
+    "event_queue_depth": "Undrained sync events across subscribers",
+}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    k = _key(name, labels)
+    with _lock:
+        _counters[k] = _counters.get(k, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def add_gauge(name, delta, **labels):
+    k = _key(name, labels)
+    with _lock:
+        _gauges[k] = _gauges.get(k, 0) + delta
+
+
+def get(name, **labels):
+    k = _key(name, labels)
+    with _lock:
+        return _counters.get(k, _gauges.get(k, 0))
+
+
+def total(name):
+    """Sum of a metric over all label values."""
+    with _lock:
+        return sum(v for (n, _), v in list(_counters.items()) + list(_gauges.items()) if n == name)
+
+
+def register_collector(fn):
+    if fn not in _collectors:
+        _collectors.append(fn)
+
+
+def unregister_collector(fn):
+    if fn in _collectors:
+        _collectors.remove(fn)
+
+
+def _collected():
+    rows = []
+    for fn in list(_collectors):
+        try:
+            rows.extend(fn())
+        except Exception:
+            pass
+    return rows
+
+
+def _read():
+    """(counters, gauges) including what the collectors report."""
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+    for name, value, labels in _collected():
+        (counters if name.endswith("_total") else gauges)[_key(name, labels)] = value
+    return counters, gauges
+
+
+def snapshot():
+    """{"counters": {...}, "gauges": {...}} keyed by 'name{label="v"}'."""
+    counters, gauges = _read()
+    return {
+        "counters": {_series(k): v for k, v in sorted(counters.items())},
+        "gauges": {_series(k): v for k, v in sorted(gauges.items())},
+    }
+
+
+def _series(key):
+    name, labels = key
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _escape(value):
+    """Label value escaped for the Prometheus text format."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text():
+    counters, gauges = _read()
+
+    lines = []
+    for kind, series in (("counter", counters), ("gauge", gauges)):
+        seen = set()
+        for key in sorted(series):
+            name = key[0]
+            if name not in seen:
+                seen.add(name)
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{_series(key)} {series[key]}")
+    return "\n".join(lines) + "\n"
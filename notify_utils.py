@@ -0,0 +1,196 @@
+import sys
+import time
+import threading
+from logger import log, debug
+from config import NOTIFY_QUEUE_SIZE, NOTIFY_COALESCE_SECONDS, NOTIFY_MIN_INTERVAL
+import metrics
+
+# Desktop notifications from one long-lived worker thread. notify() only
+# queues; the worker shows them through a backend picked once at start
+# (winotify, then plyer, then none). A notification waits
+# NOTIFY_COALESCE_SECONDS so a burst on the same topic (several shift
+# updates, startup messages) becomes one toast, and a topic is shown at most
+# every NOTIFY_MIN_INTERVAL seconds; what arrives meanwhile is merged into
+# its pending toast. At most NOTIFY_QUEUE_SIZE topics wait; later ones are
+# dropped.
+
+APP_ID = "DPC Word Automation"
+MAX_LINES = 3
+
+
+# -------------------------
+# Backends
+# -------------------------
+class WinotifyBackend:
+    name = "winotify"
+
+    def __init__(self):
+        from winotify import Notification, audio
+        self._notification = Notification
+        self._audio = audio
+
+    def show(self, title, msg):
+        toast = self._notification(app_id=APP_ID, title=title, msg=msg, duration="short")
+        toast.set_audio(self._audio.Default, loop=False)
+        toast.show()
+
+
+class PlyerBackend:
+    name = "plyer"
+
+    def __init__(self):
+        from plyer import notification
+        self._notification = notification
+
+    def show(self, title, msg):
+        self._notification.notify(title=title, message=msg, app_name=APP_ID, timeout=5)
+
+
+class NullBackend:
+    """Shows nothing; keeps the last notifications for tests and headless runs."""
+    name = "none"
+
+    def __init__(self, keep=50):
+        self.keep = keep
+        self.shown = []
+
+    def show(self, title, msg):
+        self.shown.append((title, msg))
+        del self.shown[:-self.keep]
+
+
+def available_backends():
+    """Usable backends, best first; NullBackend is always last."""
+    candidates = [WinotifyBackend] if sys.platform == "win32" else []
+    candidates.append(PlyerBackend)
+    backends = []
+    for cls in candidates:
+        try:
+            backends.append(cls())
+        except Exception as e:
+            debug(f"Notification backend {cls.name} unavailable: {e}")
+    backends.append(NullBackend())
+    return backends
+
+
+# -------------------------
+# Dispatcher
+# -------------------------
+class _Pending:
+    def __init__(self, title, msg, due):
+        self.title = title
+        self.messages = [msg]
+        self.due = due
+
+    def add(self, title, msg):
+        self.title = title
+        if msg not in self.messages:
+            self.messages.append(msg)
+
+    def text(self):
+        lines = self.messages[-MAX_LINES:]
+        hidden = len(self.messages) - len(lines)
+        return "\n".join(lines) + (f"\n(+{hidden} more)" if hidden else "")
+
+
+class Notifier:
+    """
+    n = Notifier(); n.start(); n.notify(title, msg, topic=None)
+    topic defaults to title; notifications with the same topic are merged.
+    """
+
+    def __init__(self, backends=None, maxsize=NOTIFY_QUEUE_SIZE, coalesce=NOTIFY_COALESCE_SECONDS,
+                 min_interval=NOTIFY_MIN_INTERVAL):
+        self._backends = backends
+        self.maxsize = maxsize
+        self.coalesce = coalesce
+        self.min_interval = min_interval
+        self._cond = threading.Condition()
+        self._pending = {}      # topic -> _Pending, in arrival order
+        self._last_shown = {}   # topic -> monotonic time
+        self._stopping = False
+        self._thread = None
+
+    @property
+    def backend(self):
+        return self._backends[0] if self._backends else None
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return self
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="notifier", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        """Stops the worker once what is pending has been shown (or timeout passed)."""
+        with self._cond:
+            self._stopping = True
+            thread = self._thread
+            self._cond.notify_all()
+        if thread is not None:
+            thread.join(timeout)
+
+    def notify(self, title, msg, topic=None):
+        topic = topic or title
+        now = time.monotonic()
+        with self._cond:
+            pending = self._pending.get(topic)
+            if pending is not None:
+                pending.add(title, msg)
+                metrics.inc("notifications_total", result="coalesced")
+                return True
+            if len(self._pending) >= self.maxsize:
+                metrics.inc("notifications_total", result="dropped")
+                debug(f"Notification queue full, dropped: {title}")
+                return False
+            due = max(now + self.coalesce, self._last_shown.get(topic, float("-inf")) + self.min_interval)
+            self._pending[topic] = _Pending(title, msg, due)
+            self._cond.notify_all()
+        return True
+
+    def _next_due(self, now, flush):
+        """(topic, pending) ready to show, or (None, seconds to wait)."""
+        if not self._pending:
+            return None, None
+        topic = min(self._pending, key=lambda t: self._pending[t].due)
+        wait = self._pending[topic].due - now
+        if wait <= 0 or flush:
+            return topic, self._pending.pop(topic)
+        return None, wait
+
+    def _run(self):
+        if self._backends is None:
+            self._backends = available_backends()
+        log(f"Notifications via {self.backend.name}")
+        while True:
+            with self._cond:
+                while True:
+                    topic, item = self._next_due(time.monotonic(), self._stopping)
+                    if topic is not None:
+                        break
+                    if self._stopping:
+                        self._thread = None
+                        return
+                    self._cond.wait(item)
+                self._last_shown[topic] = time.monotonic()
+            self._show(item.title, item.text())
+
+    def _show(self, title, msg):
+        while True:
+            backend = self.backend
+            try:
+                backend.show(title, msg)
+                metrics.inc("notifications_total", result="shown")
+                debug(f"Notification via {backend.name}: {title}")
+                return
+            except Exception as e:
+                metrics.inc("notifications_total", result="failed")
+                if len(self._backends) == 1:
+                    log(f"Notification error: {e}")
+                    return
+                # a backend that fails once is not tried again
+                self._backends.pop(0)
+                log(f"Notification backend {backend.name} failed ({e}); using {self.backend.name}")
@@ -0,0 +1,217 @@
+import os
+import json
+import hashlib
+import zipfile
+import threading
+from config import KEEP_RAW_RECORDS
+from logger import log
+from site_profiles import current
+import metrics
+
+# One append-only JSONL file per day instead of a folder of tiny record files:
+#
+#     <profile local_dir>/<day>/records.jsonl
+#     {"name": "<file>.json", "size": n, "sha256": "...", "record": {...}}
+#
+# Reading a day is one sequential pass. The offset index (name -> line
+# offset) is rebuilt from that pass and kept in memory, so single records
+# are a seek + readline. A record re-uploaded with different content is
+# appended again; the last line for a name wins.
+
+STORE_NAME = "records.jsonl"
+
+_lock = threading.RLock()
+_index = {}      # store path -> {"size": file size indexed, "entries": {name: (offset, size, sha256)}}
+_imported = set()   # store paths whose loose data/ files were imported
+
+
+def store_path(day):
+    return os.path.join(current().local_dir, day, STORE_NAME)
+
+
+def _scan(day):
+    """Builds the offset index of day's store in one pass; drops a torn last line."""
+    path = store_path(day)
+    entries = {}
+    good_end = 0
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            offset = 0
+            for line in f:
+                end = offset + len(line)
+                try:
+                    row = json.loads(line)
+                    entries[row["name"]] = (offset, row.get("size"), row.get("sha256"))
+                    good_end = end
+                except Exception:
+                    # only the last line can be partial (crash mid-append)
+                    if end == os.fstat(f.fileno()).st_size:
+                        break
+                    log(f"Skipping unreadable line at {offset} in {path}")
+                    good_end = end
+                offset = end
+        if good_end < os.path.getsize(path):
+            log(f"Truncating partial record at end of {path}")
+            with open(path, "r+b") as f:
+                f.truncate(good_end)
+    _index[path] = {"size": good_end, "entries": entries}
+    return entries
+
+
+def _entries(day):
+    path = store_path(day)
+    cached = _index.get(path)
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    if cached is None or cached["size"] != size:
+        return _scan(day)
+    return cached["entries"]
+
+
+def _append(day, name, raw):
+    """Appends raw record bytes of name unless the same content is stored already."""
+    record = json.loads(raw)
+    sha = hashlib.sha256(raw).hexdigest()
+    entries = _entries(day)
+    if name in entries and entries[name][2] == sha:
+        return False
+    line = json.dumps({"name": name, "size": len(raw), "sha256": sha, "record": record},
+                      ensure_ascii=False).encode("utf-8") + b"\n"
+    path = store_path(day)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "ab") as f:
+        offset = f.tell()
+        f.write(line)
+    entries[name] = (offset, len(raw), sha)
+    _index[path]["size"] = offset + len(line)
+    metrics.inc("record_store_ingested_total")
+    return True
+
+
+def ingest_bytes(day, name, raw):
+    """Stores raw record bytes under name; False when the same content was stored already."""
+    with _lock:
+        return _append(day, name, raw)
+
+
+def ingest_file(day, name, path, keep_raw=KEEP_RAW_RECORDS):
+    """
+    Moves a downloaded record file into day's store; the raw file is kept only for audit.
+    False when the same content was stored already.
+    """
+    with _lock:
+        with open(path, "rb") as f:
+            raw = f.read()
+        added = _append(day, name, raw)
+    if not keep_raw:
+        try:
+            os.remove(path)
+        except OSError as e:
+            log(f"Could not remove ingested {path}: {e}")
+    return added
+
+
+def _import_raw(day):
+    """Ingests loose data/*.json files once per day (folders from before the store)."""
+    key = store_path(day)
+    if key in _imported:
+        return
+    _imported.add(key)
+    folder = os.path.join(current().local_dir, day, "data")
+    if not os.path.isdir(folder):
+        return
+    names = sorted(n for n in os.listdir(folder) if n.lower().endswith(".json"))
+    if not names:
+        return
+    entries = _entries(day)
+    added = 0
+    for name in names:
+        path = os.path.join(folder, name)
+        try:
+            if name in entries and not KEEP_RAW_RECORDS:
+                os.remove(path)
+                continue
+            if name not in entries:
+                ingest_file(day, name, path)
+                added += 1
+        except Exception as e:
+            log(f"Could not import {path} into record store: {e}")
+    if added:
+        log(f"Imported {added} record files of {day} into {STORE_NAME}")
+
+
+def _row_record(row):
+    rec = row["record"]
+    rec["_filename"] = row["name"]
+    return rec
+
+
+def load_records(day):
+    """All records of day, ordered by file name, each with "_filename" set."""
+    with _lock:
+        _import_raw(day)
+        path = store_path(day)
+        if not os.path.exists(path):
+            return []
+        with open(path, "rb") as f:
+            return _latest_records(f)
+
+
+def _latest_records(lines):
+    latest = {}
+    for line in lines:
+        try:
+            row = json.loads(line)
+        except Exception:
+            continue
+        latest[row["name"]] = row
+    return [_row_record(latest[n]) for n in sorted(latest)]
+
+
+def load_archived_records(archive):
+    """Records of an archived day straight from its zip (retention_utils), without unpacking it."""
+    with zipfile.ZipFile(archive) as z:
+        if STORE_NAME not in z.namelist():
+            return []
+        with z.open(STORE_NAME) as f:
+            return _latest_records(f)
+
+
+def get_records(day, names):
+    """Records of day for the given file names via the offset index; missing names are skipped."""
+    with _lock:
+        _import_raw(day)
+        entries = _entries(day)
+        wanted = [(entries[n][0], n) for n in names if n in entries]
+        if not wanted:
+            return []
+        records = []
+        with open(store_path(day), "rb") as f:
+            for offset, name in sorted(wanted):
+                f.seek(offset)
+                try:
+                    records.append(_row_record(json.loads(f.readline())))
+                except Exception as e:
+                    log(f"Could not read {name} from record store: {e}")
+    return records
+
+
+def stored_hash(day, name):
+    """(size, sha256) of the raw file stored for name, or None."""
+    with _lock:
+        _import_raw(day)
+        entry = _entries(day).get(name)
+    return (entry[1], entry[2]) if entry else None
+
+
+def known_hashes(day):
+    """sha256 -> name of every record content stored for day."""
+    with _lock:
+        _import_raw(day)
+        return {sha: name for name, (_, _, sha) in _entries(day).items()}
+
+
+def forget_day(day):
+    """Drops the cached index of day (after its store was moved or deleted)."""
+    with _lock:
+        _index.pop(store_path(day), None)
+        _imported.discard(store_path(day))
@@ -0,0 +1,200 @@
+import io
+import os
+import zipfile
+import posixpath
+from lxml import etree
+from PIL import Image
+from logger import log, debug
+from config import REPORT_SIZE_BUDGET_KB, REPORT_BUDGET_STEPS
+from xml_utils import write_docx_members, JPEG_MAGIC
+import metrics
+from site_profiles import current
+
+CT_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+
+_template_media = {}   # (path, mtime) -> set of word/media names
+
+
+def template_media(template_path=None):
+    """Media member names shipped in the template (the current profile's by default)."""
+    template_path = template_path or current().template
+    try:
+        key = (template_path, os.path.getmtime(template_path))
+    except OSError:
+        return set()
+    if key not in _template_media:
+        with zipfile.ZipFile(template_path) as z:
+            _template_media[key] = {n for n in z.namelist() if n.startswith("word/media/")}
+    return _template_media[key]
+
+
+def component_of(name, tmpl_media):
+    if name.startswith("word/media/"):
+        return "template_media" if name in tmpl_media else "photos"
+    if name.endswith((".xml", ".rels")):
+        return "xml"
+    return "other"
+
+
+def component_sizes(docx_path, tmpl_media=None):
+    """Compressed bytes per component (xml, template_media, photos, other) plus the file total."""
+    if tmpl_media is None:
+        tmpl_media = template_media()
+    sizes = {"xml": 0, "template_media": 0, "photos": 0, "other": 0}
+    with zipfile.ZipFile(docx_path) as z:
+        for info in z.infolist():
+            sizes[component_of(info.filename, tmpl_media)] += info.compress_size
+    sizes["total"] = os.path.getsize(docx_path)
+    return sizes
+
+
+def _format_sizes(sizes):
+    return ", ".join(f"{k} {v / 1024:.1f} KB" for k, v in sizes.items())
+
+
+def _rels_source(rels_name):
+    """word/_rels/document.xml.rels -> word/document.xml"""
+    folder, fname = posixpath.split(rels_name)
+    return posixpath.join(posixpath.dirname(folder), fname[:-len(".rels")])
+
+
+def strip_unreferenced_media(members):
+    """
+    Drops image relationships whose id the owning part no longer uses (a
+    template picture replaced by a placeholder value) and then every
+    word/media member no relationship points to. Returns (members, removed names).
+    """
+    data = dict(members)
+    targets = set()
+    changed = {}
+    for name, content in members:
+        if not name.endswith(".rels"):
+            continue
+        source = _rels_source(name)
+        part = data.get(source)
+        try:
+            root = etree.fromstring(content)
+        except Exception:
+            return members, []
+        dropped = False
+        for rel in list(root):
+            if rel.get("TargetMode") == "External":
+                continue
+            target = posixpath.normpath(posixpath.join(posixpath.dirname(source), rel.get("Target", "")))
+            if rel.get("Type", "").endswith("/image") and part is not None \
+                    and f'"{rel.get("Id")}"'.encode("utf-8") not in part:
+                root.remove(rel)
+                dropped = True
+                continue
+            targets.add(target)
+        if dropped:
+            changed[name] = etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+
+    removed = [n for n in data if n.startswith("word/media/") and n not in targets]
+    if not removed and not changed:
+        return members, []
+    gone = set(removed)
+    result = []
+    for name, content in members:
+        if name in gone:
+            continue
+        if name == "[Content_Types].xml":
+            content = _drop_overrides(content, gone)
+        result.append((name, changed.get(name, content)))
+    return result, removed
+
+
+def _drop_overrides(content, gone):
+    root = etree.fromstring(content)
+    for el in root.findall("{%s}Override" % CT_NS):
+        if el.get("PartName", "").lstrip("/") in gone:
+            root.remove(el)
+    return etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+
+
+def _reencode(data, quality, scale):
+    """JPEG at quality, pixel size times scale; None when not smaller or not a JPEG."""
+    if not data.startswith(JPEG_MAGIC):
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img = img.convert("RGB")
+            if scale < 1:
+                img = img.resize((max(1, int(img.width * scale)), max(1, int(img.height * scale))), Image.LANCZOS)
+            buf = io.BytesIO()
+            img.save(buf, "JPEG", quality=quality, optimize=True)
+    except Exception as e:
+        debug(f"Could not re-encode report photo: {e}")
+        return None
+    out = buf.getvalue()
+    return out if len(out) < len(data) else None
+
+
+def _packed(members):
+    buf = io.BytesIO()
+    write_docx_members(buf, members)
+    return buf.getvalue()
+
+
+def optimize_report(docx_path, budget_kb=REPORT_SIZE_BUDGET_KB):
+    """
+    Shrinks a rendered report in place: strips media nothing references and,
+    while the file is over budget_kb, re-encodes embedded photos through
+    REPORT_BUDGET_STEPS [(quality, scale), ...]. Template media is never
+    re-encoded and document XML is left byte-identical, so slot maps stay
+    valid. budget_kb=None only strips (the re-encode is lossy, so it is run
+    on freshly embedded photos, not again on every incremental patch).
+    Logs the size per component before and after; returns the new size.
+    """
+    tmpl_media = template_media()
+    before = component_sizes(docx_path, tmpl_media)
+    with zipfile.ZipFile(docx_path) as z:
+        members = [(n, z.read(n)) for n in z.namelist()]
+
+    stripped, removed = strip_unreferenced_media(members)
+    packed = _packed(stripped) if stripped is not members else None
+    members = stripped
+    size = len(packed) if packed is not None else before["total"]
+    budget = budget_kb * 1024 if budget_kb else None
+    step_used = None
+    if budget and size > budget:
+        photos = {n: d for n, d in members if component_of(n, tmpl_media) == "photos"}
+        for quality, scale in REPORT_BUDGET_STEPS:
+            shrunk = {n: _reencode(d, quality, scale) for n, d in photos.items()}
+            packed = _packed([(n, shrunk.get(n) or d) for n, d in members])
+            step_used = (quality, scale)
+            if len(packed) <= budget:
+                break
+
+    if packed is None:
+        debug(f"Report size: {_format_sizes(before)}")
+        _record(before)
+        return before["total"]
+
+    # .docx.part, so sweep_temp_artifacts removes it after a crash
+    tmp_path = docx_path + ".part"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(packed)
+        os.replace(tmp_path, docx_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    after = component_sizes(docx_path, tmpl_media)
+    _record(after)
+    if removed:
+        metrics.inc("report_media_stripped_total", len(removed))
+    log(f"Report size {os.path.basename(docx_path)}: {before['total'] / 1024:.1f} KB -> "
+        f"{after['total'] / 1024:.1f} KB ({len(removed)} unreferenced media removed"
+        + (f", photos at quality {step_used[0]} scale {step_used[1]}" if step_used else "") + ")")
+    log(f"  before: {_format_sizes(before)}")
+    log(f"  after:  {_format_sizes(after)}")
+    if budget and after["total"] > budget:
+        log(f"Report {os.path.basename(docx_path)} is {after['total'] / 1024:.0f} KB, over the "
+            f"{budget_kb} KB budget after the last optimization step")
+    return after["total"]
+
+
+def _record(sizes):
+    for component, value in sizes.items():
+        metrics.set_gauge("report_bytes", value, component=component)
@@ -0,0 +1,264 @@
+import os
+import json
+import io
+import re
+import time
+import shutil
+import zipfile
+from datetime import datetime, timedelta
+from PIL import Image
+from logger import log, debug
+from config import ARCHIVE_AFTER_DAYS, ARCHIVE_JPEG_QUALITY
+from config import DISK_BUDGET_MB, RETENTION_INTERVAL, TEMP_SWEEP_MIN_AGE, FETCH_ORIGINALS
+from db_utils import save_download_db, render_state_path
+from image_utils import is_thumbnail
+from cancel_utils import check_cancelled
+import record_store
+from site_profiles import current
+import metrics
+
+# Finalized days are packed into <profile archive_dir>/<day>.zip: the record store, the
+# photos (re-encoded at ARCHIVE_JPEG_QUALITY when that is smaller) and any
+# raw records. Server clean-up does not hold a day back: the verified and
+# server_deleted bookkeeping stays in its db entry and archived_files()
+# lets the clean-up keep going from the archive. Derived files (_162 thumbnails, render state, updates
+# mapping) are not archived; a re-render rebuilds them. records/<day> is then
+# removed, and rehydrate_day() unpacks it again when the day is needed. A
+# re-hydrated day is packed again from scratch (it may have new records),
+# without a second lossy re-encode of its photos.
+
+_DAY_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_JPEG_EXT = (".jpg", ".jpeg")
+
+
+def archive_path(day):
+    return os.path.join(current().archive_dir, f"{day}.zip")
+
+
+def local_days():
+    """Day folders of the current profile currently unpacked."""
+    local_dir = current().local_dir
+    if not os.path.isdir(local_dir):
+        return []
+    return sorted(d for d in os.listdir(local_dir)
+                  if _DAY_RE.match(d) and os.path.isdir(os.path.join(local_dir, d)))
+
+
+def dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for f in files:
+            try:
+                total += os.path.getsize(os.path.join(root, f))
+            except OSError:
+                pass
+    return total
+
+
+# -------------------------
+# Orphaned temp artifacts
+# -------------------------
+def sweep_temp_artifacts(min_age=TEMP_SWEEP_MIN_AGE):
+    """
+    Removes what a crashed render leaves in the output folder: temp_text_*.docx,
+    *_tmp_<uuid> extraction folders and *.patch / *.part files. Only entries older
+    than min_age seconds are touched, so a render in progress is safe.
+    """
+    output_dir = current().output_dir
+    if not os.path.isdir(output_dir):
+        return 0
+    cutoff = time.time() - min_age
+    removed = 0
+    for name in os.listdir(output_dir):
+        path = os.path.join(output_dir, name)
+        orphan = (name.startswith("temp_text_") and name.endswith(".docx")) \
+            or "_tmp_" in name or name.endswith((".docx.patch", ".docx.part"))
+        if not orphan:
+            continue
+        try:
+            if os.path.getmtime(path) > cutoff:
+                continue
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+            removed += 1
+        except OSError as e:
+            log(f"Could not remove orphaned {path}: {e}")
+    if removed:
+        log(f"Removed {removed} orphaned temp files from {output_dir}")
+    return removed
+
+
+def startup_sweep():
+    """sweep_temp_artifacts once per process for the current profile."""
+    scratch = current().scratch
+    if not scratch.get("swept"):
+        scratch["swept"] = True
+        sweep_temp_artifacts()
+
+
+# -------------------------
+# Archive / re-hydrate
+# -------------------------
+def _recompressed(path):
+    """JPEG bytes at ARCHIVE_JPEG_QUALITY if smaller than the file, else None."""
+    try:
+        with Image.open(path) as img:
+            if img.format != "JPEG":
+                return None
+            buf = io.BytesIO()
+            exif = img.info.get("exif")
+            img.save(buf, "JPEG", quality=ARCHIVE_JPEG_QUALITY, optimize=True, **({"exif": exif} if exif else {}))
+    except Exception as e:
+        debug(f"Not recompressing {path}: {e}")
+        return None
+    data = buf.getvalue()
+    return data if len(data) < os.path.getsize(path) else None
+
+
+def archive_day(db, day, cancel=None):
+    """Packs records/<day> into its archive and removes the folder; returns bytes freed."""
+    src = os.path.join(current().local_dir, day)
+    if not os.path.isdir(src):
+        return 0
+    before = dir_size(src)
+    recompress = not db[day].get("recompressed")
+    os.makedirs(current().archive_dir, exist_ok=True)
+    target = archive_path(day)
+    tmp = target + ".part"
+    try:
+        with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as z:
+            for root, _, files in os.walk(src):
+                for f in sorted(files):
+                    check_cancelled(cancel)
+                    path = os.path.join(root, f)
+                    arcname = os.path.relpath(path, src).replace(os.sep, "/")
+                    if is_thumbnail(f):
+                        continue
+                    if f.lower().endswith(_JPEG_EXT):
+                        # JPEG does not deflate; store it, smaller when re-encoded
+                        data = _recompressed(path) if recompress else None
+                        if data is not None:
+                            z.writestr(arcname, data, zipfile.ZIP_STORED)
+                        else:
+                            z.write(path, arcname, zipfile.ZIP_STORED)
+                    else:
+                        z.write(path, arcname)
+        os.replace(tmp, target)
+        shutil.rmtree(src)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    record_store.forget_day(day)
+    _drop_caches(day)
+    db[day]["archived"] = os.path.basename(target)
+    db[day]["recompressed"] = True
+    save_download_db(db)
+    freed = before - os.path.getsize(target)
+    metrics.inc("retention_archived_days_total")
+    log(f"Archived {day}: {before // 1024} KB -> {os.path.getsize(target) // 1024} KB ({os.path.basename(target)})")
+    return freed
+
+
+def archived_files(day):
+    """
+    {key: sha256} of what an archived day's zip holds, keyed like the download
+    db's "verified" map: data/<name> with the stored record's hash, photos/
+    and originals/ members with None (their bytes may have been re-encoded).
+    """
+    result = {}
+    with zipfile.ZipFile(archive_path(day)) as z:
+        for name in z.namelist():
+            if name.startswith(("photos/", "originals/")):
+                result[name] = None
+        if record_store.STORE_NAME in z.namelist():
+            with z.open(record_store.STORE_NAME) as f:
+                for line in f:
+                    try:
+                        row = json.loads(line)
+                    except Exception:
+                        continue
+                    result[f"data/{row['name']}"] = row.get("sha256")
+    return result
+
+
+def _drop_caches(day):
+    for path in (render_state_path(day), os.path.join(current().output_dir, f"updates_{day}.json")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def rehydrate_day(db, day):
+    """Unpacks an archived day back into records/<day>; True when the day is local."""
+    entry = db.get(day)
+    if not isinstance(entry, dict) or not entry.get("archived"):
+        return True
+    dest = os.path.join(current().local_dir, day)
+    src = os.path.join(current().archive_dir, entry["archived"])
+    try:
+        with zipfile.ZipFile(src) as z:
+            z.extractall(dest)
+    except Exception as e:
+        log(f"Could not re-hydrate {day} from {src}: {e}")
+        shutil.rmtree(dest, ignore_errors=True)
+        return False
+    record_store.forget_day(day)
+    # the archive stays until the day is packed again
+    entry.pop("archived")
+    save_download_db(db)
+    metrics.inc("retention_rehydrated_days_total")
+    log(f"Re-hydrated {day} from {os.path.basename(src)}")
+    return True
+
+
+# -------------------------
+# Policy
+# -------------------------
+def archivable(db, day, pending_originals):
+    """Finalized and nothing left to fetch; server clean-up may still be pending."""
+    entry = db.get(day)
+    if not isinstance(entry, dict) or not entry.get("finalized"):
+        return False
+    return FETCH_ORIGINALS == "never" or not pending_originals(day)
+
+
+def apply_retention(db, pending_originals, cancel=None, force=False):
+    """
+    Archives finalized days older than ARCHIVE_AFTER_DAYS, then, while
+    the profile's sync folder is over DISK_BUDGET_MB, archives younger finalized days (oldest
+    first). Runs at most every RETENTION_INTERVAL seconds unless force.
+    Re-hydrated days are packed again by the same rules.
+    """
+    scratch = current().scratch
+    if not force and time.monotonic() < scratch.get("retention_next_run", 0.0):
+        return 0
+    scratch["retention_next_run"] = time.monotonic() + RETENTION_INTERVAL
+
+    cutoff = (datetime.now() - timedelta(days=ARCHIVE_AFTER_DAYS)).strftime("%Y-%m-%d")
+    candidates = [d for d in local_days() if archivable(db, d, pending_originals)]
+    freed = 0
+    for day in candidates:
+        if day < cutoff:
+            check_cancelled(cancel)
+            freed += archive_day(db, day, cancel)
+
+    if DISK_BUDGET_MB:
+        budget = DISK_BUDGET_MB * 1024 * 1024
+        used = dir_size(current().sync_dir)
+        metrics.set_gauge("retention_disk_bytes", used, profile=current().name)
+        for day in candidates:
+            if used <= budget:
+                break
+            if day >= cutoff:
+                check_cancelled(cancel)
+                gained = archive_day(db, day, cancel)
+                used -= gained
+                freed += gained
+        if used > budget:
+            log(f"Disk budget exceeded: {used // (1024 * 1024)} MB used of {DISK_BUDGET_MB} MB; "
+                f"no more finalized days to archive")
+    return freed
@@ -0,0 +1,138 @@
+import os
+import json
+import threading
+from contextlib import contextmanager
+from logger import log
+from config import APPDATA_DIR, SYNC_DIR, BASE_URL, TEMPLATE_ORIG, OUTPUT_DIR, PROFILES_FILE, PUSH_CHANGES
+
+# A site profile is one project served by this install: its own server URL,
+# report template, site registry (places -> cages, place codes) and folders.
+# The engine runs each enabled profile in turn; code that used the config
+# globals (BASE_URL, LOCAL_DIR, OUTPUT_DIR, TEMPLATE_ORIG, ...) reads them
+# from current(), the profile active on the calling thread. Threads that
+# never activate one (the GUI, the status endpoint) see the default profile,
+# which uses exactly the paths the app used before profiles existed.
+#
+# profiles.json (APPDATA_DIR):
+#     {"profiles": [{"name": "lusail", "base_url": "https://.../records/",
+#                    "template": "C:/.../lusail.docx", "output_dir": "D:/Reports/Lusail",
+#                    "registry": "C:/.../lusail_sites.json", "push": true, "enabled": true}]}
+#
+# A registry file holds {"places": {"<place>": [cage, ...]}, "codes": {"<place>": "<code>"}};
+# without one a profile uses the built-in registry.
+
+DEFAULT_NAME = "default"
+
+
+class SiteProfile:
+    def __init__(self, name, base_url, template, sync_dir, output_dir=None, registry=None,
+                 push=PUSH_CHANGES, enabled=True):
+        self.name = name
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self.template = template
+        self.sync_dir = sync_dir
+        self.local_dir = os.path.join(sync_dir, "records")
+        self.default_output_dir = os.path.join(self.local_dir, "reports")
+        self.output_dir = output_dir or self.default_output_dir
+        self.downloaded_db = os.path.join(sync_dir, "downloaded_files.json")
+        self.render_state_dir = os.path.join(sync_dir, "render_state")
+        self.archive_dir = os.path.join(sync_dir, "archive")
+        self.push = push
+        self.enabled = enabled
+        self.places, self.codes = load_registry(registry) if registry else (None, None)
+        # per-profile runtime state owned by sync_day / retention_utils
+        self.download_db = None
+        self.shift_states = {}
+        self.scratch = {}
+        os.makedirs(self.local_dir, exist_ok=True)
+        os.makedirs(self.render_state_dir, exist_ok=True)
+
+    def total_placeholders(self):
+        """{"<place>_<shift>": (total, myna, local)} for the registry codes, or None."""
+        if not self.codes:
+            return None
+        return {
+            f"{place}_{shift}": (f"({shift}{code}t)", f"({shift}{code}m)", f"({shift}{code}l)")
+            for place, code in self.codes.items() for shift in ("1", "2")
+        }
+
+    def __repr__(self):
+        return f"SiteProfile({self.name!r}, {self.base_url!r})"
+
+
+def load_registry(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    places = {name: [int(c) for c in cages] for name, cages in data.get("places", {}).items()}
+    return places, dict(data.get("codes", {}))
+
+
+def _load_profiles():
+    profiles = [SiteProfile(DEFAULT_NAME, BASE_URL, TEMPLATE_ORIG, SYNC_DIR, OUTPUT_DIR)]
+    if not os.path.exists(PROFILES_FILE):
+        return profiles
+    try:
+        with open(PROFILES_FILE, "r", encoding="utf-8") as f:
+            entries = json.load(f).get("profiles", [])
+    except Exception as e:
+        log(f"Could not read {PROFILES_FILE}: {e}")
+        return profiles
+    for entry in entries:
+        name = entry.get("name")
+        try:
+            if name == DEFAULT_NAME:
+                # overrides for the default profile keep its folders
+                base = profiles[0]
+                profiles[0] = SiteProfile(
+                    DEFAULT_NAME, entry.get("base_url", base.base_url), entry.get("template", base.template),
+                    SYNC_DIR, entry.get("output_dir", OUTPUT_DIR), entry.get("registry"),
+                    entry.get("push", PUSH_CHANGES), entry.get("enabled", True)
+                )
+                continue
+            profiles.append(SiteProfile(
+                name, entry["base_url"], entry.get("template", TEMPLATE_ORIG),
+                os.path.join(APPDATA_DIR, "sites", name, "sync"), entry.get("output_dir"),
+                entry.get("registry"), entry.get("push", PUSH_CHANGES), entry.get("enabled", True)
+            ))
+        except Exception as e:
+            log(f"Skipping site profile {name!r}: {e}")
+    log(f"Site profiles: {', '.join(p.name for p in profiles if p.enabled)}")
+    return profiles
+
+
+_profiles = _load_profiles()
+_local = threading.local()
+
+
+def all_profiles():
+    return list(_profiles)
+
+
+def enabled_profiles():
+    return [p for p in _profiles if p.enabled]
+
+
+def get(name):
+    for p in _profiles:
+        if p.name == name:
+            return p
+    return None
+
+
+def default():
+    return _profiles[0]
+
+
+def current():
+    """The profile active on this thread (the default profile unless one was activated)."""
+    return getattr(_local, "profile", None) or _profiles[0]
+
+
+@contextmanager
+def activate(profile):
+    previous = getattr(_local, "profile", None)
+    _local.profile = profile
+    try:
+        yield profile
+    finally:
+        _local.profile = previous
@@ -0,0 +1,223 @@
+import os
+import zipfile
+from xml.sax.saxutils import escape
+from lxml import etree
+from logger import log
+from xml_utils import W_NS, write_docx_members
+from fingerprint_utils import template_info
+
+
+# Slot map of a rendered partial report.
+#
+# A "slot" is the byte range inside a rendered XML part that holds the text
+# of one template paragraph after placeholder substitution.  With the slot
+# map the next render can splice new values straight into the previous docx
+# instead of starting again from template.docx.
+#
+#   {"template_hash": ...,
+#    "parts": {"word/document.xml": [[start, end, template_text, text, preserve], ...]},
+#    "invalid": [template_text, ...]}   # paragraphs with placeholders we could not map
+
+XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+_SENTINEL_OPEN = "\ue000"
+_SENTINEL_CLOSE = "\ue001"
+
+# template hash -> {part: [(paragraph_index, text), ...]}
+_paragraph_cache = {}
+
+
+def is_text_part(name):
+    if not (name.startswith("word/") and name.endswith(".xml")):
+        return False
+    base = os.path.basename(name)
+    return base == "document.xml" or base.startswith("header") or base.startswith("footer")
+
+
+def paragraph_text(p):
+    return "".join(t.text or "" for t in p.iter(W_NS + "t"))
+
+
+def template_paragraphs(template_path):
+    """Text of every paragraph of every text part of the template, by document order."""
+    info = template_info(template_path)
+    cached = _paragraph_cache.get(info["hash"])
+    if cached is not None:
+        return cached
+
+    result = {}
+    with zipfile.ZipFile(template_path, "r") as z:
+        for name in z.namelist():
+            if not is_text_part(name):
+                continue
+            root = etree.fromstring(z.read(name))
+            result[name] = [(i, paragraph_text(p)) for i, p in enumerate(root.iter(W_NS + "p"))]
+
+    _paragraph_cache.clear()
+    _paragraph_cache[info["hash"]] = result
+    return result
+
+
+def mentions(text, key):
+    """True if text contains key or, for (key), its bare variant."""
+    if key in text:
+        return True
+    return key.startswith("(") and key.endswith(")") and len(key) > 2 and key[1:-1] in text
+
+
+def expected_paragraph_text(text, mapping):
+    """
+    Text a template paragraph ends up with after a full render: first the
+    python-docx pass replaces the mapping keys, then the XML pass also
+    replaces the bare (unparenthesized) variants.
+    """
+    for key, val in mapping.items():
+        if key in text:
+            text = text.replace(key, str(val))
+    for key, val in mapping.items():
+        if key.startswith("(") and key.endswith(")"):
+            bare = key[1:-1]
+            if bare and bare in text:
+                text = text.replace(bare, str(val))
+    return text
+
+
+def index_slots(docx_path, template_path, mapping):
+    """
+    Locate the slots of a freshly rendered docx and rewrite its text parts so
+    the recorded byte ranges match the file on disk. Returns the slot map.
+    """
+    paragraphs = template_paragraphs(template_path)
+    keys = [k for k in mapping.keys() if k]
+
+    with zipfile.ZipFile(docx_path, "r") as z:
+        members = [(name, z.read(name)) for name in z.namelist()]
+
+    slot_parts = {}
+    invalid = []
+    new_members = []
+    for name, data in members:
+        tpl_paras = paragraphs.get(name)
+        if not tpl_paras:
+            new_members.append((name, data))
+            continue
+
+        candidates = [(i, t) for i, t in tpl_paras if any(mentions(t, k) for k in keys)]
+        if not candidates:
+            new_members.append((name, data))
+            continue
+
+        root = etree.fromstring(data)
+        out_paras = list(root.iter(W_NS + "p"))
+        if len(out_paras) != len(tpl_paras):
+            log(f"Slot index: paragraph count changed in {name}, no slots recorded")
+            invalid.extend(t for _, t in candidates)
+            new_members.append((name, data))
+            continue
+
+        slots = []
+        for i, tpl_text in candidates:
+            expected = expected_paragraph_text(tpl_text, mapping)
+            filled = [t for t in out_paras[i].iter(W_NS + "t") if t.text]
+            if len(filled) != 1 or filled[0].text != expected:
+                invalid.append(tpl_text)
+                continue
+            preserve = filled[0].get(XML_SPACE) == "preserve"
+            filled[0].text = f"{_SENTINEL_OPEN}{len(slots)}{_SENTINEL_CLOSE}"
+            slots.append([0, 0, tpl_text, expected, preserve])
+
+        if not slots:
+            new_members.append((name, data))
+            continue
+
+        raw = etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+        pieces = []
+        pos = 0
+        size = 0
+        for n, slot in enumerate(slots):
+            marker = f"{_SENTINEL_OPEN}{n}{_SENTINEL_CLOSE}".encode("utf-8")
+            at = raw.index(marker, pos)
+            pieces.append(raw[pos:at])
+            size += at - pos
+            value = escape(slot[3]).encode("utf-8")
+            slot[0] = size
+            slot[1] = size + len(value)
+            pieces.append(value)
+            size += len(value)
+            pos = at + len(marker)
+        pieces.append(raw[pos:])
+
+        slot_parts[name] = slots
+        new_members.append((name, b"".join(pieces)))
+
+    write_docx_members(docx_path, new_members)
+
+    total = sum(len(v) for v in slot_parts.values())
+    log(f"Slot map: {total} slots in {len(slot_parts)} parts, {len(invalid)} unmapped paragraphs")
+    return {
+        "template_hash": template_info(template_path)["hash"],
+        "parts": slot_parts,
+        "invalid": sorted(set(invalid)),
+    }
+
+
+def patch_slots(input_docx, output_docx, slot_map, changed_keys, mapping):
+    """
+    Rewrite only the slots whose template text contains one of changed_keys.
+    Returns the updated slot map, or None when the slot map cannot be trusted
+    (caller falls back to a full rebuild).
+    """
+    for key in changed_keys:
+        if any(mentions(t, key) for t in slot_map.get("invalid", [])):
+            log(f"Incremental render: {key} sits in an unmapped paragraph")
+            return None
+        if not any(mentions(s[2], key) for slots in slot_map["parts"].values() for s in slots):
+            log(f"Incremental render: no slot holds {key}")
+            return None
+
+    with zipfile.ZipFile(input_docx, "r") as z:
+        members = [(name, z.read(name)) for name in z.namelist()]
+
+    new_parts = {}
+    patched = 0
+    new_members = []
+    for name, data in members:
+        slots = slot_map["parts"].get(name)
+        if not slots:
+            new_members.append((name, data))
+            continue
+
+        pieces = []
+        pos = 0
+        shift = 0
+        new_slots = []
+        for start, end, tpl_text, text, preserve in slots:
+            if end > len(data) or data[start:end] != escape(text).encode("utf-8"):
+                log(f"Incremental render: slot {start}-{end} in {name} does not match the previous output")
+                return None
+            new_text = text
+            if any(mentions(tpl_text, k) for k in changed_keys):
+                new_text = expected_paragraph_text(tpl_text, mapping)
+                if new_text != new_text.strip() and not preserve:
+                    return None
+            value = escape(new_text).encode("utf-8")
+            pieces.append(data[pos:start])
+            pieces.append(value)
+            pos = end
+            new_start = start + shift
+            shift += len(value) - (end - start)
+            new_slots.append([new_start, new_start + len(value), tpl_text, new_text, preserve])
+            if new_text != text:
+                patched += 1
+        pieces.append(data[pos:])
+
+        new_parts[name] = new_slots
+        new_members.append((name, b"".join(pieces)))
+
+    write_docx_members(output_docx, new_members)
+    log(f"Incremental render: patched {patched} slots for {len(changed_keys)} changed placeholders")
+    return {
+        "template_hash": slot_map["template_hash"],
+        "parts": new_parts,
+        "invalid": slot_map.get("invalid", []),
+    }
@@ -0,0 +1,239 @@
+"""
+Local stand-in for the records server, for testing sync offline.
+
+    python standin_server.py --root sync/records [--port 8000] [--no-thumbnails]
+    set SYNC_BASE_URL=http://127.0.0.1:8000/records/
+
+Serves <root>/<day>/data/*.json and <root>/<day>/photos/* with the same
+routes as the real server (list_dates, <day>/list, <day>/data/<f>,
+<day>/photos/<f>, POST <day>/delete, POST <day>/delete_files). Responses
+carry X-Content-SHA256 for download verification. Photo requests accept
+?size=N and return an N x N thumbnail made with the same resize as the
+reports, so thumbnail-first sync can be exercised; --no-thumbnails ignores
+the parameter like a server without resizing. Deletes only hide files from
+listings, nothing under --root is modified. GET /_stats reports bytes
+served per kind.
+
+GET changes?since=<cursor>&timeout=<s> is the long-poll change feed: files
+copied into --root while it runs are picked up by a scanner and reported
+as {"day", "kind", "name"} events.
+"""
+import os
+import io
+import sys
+import json
+import hashlib
+import time
+import argparse
+import threading
+from functools import lru_cache
+from urllib.parse import urlsplit, parse_qs, unquote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from image_utils import is_thumbnail, resize_image_fast
+
+PREFIX = "/records/"
+SCAN_SECONDS = 0.5
+MAX_CHANGES = 1000
+
+
+@lru_cache(maxsize=512)
+def _thumbnail_bytes(path, mtime_ns, size):
+    # resize_image_fast writes a file; render into memory via a BytesIO target
+    buf = io.BytesIO()
+    resize_image_fast(path, buf, size, size)
+    return buf.getvalue()
+
+
+class StandinState:
+    def __init__(self, root, thumbnails=True):
+        self.root = os.path.abspath(root)
+        self.thumbnails = thumbnails
+        self.deleted = set()   # (day, kind, fname)
+        self.stats = {}
+        self.lock = threading.Lock()
+        # change feed: (cursor, day, kind, name), newest last
+        self.changes = []
+        self.cursor = 0
+        self.changed = threading.Condition()
+        self._seen = self._snapshot()
+
+    def _snapshot(self):
+        return {(day, kind, n) for day in self.days() for kind, names in self.listing(day).items() for n in names}
+
+    def scan(self):
+        """Records files that appeared under root since the last scan as change events."""
+        current = self._snapshot()
+        new = sorted(current - self._seen)
+        self._seen |= current
+        if not new:
+            return
+        with self.changed:
+            for day, kind, name in new:
+                self.cursor += 1
+                self.changes.append((self.cursor, day, kind, name))
+            del self.changes[:-MAX_CHANGES]
+            self.changed.notify_all()
+
+    def changes_since(self, since, timeout):
+        """Blocks up to timeout for events after cursor since; returns the response body."""
+        with self.changed:
+            if since is None:
+                return {"cursor": self.cursor, "changes": []}
+            self.changed.wait_for(lambda: self.cursor > since, timeout)
+            # events older than the kept window were dropped; tell the client to resync
+            reset = bool(self.changes) and since < self.changes[0][0] - 1
+            changes = [{"day": d, "kind": k, "name": n} for c, d, k, n in self.changes if c > since]
+            return {"cursor": self.cursor, "changes": changes, "reset": reset}
+
+    def count(self, kind, nbytes):
+        with self.lock:
+            entry = self.stats.setdefault(kind, {"requests": 0, "bytes": 0})
+            entry["requests"] += 1
+            entry["bytes"] += nbytes
+
+    def days(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d)))
+
+    def listing(self, day):
+        result = {}
+        for kind in ("data", "photos"):
+            folder = os.path.join(self.root, day, kind)
+            names = sorted(os.listdir(folder)) if os.path.isdir(folder) else []
+            if kind == "photos":
+                # the real server only holds what the phones uploaded
+                names = [n for n in names if not is_thumbnail(n)]
+            result[kind] = [n for n in names if (day, kind, n) not in self.deleted]
+        return result
+
+
+class _Handler(BaseHTTPRequestHandler):
+    state = None
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, code, data, content_type="application/octet-stream", kind=None):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("X-Content-SHA256", hashlib.sha256(data).hexdigest())
+        self.end_headers()
+        self.wfile.write(data)
+        if kind:
+            self.state.count(kind, len(data))
+
+    def _json(self, obj, code=200):
+        self._send(code, json.dumps(obj).encode("utf-8"), "application/json")
+
+    def _route(self):
+        parts = urlsplit(self.path)
+        path = unquote(parts.path)
+        if path.startswith(PREFIX):
+            path = path[len(PREFIX):]
+        return path.strip("/").split("/"), parse_qs(parts.query)
+
+    def do_GET(self):
+        segments, query = self._route()
+        st = self.state
+
+        if segments == ["_stats"]:
+            self._json(st.stats)
+        elif segments == ["changes"]:
+            since = query.get("since", [None])[0]
+            timeout = min(float(query.get("timeout", ["25"])[0]), 60)
+            self._json(st.changes_since(int(since) if since is not None else None, timeout))
+        elif segments == ["list_dates"]:
+            self._json(st.days())
+        elif len(segments) == 2 and segments[1] == "list":
+            self._json(st.listing(segments[0]))
+        elif len(segments) == 3 and segments[1] in ("data", "photos"):
+            day, kind, fname = segments
+            path = os.path.join(st.root, day, kind, os.path.basename(fname))
+            if not os.path.isfile(path) or (day, kind, fname) in st.deleted:
+                self._json({"error": "not found"}, 404)
+                return
+            size = query.get("size", [None])[0]
+            if kind == "photos" and size and st.thumbnails:
+                try:
+                    data = _thumbnail_bytes(path, os.stat(path).st_mtime_ns, int(size))
+                except Exception as e:
+                    self._json({"error": str(e)}, 500)
+                    return
+                self._send(200, data, "image/jpeg", kind="thumbnails")
+                return
+            with open(path, "rb") as f:
+                data = f.read()
+            content_type = "application/json" if kind == "data" else "image/jpeg"
+            self._send(200, data, content_type, kind="originals" if kind == "photos" else "data")
+        else:
+            self._json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        segments, _ = self._route()
+        if len(segments) == 2 and segments[1] == "delete_files":
+            day = segments[0]
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                wanted = json.loads(self.rfile.read(length) or b"{}")
+            except Exception:
+                self._json({"error": "bad request"}, 400)
+                return
+            listing = self.state.listing(day)
+            deleted = {}
+            for kind in ("data", "photos"):
+                names = [n for n in wanted.get(kind, []) if n in listing.get(kind, [])]
+                for n in names:
+                    self.state.deleted.add((day, kind, n))
+                deleted[kind] = names
+            self._json({"deleted": deleted})
+        elif len(segments) == 2 and segments[1] == "delete":
+            day = segments[0]
+            listing = self.state.listing(day)
+            for kind, names in listing.items():
+                for n in names:
+                    self.state.deleted.add((day, kind, n))
+            self._json({"deleted": sum(len(v) for v in listing.values())})
+        else:
+            self._json({"error": "not found"}, 404)
+
+
+def serve(root, host="127.0.0.1", port=8000, thumbnails=True):
+    """Starts the stand-in on a daemon thread; returns (server, state)."""
+    state = StandinState(root, thumbnails)
+    handler = type("StandinHandler", (_Handler,), {"state": state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def scanner():
+        while True:
+            time.sleep(SCAN_SECONDS)
+            try:
+                state.scan()
+            except Exception:
+                pass
+    threading.Thread(target=scanner, name="standin-scanner", daemon=True).start()
+    return server, state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--root", required=True, help="folder holding <day>/data and <day>/photos")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--no-thumbnails", action="store_true", help="ignore ?size= like an older server")
+    args = parser.parse_args(argv)
+
+    server, _ = serve(args.root, args.host, args.port, not args.no_thumbnails)
+    print(f"Stand-in server on http://{args.host}:{args.port}{PREFIX} serving {os.path.abspath(args.root)}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+"""
+Localhost status/control endpoint for a SyncEngine.
+
+    GET  /status            engine, queue, download, render and error state as JSON
+    GET  /metrics           the same counters in Prometheus text format
+    POST /sync-now          wake the engine
+    POST /pause, /resume
+    POST /rerender/<day>    full rebuild of a day's partial report (YYYY-MM-DD);
+                            ?profile=<name> for a site profile other than the default
+
+Binds to 127.0.0.1 only. Requests whose Host is not 127.0.0.1:<port> or
+localhost:<port> (DNS rebinding) or that carry an Origin header (a web
+page) are refused. POST actions also need the per-install token from
+STATUS_TOKEN_FILE:
+
+    Authorization: Bearer <token>
+
+Reads are served from in-memory counters, so a scrape costs a few dict
+copies; the server thread sleeps in select() between requests.
+"""
+import os
+import re
+import json
+import hmac
+import secrets
+import threading
+from urllib.parse import urlsplit, parse_qs
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from logger import log, debug, queue_depth, level_counts
+from config import STATUS_HOST, STATUS_PORT, STATUS_TOKEN_FILE
+import metrics
+import sync_events
+from sync_engine import progress, RUNNING, PAUSED
+import site_profiles
+
+# serve_forever wakes this often to check for shutdown
+POLL_SECONDS = 2.0
+
+_DAY_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def control_token(path=STATUS_TOKEN_FILE):
+    """The per-install token for POST actions; created on first use."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            token = f.read().strip()
+        if token:
+            return token
+    except OSError:
+        pass
+    token = secrets.token_urlsafe(32)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(token)
+    log(f"Created status endpoint token in {path}")
+    return token
+
+
+def _valid_day(day):
+    """YYYY-MM-DD and a real date (2025-13-45 matches the pattern only)."""
+    if not _DAY_RE.match(day):
+        return False
+    try:
+        datetime.strptime(day, "%Y-%m-%d")
+    except ValueError:
+        return False
+    return True
+
+
+def _ratio(hits, total):
+    return round(hits / total, 3) if total else None
+
+
+def _engine_collector(engine):
+    def collect():
+        return [
+            ("sync_engine_running", int(engine.state == RUNNING), {}),
+            ("sync_engine_paused", int(engine.state == PAUSED), {}),
+            ("log_queue_depth", queue_depth(), {}),
+            ("event_queue_depth", sync_events.pending(), {}),
+        ] + [("log_lines_total", n, {"level": lvl}) for lvl, n in list(level_counts.items())]
+    return collect
+
+
+def _profiles_snapshot():
+    return {
+        site.name: {
+            "enabled": site.enabled,
+            "base_url": site.base_url,
+            "output_dir": site.output_dir,
+            "days": progress["profiles"].get(site.name, []),
+            "turns": metrics.get("profile_turns_total", profile=site.name),
+            "turns_cut_short": metrics.get("profile_turns_cut_total", profile=site.name),
+            "last_turn_seconds": metrics.get("profile_turn_seconds", profile=site.name),
+            "downloads": metrics.get("profile_downloads_total", profile=site.name),
+            "failures": metrics.get("profile_failures_total", profile=site.name),
+        }
+        for site in site_profiles.all_profiles()
+    }
+
+
+def status_snapshot(engine):
+    by_mode = {m: metrics.get("render_total", mode=m) for m in ("skipped", "incremental", "full", "failed")}
+    renders = sum(by_mode.values())
+    reused = metrics.get("thumbnails_total", result="reused")
+    made = metrics.get("thumbnails_total", result="made")
+    last_started = engine.last_cycle_started
+    return {
+        "engine": {
+            "state": engine.state,
+            "busy": engine.busy,
+            "interval": engine.interval,
+            "push_connected": engine.push_connected,
+            "cycles": engine.cycles,
+            "last_cycle_started": datetime.fromtimestamp(last_started).strftime("%Y-%m-%d %H:%M:%S") if last_started else None,
+            "last_cycle_seconds": engine.last_cycle_seconds,
+        },
+        "days": {"active": progress["days"], "current": progress["current_day"], "profile": progress["profile"]},
+        "profiles": _profiles_snapshot(),
+        "queues": {
+            "log": queue_depth(),
+            "events": sync_events.pending(),
+            "rerender": engine.pending_rerenders,
+            "import": engine.pending_imports,
+            "local": engine.pending_local_changes,
+        },
+        "downloads": {
+            "in_flight": metrics.get("sync_downloads_in_flight"),
+            "completed": metrics.get("sync_downloads_total"),
+            "bytes": metrics.get("sync_download_bytes_total"),
+        },
+        "render": {
+            "last_seconds": metrics.get("render_last_seconds"),
+            "by_mode": by_mode,
+            # a skipped or incremental render reused the previous output
+            "cache_hit_rate": _ratio(by_mode["skipped"] + by_mode["incremental"], renders),
+        },
+        "thumbnails": {"reused": reused, "made": made, "cache_hit_rate": _ratio(reused, reused + made)},
+        "errors": {
+            "requests": metrics.get("sync_request_errors_total"),
+            "downloads": metrics.get("sync_download_errors_total"),
+            "render_failures": by_mode["failed"],
+            "log_errors": level_counts.get("ERROR", 0),
+        },
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    engine = None
+    token = None
+    hosts = ()
+
+    def _refused(self):
+        """Sends 403 and returns True unless the request comes from a local client."""
+        host = (self.headers.get("Host") or "").lower()
+        if host not in self.hosts:
+            reason = f"unexpected Host {host!r}"
+        elif self.headers.get("Origin") is not None:
+            reason = "requests from web pages are not accepted"
+        else:
+            return False
+        debug(f"Status endpoint refused {self.command} {self.path}: {reason}")
+        self._json(403, {"error": reason})
+        return True
+
+    def _authorized(self):
+        scheme, _, token = (self.headers.get("Authorization") or "").partition(" ")
+        return scheme.lower() == "bearer" and hmac.compare_digest(token.strip().encode(), self.token.encode())
+
+    def log_message(self, fmt, *args):
+        debug("status endpoint: " + fmt % args)
+
+    def _send(self, code, body, content_type="application/json"):
+        data = body.encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _json(self, code, obj):
+        self._send(code, json.dumps(obj, indent=2))
+
+    def do_GET(self):
+        if self._refused():
+            return
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path in ("", "/status"):
+            self._json(200, status_snapshot(self.engine))
+        elif path == "/metrics":
+            self._send(200, metrics.prometheus_text(), "text/plain; version=0.0.4")
+        else:
+            self._json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self._refused():
+            return
+        if not self._authorized():
+            self._json(401, {"error": f"missing or wrong token (see {STATUS_TOKEN_FILE})"})
+            return
+        parts = urlsplit(self.path)
+        path = parts.path.rstrip("/")
+        engine = self.engine
+        if path == "/sync-now":
+            ok = engine.sync_now()
+        elif path == "/pause":
+            engine.pause()
+            ok = engine.state == PAUSED
+        elif path == "/resume":
+            engine.resume()
+            ok = engine.state == RUNNING
+        elif path.startswith("/rerender/"):
+            day = path[len("/rerender/"):]
+            if not _valid_day(day):
+                self._json(400, {"error": "day must be a valid YYYY-MM-DD date"})
+                return
+            profile = parse_qs(parts.query).get("profile", [site_profiles.DEFAULT_NAME])[0]
+            if site_profiles.get(profile) is None:
+                self._json(404, {"error": f"unknown profile {profile}"})
+                return
+            ok = engine.request_rerender(day, profile)
+        else:
+            self._json(404, {"error": "not found"})
+            return
+        log(f"Status endpoint action {path}: {'accepted' if ok else 'ignored'} (engine {engine.state})")
+        self._json(200 if ok else 409, {"ok": ok, "state": engine.state})
+
+
+class StatusServer:
+    def __init__(self, engine, host=STATUS_HOST, port=STATUS_PORT, token=None):
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self.token = token
+        self._server = None
+        self._thread = None
+        self._collector = None
+
+    def start(self):
+        try:
+            token = self.token or control_token()
+        except OSError as e:
+            log(f"Status endpoint disabled, no control token: {e}")
+            return False
+        handler = type("StatusHandler", (_Handler,), {"engine": self.engine, "token": token})
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), handler)
+        except OSError as e:
+            log(f"Status endpoint disabled, cannot bind {self.host}:{self.port}: {e}")
+            return False
+        port = self._server.server_address[1]
+        handler.hosts = (f"127.0.0.1:{port}", f"localhost:{port}")
+        self._server.daemon_threads = True
+        self._collector = _engine_collector(self.engine)
+        metrics.register_collector(self._collector)
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": POLL_SECONDS},
+            name="status-server", daemon=True
+        )
+        self._thread.start()
+        log(f"Status endpoint listening on http://{self.host}:{self.port}/status")
+        return True
+
+    def stop(self):
+        if self._collector is not None:
+            metrics.unregister_collector(self._collector)
+            self._collector = None
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -2,15 +2,42 @@
 import os
 import json
 from logger import log
-from db_utils import load_download_db, save_download_db
-from http_utils import safe_request, download_file, delete_from_server
-from config import BASE_URL, LOCAL_DIR, OUTPUT_DIR
+from db_utils import load_download_db, save_download_db, save_render_state
+from http_utils import safe_request, download_file, delete_files_from_server
+from config import SERVER_THUMBNAILS, THUMBNAIL_SIZE, FETCH_ORIGINALS, ORIGINALS_PER_CYCLE, RELIST_TODAY_SECONDS
+from config import CLEANUP_BATCH_SIZE, CLEANUP_RETRY_SECONDS
+from fingerprint_utils import file_sha256
 from doc_utils import create_partial_report_with_shift_signs
 from data_utils import load_day_records_local
+from record_store import ingest_file, get_records, stored_hash
 from finalize_utils import check_report_ready, finalize_report
+from sync_events import publish, FileDownloaded, ProgressCounts, ShiftStateChanged, ReportRendered
+from cancel_utils import check_cancelled
+from image_utils import is_ready_thumbnail
+import time
 from datetime import datetime
+from download_queue import DownloadScheduler
+import retention_utils
+import history_store
+from site_profiles import current
+import metrics
 
-download_db = load_download_db()
+def _db():
+    """Download db of the active site profile, loaded on first use."""
+    site = current()
+    if site.download_db is None:
+        site.download_db = load_download_db()
+    return site.download_db
+
+
+def download_db():
+    """The active profile's download db (for modules that update it, like import_utils)."""
+    return _db()
+
+
+def _shift_states():
+    # day -> {"1": (time, "IN"|"OUT"), "2": ...}: latest shift sign event seen per day
+    return current().shift_states
 
 # ---------------------------
 # Place -> cage arrays (from your spec)
@@ -77,13 +104,15 @@ def process_new_record_updates(day, new_json_files):
       - per-cage placeholders: e.g. "1c471": "3"
       - opposite shift placeholders: set to "0" if not present
       - per-place totals: e.g. "(1sp_total)", "(1spm)", "(1spl)"
-    Save the mapping to OUTPUT_DIR/updates_<day>.json for doc_utils to consume.
+    Save the mapping to <output folder>/updates_<day>.json for doc_utils to consume.
     """
     if not new_json_files:
         return None
 
-    data_dir = os.path.join(LOCAL_DIR, day, "data")
-    photo_dir = os.path.join(LOCAL_DIR, day, "photos")
+    site = current()
+    place_cage_map = site.places or PLACE_CAGE_MAP
+    place_code_map = site.codes or PLACE_CODE_MAP
+    photo_dir = os.path.join(site.local_dir, day, "photos")
 
     # initialize mappings
     # hold per-place->shift->cage->value
@@ -93,7 +122,7 @@ def process_new_record_updates(day, new_json_files):
     place_shift_local = {}
 
     # initialize for all known places and both shifts
-    for place, cages in PLACE_CAGE_MAP.items():
+    for place, cages in place_cage_map.items():
         place_shift_cage.setdefault(place, {"1": {}, "2": {}})
         place_shift_myna.setdefault(place, {"1": 0, "2": 0})
         place_shift_local.setdefault(place, {"1": 0, "2": 0})
@@ -103,17 +132,8 @@ def process_new_record_updates(day, new_json_files):
             place_shift_cage[place]["2"][str(c)] = None
 
     # parse only the newly downloaded files (they are filenames like record_001.json)
-    for fname in new_json_files:
-        fpath = os.path.join(data_dir, fname)
-        if not os.path.exists(fpath):
-            continue
-        try:
-            with open(fpath, "r", encoding="utf-8") as f:
-                rec = json.load(f)
-        except Exception as e:
-            log(f"Failed to read JSON {fpath}: {e}")
-            continue
-
+    for rec in get_records(day, new_json_files):
+        fname = rec["_filename"]
         if rec.get("type") != "record_update":
             continue
 
@@ -140,11 +160,11 @@ def process_new_record_updates(day, new_json_files):
 
         # Find canonical place from provided location string. Use direct match, else try substring match.
         place_key = None
-        if location in PLACE_CAGE_MAP:
+        if location in place_cage_map:
             place_key = location
         else:
             # try case-insensitive substring match
-            for pk in PLACE_CAGE_MAP.keys():
+            for pk in place_cage_map.keys():
                 if pk.lower() in location.lower() or location.lower() in pk.lower():
                     place_key = pk
                     break
@@ -154,7 +174,7 @@ def process_new_record_updates(day, new_json_files):
             continue
 
         # ensure cage belongs to place (if not, still accept but warn)
-        if int(cage) not in PLACE_CAGE_MAP[place_key]:
+        if int(cage) not in place_cage_map[place_key]:
             log(f"Cage {cage} for place {place_key} not in known cage list — accepting but check template mapping.")
 
         # store the value for that cage & shift
@@ -171,8 +191,8 @@ def process_new_record_updates(day, new_json_files):
     # Build text_map of placeholders -> values
     text_map = {}
 
-    for place, cages in PLACE_CAGE_MAP.items():
-        code = PLACE_CODE_MAP.get(place)
+    for place, cages in place_cage_map.items():
+        code = place_code_map.get(place)
         if not code:
             # skip places without code mapping (shouldn't happen)
             log(f"No placeholder code for place '{place}' — skipping totals placeholders.")
@@ -221,9 +241,9 @@ def process_new_record_updates(day, new_json_files):
             text_map[m_prefix] = str(myna_val)
             text_map[l_prefix] = str(local_val)
 
-    # persist text_map to OUTPUT_DIR for doc_utils to consume
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-    updates_path = os.path.join(OUTPUT_DIR, f"updates_{day}.json")
+    # persist text_map to the profile's output folder for doc_utils to consume
+    os.makedirs(site.output_dir, exist_ok=True)
+    updates_path = os.path.join(site.output_dir, f"updates_{day}.json")
     try:
         with open(updates_path, "w", encoding="utf-8") as uf:
             json.dump(text_map, uf, indent=2)
@@ -235,50 +255,318 @@ def process_new_record_updates(day, new_json_files):
     return updates_path
 
 # -------------------------
-# Main sync_day (modified to track newly-downloaded JSON files)
+# Shift sign-in / sign-out state (published to the GUI)
 # -------------------------
-def sync_day(day):
-    global download_db
-    new_data = False
-    new_photos = False
+def read_local_records(day, filenames):
+    return get_records(day, filenames)
+
+
+def update_shift_states(day, records):
+    """Fold start_shift/end_shift records into _shift_states() and publish any change."""
+    states = _shift_states().setdefault(day, {})
+    before = dict(states)
+    for rec in records:
+        rtype = rec.get("type")
+        shift = str(rec.get("shift", ""))
+        if rtype not in ("start_shift", "end_shift") or shift not in ("1", "2"):
+            continue
+        try:
+            event_time = datetime.strptime(rec.get("timestamp"), "%Y-%m-%d %H:%M:%S")
+        except Exception:
+            event_time = datetime.now()
+        prev = states.get(shift)
+        if prev is None or event_time >= prev[0]:
+            states[shift] = (event_time, "IN" if rtype == "start_shift" else "OUT")
 
-    res = safe_request(BASE_URL + f"{day}/list")
-    if res is None:
-        log(f"Could not fetch file list for {day}")
+    for shift, (event_time, state) in states.items():
+        prev = before.get(shift)
+        if prev is None or prev[1] != state:
+            publish(ShiftStateChanged(day, shift, state, event_time.strftime("%Y-%m-%d %H:%M:%S")))
+
+
+def rerender_day(day, cancel=None):
+    """Full rebuild of the partial report from local files, ignoring the saved render state."""
+    if not retention_utils.rehydrate_day(_db(), day):
+        return None
+    save_render_state(day, {})
+    partial_path = create_partial_report_with_shift_signs(day, cancel=cancel)
+    if partial_path:
+        publish(ReportRendered(day, partial_path, False))
+    return partial_path
+
+
+# -------------------------
+# Thumbnail-first photos: originals are fetched after the report
+# -------------------------
+def photo_url(day, fname, size=None):
+    url = current().base_url + f"{day}/photos/{fname}"
+    return f"{url}?size={size}" if size else url
+
+
+def originals_dir(day):
+    return os.path.join(current().local_dir, day, "originals")
+
+
+def pending_originals(day):
+    """Photos of day held locally only as a server thumbnail."""
+    entry = _db().get(day, {})
+    fetched = set(entry.get("originals", []))
+    return [f for f in entry.get("thumb_photos", []) if f not in fetched]
+
+
+def original_photo_path(day, fname):
+    """Full-resolution copy of a photo, or None while only its thumbnail is local."""
+    entry = _db().get(day, {})
+    if fname in entry.get("originals", []):
+        return os.path.join(originals_dir(day), fname)
+    if fname in entry.get("thumb_photos", []):
+        return None
+    return os.path.join(current().local_dir, day, "photos", fname)
+
+
+def fetch_originals(day, cancel=None, limit=None):
+    """Downloads up to limit pending originals of day; returns how many arrived."""
+    fetched = 0
+    for f in pending_originals(day):
+        if limit is not None and fetched >= limit:
+            break
+        check_cancelled(cancel)
+        info = {}
+        if download_file(photo_url(day, f), os.path.join(originals_dir(day), f), cancel=cancel, info=info):
+            _db()[day].setdefault("originals", []).append(f)
+            record_verified(day, "originals", f, info)
+            save_download_db(_db())
+            publish(FileDownloaded(day, "originals", f))
+            fetched += 1
+    return fetched
+
+
+def fetch_pending_originals(cancel=None, limit=ORIGINALS_PER_CYCLE):
+    """Low-priority pass after each sync cycle, oldest day first."""
+    if FETCH_ORIGINALS != "background":
+        return 0
+    total = 0
+    for day in sorted(_db()):
+        if total >= limit:
+            break
+        if isinstance(_db()[day], dict) and pending_originals(day):
+            total += fetch_originals(day, cancel, limit - total)
+    if total:
+        log(f"Fetched {total} original photos in the background")
+    return total
+
+
+# -------------------------
+# Verified server clean-up: a server file is deleted only once a full-size
+# local copy has been verified and recorded in the download db
+# -------------------------
+def record_verified(day, kind, fname, info):
+    """kind: "data", "photos" or "originals" (the local folder holding the full copy)."""
+    if "sha256" not in info:
         return
+    _db()[day].setdefault("verified", {})[f"{kind}/{fname}"] = [info["size"], info["sha256"]]
+
+
+def _local_copy_ok(day, key, size, sha256):
+    if key.startswith("data/"):
+        # records live in the day's record store, not as loose files
+        return stored_hash(day, key[len("data/"):]) == (size, sha256)
+    path = os.path.join(current().local_dir, day, *key.split("/", 1))
+    try:
+        return os.path.getsize(path) == size and file_sha256(path) == sha256
+    except OSError:
+        return False
+
+
+def _archived_copy_ok(archived, key, size, sha256):
+    return key in archived and archived[key] in (None, sha256)
+
+
+def deletable_files(day):
+    """
+    Server files of day whose verified full copy is still intact locally (or
+    in the day's archive), as {"data", "photos"}.
+    """
+    entry = _db().get(day, {})
+    verified = entry.get("verified", {})
+    deleted = set(entry.get("server_deleted", []))
+    archived = None
+    if entry.get("archived"):
+        try:
+            archived = retention_utils.archived_files(day)
+        except Exception as e:
+            log(f"Could not read the archive of {day}: {e}")
+            return {"data": [], "photos": []}
+    result = {"data": [], "photos": []}
+    thumbs = set(entry.get("thumb_photos", []))
+    for kind in ("data", "photos"):
+        for fname in entry.get(kind, []):
+            if f"{kind}/{fname}" in deleted:
+                continue
+            # a photo held only as a thumbnail is covered by its fetched original
+            key = f"originals/{fname}" if kind == "photos" and fname in thumbs else f"{kind}/{fname}"
+            if key not in verified:
+                continue
+            if archived is not None:
+                ok = _archived_copy_ok(archived, key, *verified[key])
+            else:
+                ok = _local_copy_ok(day, key, *verified[key])
+            if ok:
+                result[kind].append(fname)
+    return result
+
+
+def cleanup_server(cancel=None, batch_size=CLEANUP_BATCH_SIZE):
+    """Batch-deletes verified files from the server; returns how many it confirmed."""
+    scratch = current().scratch
+    if time.monotonic() < scratch.get("cleanup_retry_at", 0.0):
+        return 0
+    total = 0
+    for day in sorted(_db()):
+        if not isinstance(_db()[day], dict):
+            continue
+        check_cancelled(cancel)
+        files = deletable_files(day)
+        names = [("data", f) for f in files["data"]] + [("photos", f) for f in files["photos"]]
+        for i in range(0, len(names), batch_size):
+            batch = {"data": [], "photos": []}
+            for kind, fname in names[i:i + batch_size]:
+                batch[kind].append(fname)
+            deleted = delete_files_from_server(day, batch)
+            if deleted is None:
+                # server unreachable or without delete_files: back off instead of re-hashing every cycle
+                scratch["cleanup_retry_at"] = time.monotonic() + CLEANUP_RETRY_SECONDS
+                return total
+            done = [f"{kind}/{f}" for kind in ("data", "photos") for f in deleted.get(kind, [])]
+            _db()[day].setdefault("server_deleted", []).extend(done)
+            save_download_db(_db())
+            total += len(done)
+    if total:
+        log(f"Server clean-up: {total} verified files deleted")
+    return total
+
+
+def ingest_local_changes(changes, cancel=None):
+    """
+    Picks up files dropped or corrected by hand under records/<day>
+    (local_watch): new record files are ingested, new or changed photos
+    are noted, and each day that changed is finished once. Files the sync
+    wrote itself are already known and skipped.
+    changes: {day: {"data": names, "photos": names}}
+    """
+    for day in sorted(changes):
+        check_cancelled(cancel)
+        if not retention_utils.rehydrate_day(_db(), day):
+            continue
+        entry = _db().setdefault(day, {"data": [], "photos": []})
+        folder = os.path.join(current().local_dir, day)
+        new_data, new_photos = [], []
+        for name in sorted(changes[day].get("data", ())):
+            path = os.path.join(folder, "data", name)
+            try:
+                if not ingest_file(day, name, path):
+                    continue
+            except FileNotFoundError:
+                # ingested already (a download) or moved away again
+                continue
+            except Exception as e:
+                log(f"Could not ingest local {name} of {day}: {e}")
+                continue
+            new_data.append(name)
+            if name not in entry["data"]:
+                entry["data"].append(name)
+        for name in sorted(changes[day].get("photos", ())):
+            key = f"photos/{name}"
+            if not os.path.exists(os.path.join(folder, "photos", name)):
+                continue
+            if name in entry["photos"]:
+                verified = entry.get("verified", {}).get(key)
+                if not verified or _local_copy_ok(day, key, *verified):
+                    continue
+                # replaced by hand: the local copy no longer matches the server's
+                entry["verified"].pop(key)
+            else:
+                entry["photos"].append(name)
+            new_photos.append(name)
+        if new_data or new_photos:
+            save_download_db(_db())
+            log(f"Local changes in {day}: {len(new_data)} records, {len(new_photos)} photos")
+            metrics.inc("local_changes_total", len(new_data) + len(new_photos), profile=current().name)
+            finish_day(day, new_data, new_photos, cancel=cancel)
+
 
+def apply_day_retention(cancel=None):
+    """Archives finalized days per the retention policy (see retention_utils)."""
+    return retention_utils.apply_retention(_db(), pending_originals, cancel)
+
+
+# -------------------------
+# Download primitives
+# -------------------------
+def list_day(day, cancel=None):
+    """Server listing of day as {"data": [...], "photos": [...]}, or None."""
+    res = safe_request(current().base_url + f"{day}/list", cancel=cancel)
+    if res is None:
+        log(f"Could not fetch file list for {day}")
+        return None
     files = res.json()
-    server_data = files.get("data", [])
-    server_photos = files.get("photos", [])
-
-    if day not in download_db:
-        download_db[day] = {"data": [], "photos": []}
-
-    known_data = set(download_db[day]["data"])
-    known_photos = set(download_db[day]["photos"])
-
-    data_dir = os.path.join(LOCAL_DIR, day, "data")
-    photos_dir = os.path.join(LOCAL_DIR, day, "photos")
-    os.makedirs(data_dir, exist_ok=True)
-    os.makedirs(photos_dir, exist_ok=True)
-
-    # track newly downloaded JSONs (filenames)
-    new_json_files = []
-
-    for f in server_data:
-        if f not in known_data:
-            if download_file(BASE_URL + f"{day}/data/{f}", os.path.join(data_dir, f)):
-                download_db[day]["data"].append(f)
-                save_download_db(download_db)
-                new_data = True
-                new_json_files.append(f)
-
-    for f in server_photos:
-        if f not in known_photos:
-            if download_file(BASE_URL + f"{day}/photos/{f}", os.path.join(photos_dir, f)):
-                download_db[day]["photos"].append(f)
-                save_download_db(download_db)
-                new_photos = True
+    return {"data": files.get("data", []), "photos": files.get("photos", [])}
+
+
+def new_files(day, listing):
+    """Listed files of day not downloaded yet, as (data, photos)."""
+    entry = _db().setdefault(day, {"data": [], "photos": []})
+    known_data = set(entry["data"])
+    known_photos = set(entry["photos"])
+    return ([f for f in listing["data"] if f not in known_data],
+            [f for f in listing["photos"] if f not in known_photos])
+
+
+def download_one(day, kind, fname, cancel=None):
+    """Downloads one listed file ("data" or "photos") of day and records it."""
+    entry = _db().setdefault(day, {"data": [], "photos": []})
+    dest = os.path.join(current().local_dir, day, kind, fname)
+    # the report only needs 162px photos; ask the server for that size first
+    thumb_size = THUMBNAIL_SIZE if SERVER_THUMBNAILS and kind == "photos" else None
+    if kind == "photos":
+        url = photo_url(day, fname, thumb_size)
+    else:
+        url = current().base_url + f"{day}/data/{fname}"
+
+    info = {}
+    if not download_file(url, dest, cancel=cancel, info=info):
+        return False
+    if kind == "data":
+        try:
+            ingest_file(day, fname, dest)
+        except Exception as e:
+            log(f"Could not ingest {fname} of {day}: {e}")
+            return False
+    entry[kind].append(fname)
+    # a server without resizing sends the original, which needs no second fetch
+    if thumb_size and is_ready_thumbnail(dest, thumb_size, thumb_size):
+        entry.setdefault("thumb_photos", []).append(fname)
+    else:
+        record_verified(day, kind, fname, info)
+    save_download_db(_db())
+    metrics.inc("profile_downloads_total", profile=current().name)
+    publish(FileDownloaded(day, kind, fname))
+    return True
+
+
+# -------------------------
+# Per-day work once its downloads are done
+# -------------------------
+def finish_day(day, new_json_files, new_photo_files, cancel=None):
+    new_data = bool(new_json_files)
+    new_photos = bool(new_photo_files)
+
+    publish(ProgressCounts(day, len(_db()[day]["data"]), len(_db()[day]["photos"])))
+
+    if day not in _shift_states():
+        update_shift_states(day, load_day_records_local(day))
+    elif new_json_files:
+        update_shift_states(day, read_local_records(day, new_json_files))
 
     # Process new record_update entries (only for newly-downloaded JSON files)
     if new_json_files:
@@ -287,29 +575,146 @@ def sync_day(day):
             log(f"Record updates processed; mapping at: {updates_path}")
         else:
             log("No record_update entries found in newly downloaded JSONs or processing failed.")
+        try:
+            history_store.update_day(day, load_day_records_local(day))
+        except Exception as e:
+            log(f"Could not update cage history for {day}: {e}")
 
-    # create report after sync (this will still create the partial report with shift sign images)
+    # a render cancelled part-way in an earlier cycle is still owed
     if new_data or new_photos:
-        partial_path = create_partial_report_with_shift_signs(day)
+        _db()[day]["render_pending"] = True
+        save_download_db(_db())
+
+    # create report after sync (this will still create the partial report with shift sign images)
+    if _db()[day].get("render_pending"):
+        check_cancelled(cancel)
+        partial_path = create_partial_report_with_shift_signs(day, cancel=cancel)
+        _db()[day].pop("render_pending", None)
+        save_download_db(_db())
         if partial_path is None:
             log("Partial report creation failed.")
         else:
-            if download_db.get(day, {}).get("finalized"):
+            publish(ReportRendered(day, partial_path, False))
+            if _db().get(day, {}).get("finalized"):
                 log(f"{day} already finalized — skipping finalization.")
             else:
                 # Note: check_report_ready expects to examine local records. It will finalize only when ready.
                 if check_report_ready(day, load_day_records_local):
+                    if FETCH_ORIGINALS == "on_finalize":
+                        fetch_originals(day, cancel)
                     final_path = finalize_report(day, partial_docx_path=partial_path)
                     if final_path:
+                        # finalize_report marks the day in its own copy of the db; keep ours in step
+                        _db()[day]["finalized"] = True
+                        _db()[day]["finalized_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                        save_download_db(_db())
                         log(f"Report finalized: {final_path}")
+                        publish(ReportRendered(day, final_path, True))
                     else:
                         log("Finalization attempt failed.")
-        if len(server_photos) >= 10:
-            log(f"Reached limit, deleting server files for {day}")
-            delete_from_server(day)                
     else:
         log("No new files – report unchanged.")
 
-    # if len(server_data) + len(server_photos) >= 10:
-    #     log(f"Reached limit, deleting server files for {day}")
-    #     delete_from_server(day)
+
+# -------------------------
+# Sync: one priority queue over every listed day
+# -------------------------
+def sync_days(days, cancel=None, on_day=None, deadline=None):
+    """
+    Downloads the new files of all days through a DownloadScheduler and
+    finishes each day (records, render, finalize) as soon as its last file
+    is in, so today's report is not held up behind older days. Today's
+    listing is refreshed every RELIST_TODAY_SECONDS while downloads run.
+    on_day(day) is called whenever work switches to another day.
+
+    deadline (time.monotonic()) ends the download loop early so other site
+    profiles get their turn: days with files already in are finished with
+    what they have, the rest stays listed for the next cycle. Returns True
+    when the deadline cut the queue short.
+    """
+    today = datetime.now().strftime("%Y-%m-%d")
+    # list today first so its records are queued before anything else
+    days = sorted(days, key=lambda d: (d != today, d))
+    scheduler = DownloadScheduler(today)
+    listings = {}
+    downloaded = {}   # day -> ([json names], [photo names])
+
+    for day in days:
+        check_cancelled(cancel)
+        listing = list_day(day, cancel)
+        if listing is None:
+            continue
+        data, photos = new_files(day, listing)
+        if data or photos:
+            # an archived day with new server files is unpacked so they join its records
+            if not retention_utils.rehydrate_day(_db(), day):
+                continue
+            for sub in ("data", "photos"):
+                os.makedirs(os.path.join(current().local_dir, day, sub), exist_ok=True)
+        listings[day] = listing
+        downloaded[day] = ([], [])
+        scheduler.add_day(day, data, photos)
+
+    finished = set()
+    current_day = None
+    relisted_at = time.monotonic()
+
+    def finish(day):
+        finished.add(day)
+        finish_day(day, *downloaded[day], cancel=cancel)
+
+    while True:
+        if today in listings and time.monotonic() - relisted_at >= RELIST_TODAY_SECONDS:
+            relisted_at = time.monotonic()
+            listing = list_day(today, cancel)
+            if listing is not None:
+                listings[today] = listing
+                data, photos = new_files(today, listing)
+                data = [f for f in data if not scheduler.is_queued(today, "data", f)]
+                photos = [f for f in photos if not scheduler.is_queued(today, "photos", f)]
+                if (data or photos) and not retention_utils.rehydrate_day(_db(), today):
+                    data, photos = [], []
+                if scheduler.add_day(today, data, photos):
+                    finished.discard(today)
+
+        if deadline is not None and time.monotonic() >= deadline and len(scheduler):
+            for day, (data, photos) in downloaded.items():
+                if (data or photos) and day not in finished:
+                    finish(day)
+            log(f"{current().name}: turn over with {len(scheduler)} downloads left for the next cycle")
+            return True
+
+        job = scheduler.pop()
+        if job is None:
+            break
+        check_cancelled(cancel)
+        if job.day != current_day:
+            current_day = job.day
+            if on_day:
+                on_day(current_day)
+
+        if download_one(job.day, job.kind, job.name, cancel):
+            downloaded[job.day][0 if job.kind == "data" else 1].append(job.name)
+        scheduler.done(job)
+
+        if scheduler.day_pending(job.day) == 0:
+            finish(job.day)
+            downloaded[job.day] = ([], [])
+
+    # days with nothing new still publish progress and pick up owed renders
+    for day in days:
+        if day in listings and day not in finished:
+            check_cancelled(cancel)
+            if on_day:
+                on_day(day)
+            finish(day)
+    return False
+
+
+def sync_day(day, cancel=None):
+    """
+    Sync a single day.
+    cancel: optional CancelToken; downloads and the render stop at their next
+    checkpoint with SyncCancelled once it fires.
+    """
+    sync_days([day], cancel)
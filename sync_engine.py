@@ -0,0 +1,410 @@
+import time
+import itertools
+import threading
+import traceback
+from logger import log
+from config import LOOP_INTERVAL, PUSH_CHANGES, PUSH_FALLBACK_INTERVAL, PROFILE_TURN_SECONDS, LOCAL_WATCH
+from http_utils import safe_request
+from sync_day import sync_days, rerender_day, fetch_pending_originals, cleanup_server, apply_day_retention
+from sync_day import ingest_local_changes
+from import_utils import import_source
+from retention_utils import startup_sweep
+from cancel_utils import CancelToken, SyncCancelled, check_cancelled
+from sync_events import publish, EngineStateChanged
+from change_feed import ChangeListener
+from local_watch import LocalWatcher
+from site_profiles import current, activate, enabled_profiles, get as get_profile, DEFAULT_NAME
+import metrics
+
+STOPPED = "stopped"
+RUNNING = "running"
+PAUSED = "paused"
+
+
+def get_available_dates(cancel=None):
+    """Fetch available date folders from server."""
+    res = safe_request(current().base_url + "list_dates", cancel=cancel)
+    if res is None:
+        log("Could not get date folder list")
+        return []
+    try:
+        return res.json()
+    except Exception:
+        return []
+
+
+# what the current/last cycle is working on, for the status endpoint;
+# "days" is the listing of the profile being synced, "profiles" every profile's
+progress = {"days": [], "current_day": None, "profile": None, "profiles": {}}
+
+_turns = itertools.count()
+
+
+def sync_profile(cancel=None, deadline=None):
+    """One sync cycle of the active site profile over every date its server lists."""
+    site = current()
+    startup_sweep()
+    dates = get_available_dates(cancel)
+    progress["days"] = list(dates or [])
+    progress["profiles"][site.name] = list(dates or [])
+    metrics.set_gauge("sync_active_days", sum(len(d) for d in progress["profiles"].values()))
+    if not dates:
+        log("No new dates available.")
+        return
+    try:
+        cut_short = sync_days(dates, cancel, on_day=lambda day: progress.update(current_day=day), deadline=deadline)
+    finally:
+        progress["current_day"] = None
+    if cut_short:
+        metrics.inc("profile_turns_cut_total", profile=site.name)
+        return
+
+    # reports are current; spend what is left of the cycle on full-size photos
+    fetch_pending_originals(cancel)
+    cleanup_server(cancel)
+    apply_day_retention(cancel)
+
+
+def sync_all_days(cancel=None):
+    """
+    One sync cycle over every enabled site profile. Each cycle starts with
+    the next profile in turn, and with more than one profile each gets at
+    most PROFILE_TURN_SECONDS of downloads before yielding, so a site with a
+    large backlog cannot hold up the others. A failing profile is logged
+    and skipped.
+    """
+    profiles = enabled_profiles()
+    if not profiles:
+        return
+    start = next(_turns) % len(profiles)
+    order = profiles[start:] + profiles[:start]
+    turn = PROFILE_TURN_SECONDS if len(order) > 1 else None
+    try:
+        for site in order:
+            check_cancelled(cancel)
+            started = time.monotonic()
+            progress["profile"] = site.name
+            try:
+                with activate(site):
+                    sync_profile(cancel, started + turn if turn else None)
+            except SyncCancelled:
+                raise
+            except Exception as e:
+                log(f"Sync of profile {site.name} failed: {e}\n{traceback.format_exc()}")
+                metrics.inc("profile_failures_total", profile=site.name)
+            finally:
+                metrics.inc("profile_turns_total", profile=site.name)
+                metrics.set_gauge("profile_turn_seconds", round(time.monotonic() - started, 3), profile=site.name)
+    finally:
+        progress["profile"] = None
+
+
+class SyncEngine:
+    """
+    Runs sync cycles on one background thread.
+
+    All control calls (start, pause, resume, stop, sync_now, set_interval)
+    are thread-safe and return immediately: they change the state under a
+    condition variable, wake the engine thread and, for pause/stop, cancel
+    the token of the cycle in progress so a download or render unwinds at
+    its next checkpoint instead of running to the end of the day.
+    """
+
+    def __init__(self, interval=LOOP_INTERVAL, cycle=sync_all_days, rerender=rerender_day, push=PUSH_CHANGES,
+                 importer=import_source, local_ingest=ingest_local_changes, watch=LOCAL_WATCH):
+        self.cycle = cycle
+        self.push = push
+        self._listeners = {}   # profile name -> ChangeListener
+        self.rerender = rerender
+        self._rerender_days = []   # (profile name, day)
+        self.importer = importer
+        self._imports = []   # (profile name, path, day)
+        self.local_ingest = local_ingest
+        self.watch = watch
+        self._watchers = {}   # profile name -> LocalWatcher
+        self._local_changes = {}   # profile name -> {day: {"data": names, "photos": names}}
+        self._interval = interval
+        self._cond = threading.Condition()
+        self._state = STOPPED
+        self._wake = False
+        self._token = None
+        self._thread = None
+        self.busy = False
+        self.cycles = 0
+        self.last_cycle_started = None
+        self.last_cycle_seconds = None
+
+    @property
+    def state(self):
+        return self._state
+
+    @property
+    def interval(self):
+        return self._interval
+
+    @property
+    def push_connected(self):
+        """True while every profile's change feed is connected."""
+        listeners = list(self._listeners.values())
+        return bool(listeners) and all(l.connected for l in listeners)
+
+    def _effective_interval(self):
+        # with the change feed up, polling is only a safety net
+        if self.push_connected:
+            return max(self._interval, PUSH_FALLBACK_INTERVAL)
+        return self._interval
+
+    def _on_push(self, days):
+        self.sync_now()
+
+    def _on_push_state(self, connected):
+        # re-evaluate the current wait against the new interval
+        with self._cond:
+            self._cond.notify_all()
+
+    @property
+    def pending_rerenders(self):
+        with self._cond:
+            return list(self._rerender_days)
+
+    @property
+    def pending_local_changes(self):
+        with self._cond:
+            return {p: sorted(days) for p, days in self._local_changes.items()}
+
+    def _on_local_change(self, profile, changes):
+        # handled on the engine thread without waiting for (or starting) a sync cycle
+        with self._cond:
+            pending = self._local_changes.setdefault(profile, {})
+            for day, kinds in changes.items():
+                merged = pending.setdefault(day, {"data": set(), "photos": set()})
+                for kind, names in kinds.items():
+                    merged[kind].update(names)
+            self._cond.notify_all()
+
+    @property
+    def pending_imports(self):
+        with self._cond:
+            return [path for _, path, _ in self._imports]
+
+    def _set_state(self, state):
+        # caller holds self._cond
+        if self._state == state:
+            return False
+        self._state = state
+        if state != RUNNING and self._token is not None:
+            self._token.cancel(state)
+        self._cond.notify_all()
+        return True
+
+    def start(self):
+        with self._cond:
+            changed = self._set_state(RUNNING)
+            self._wake = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sync-engine", daemon=True)
+                self._thread.start()
+            if self.push:
+                for site in enabled_profiles():
+                    listener = self._listeners.get(site.name)
+                    if site.push and (listener is None or not listener.is_alive()):
+                        listener = self._listeners[site.name] = ChangeListener(
+                            self._on_push, self._on_push_state, base_url=site.base_url, name=site.name
+                        )
+                        listener.start()
+            if self.watch:
+                for site in enabled_profiles():
+                    watcher = self._watchers.get(site.name)
+                    if watcher is None or not watcher.is_alive():
+                        watcher = self._watchers[site.name] = LocalWatcher(
+                            site.local_dir, lambda changes, name=site.name: self._on_local_change(name, changes),
+                            name=site.name
+                        )
+                        watcher.start()
+            self._cond.notify_all()
+        if changed:
+            log("Sync started")
+            publish(EngineStateChanged(RUNNING, self.busy))
+
+    def stop(self):
+        with self._cond:
+            changed = self._set_state(STOPPED)
+            listeners, self._listeners = self._listeners, {}
+            watchers, self._watchers = self._watchers, {}
+        for listener in list(listeners.values()) + list(watchers.values()):
+            listener.stop()
+        if changed:
+            log("Sync stopped")
+            publish(EngineStateChanged(STOPPED, self.busy))
+
+    def pause(self):
+        with self._cond:
+            if self._state != RUNNING:
+                return
+            self._set_state(PAUSED)
+        log("Sync paused")
+        publish(EngineStateChanged(PAUSED, self.busy))
+
+    def resume(self):
+        with self._cond:
+            if self._state != PAUSED:
+                return
+            self._set_state(RUNNING)
+            # a paused cycle was cancelled part-way, so pick it up straight away
+            self._wake = True
+        log("Sync resumed")
+        publish(EngineStateChanged(RUNNING, self.busy))
+
+    def sync_now(self):
+        """Skip the rest of the interval wait and start a cycle."""
+        with self._cond:
+            if self._state != RUNNING:
+                return False
+            self._wake = True
+            self._cond.notify_all()
+        return True
+
+    def request_rerender(self, day, profile=DEFAULT_NAME):
+        """Queue a full rebuild of day's partial report, run ahead of the next cycle."""
+        with self._cond:
+            if self._state != RUNNING or get_profile(profile) is None:
+                return False
+            if (profile, day) not in self._rerender_days:
+                self._rerender_days.append((profile, day))
+            self._wake = True
+            self._cond.notify_all()
+        return True
+
+    def request_import(self, path, profile=DEFAULT_NAME, day=None):
+        """Queue an offline import (import_utils.import_source), run ahead of the next cycle."""
+        with self._cond:
+            if self._state != RUNNING or get_profile(profile) is None:
+                return False
+            if (profile, path, day) not in self._imports:
+                self._imports.append((profile, path, day))
+            self._wake = True
+            self._cond.notify_all()
+        return True
+
+    def set_interval(self, seconds):
+        with self._cond:
+            self._interval = seconds
+            self._cond.notify_all()
+
+    def join(self, timeout=None):
+        """Waits for the engine thread to exit after stop(); True once it has."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
+
+    def _run(self):
+        full = True
+        last_cycle_end = time.monotonic()
+        while True:
+            with self._cond:
+                while self._state == PAUSED:
+                    self._cond.wait()
+                if self._state == STOPPED:
+                    self._thread = None
+                    return
+                if full:
+                    self._wake = False
+                token = self._token = CancelToken()
+
+            if full:
+                self._run_cycle(token)
+                last_cycle_end = time.monotonic()
+            else:
+                self._run_local(token)
+
+            with self._cond:
+                self._token = None
+                full = False
+                while self._state == RUNNING and not self._wake and not self._local_changes:
+                    remaining = last_cycle_end + self._effective_interval() - time.monotonic()
+                    if remaining <= 0:
+                        full = True
+                        break
+                    self._cond.wait(remaining)
+                # local changes alone get a local pass; the interval keeps running
+                full = full or self._wake or self._state != RUNNING
+
+    def _drain_local_changes(self, token):
+        while True:
+            with self._cond:
+                if not self._local_changes:
+                    return
+                profile, changes = self._local_changes.popitem()
+            try:
+                with activate(get_profile(profile)):
+                    self.local_ingest(changes, token)
+            except SyncCancelled:
+                self._on_local_change(profile, changes)
+                raise
+            except Exception as e:
+                log(f"Local changes of {profile} failed: {e}")
+
+    def _run_local(self, token):
+        self.busy = True
+        publish(EngineStateChanged(self._state, True))
+        try:
+            self._drain_local_changes(token)
+        except SyncCancelled as e:
+            log(f"Local ingest cancelled ({e})")
+        finally:
+            self.busy = False
+            publish(EngineStateChanged(self._state, False))
+
+    def _run_cycle(self, token):
+        self.busy = True
+        self.last_cycle_started = time.time()
+        metrics.set_gauge("sync_engine_busy", 1)
+        publish(EngineStateChanged(self._state, True))
+        started = time.monotonic()
+        try:
+            self._drain_local_changes(token)
+            while True:
+                with self._cond:
+                    if not self._imports:
+                        break
+                    profile, path, day = self._imports.pop(0)
+                try:
+                    with activate(get_profile(profile)):
+                        self.importer(path, day=day, cancel=token)
+                except SyncCancelled:
+                    # files stored before the cancel are listed already; the retry finishes their days
+                    with self._cond:
+                        self._imports.insert(0, (profile, path, day))
+                    raise
+                except Exception as e:
+                    log(f"Import of {path} failed: {e}")
+            while True:
+                with self._cond:
+                    if not self._rerender_days:
+                        break
+                    profile, day = self._rerender_days.pop(0)
+                log(f"Re-rendering {day} ({profile}) on request")
+                try:
+                    with activate(get_profile(profile)):
+                        self.rerender(day, token)
+                except SyncCancelled:
+                    with self._cond:
+                        self._rerender_days.insert(0, (profile, day))
+                    raise
+                except Exception as e:
+                    log(f"Re-render of {day} ({profile}) failed: {e}")
+            self.cycle(token)
+        except SyncCancelled as e:
+            log(f"Sync cycle cancelled ({e})")
+        except Exception as e:
+            log(f"Sync cycle failed: {e}\n{traceback.format_exc()}")
+        finally:
+            self.busy = False
+            self.cycles += 1
+            self.last_cycle_seconds = time.monotonic() - started
+            metrics.set_gauge("sync_engine_busy", 0)
+            metrics.inc("sync_cycles_total")
+            metrics.set_gauge("sync_last_cycle_seconds", round(self.last_cycle_seconds, 3))
+            publish(EngineStateChanged(self._state, False))
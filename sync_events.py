@@ -0,0 +1,61 @@
+import queue
+import threading
+from collections import namedtuple
+
+
+# Events published by the sync side (worker threads) for the GUI.
+FileDownloaded = namedtuple("FileDownloaded", "day kind name")          # kind: "data" | "photos"
+ProgressCounts = namedtuple("ProgressCounts", "day data photos")
+ShiftStateChanged = namedtuple("ShiftStateChanged", "day shift state time")  # state: "IN" | "OUT"
+ReportRendered = namedtuple("ReportRendered", "day path final")
+EngineStateChanged = namedtuple("EngineStateChanged", "state busy")    # state: "running" | "paused" | "stopped"
+
+_subscribers = []
+_lock = threading.Lock()
+
+
+def subscribe(maxsize=1000):
+    """New queue receiving every event published from now on."""
+    q = queue.Queue(maxsize=maxsize)
+    with _lock:
+        _subscribers.append(q)
+    return q
+
+
+def unsubscribe(q):
+    with _lock:
+        if q in _subscribers:
+            _subscribers.remove(q)
+
+
+def publish(event):
+    """Thread-safe, never blocks; a subscriber that stops draining loses its oldest events."""
+    with _lock:
+        targets = list(_subscribers)
+    for q in targets:
+        while True:
+            try:
+                q.put_nowait(event)
+                break
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    pass
+
+
+def pending():
+    """Undrained events summed over all subscribers."""
+    with _lock:
+        return sum(q.qsize() for q in _subscribers)
+
+
+def drain(q, limit=200):
+    """Up to `limit` pending events from q, without blocking."""
+    events = []
+    while len(events) < limit:
+        try:
+            events.append(q.get_nowait())
+        except queue.Empty:
+            break
+    return events
@@ -0,0 +1,22 @@
+import os
+import sys
+import tempfile
+
+# config.py creates its folders under %APPDATA% on import; keep them out of the real profile
+os.environ["APPDATA"] = tempfile.mkdtemp(prefix="dailysync-tests-")
+os.environ.setdefault("SYNC_BASE_URL", "http://127.0.0.1:9/records/")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+from site_profiles import SiteProfile, activate  # noqa: E402
+from config import TEMPLATE_ORIG  # noqa: E402
+
+DAY = "2025-12-04"
+
+
+@pytest.fixture
+def site(tmp_path):
+    """A site profile with its own folders under tmp_path, active on this thread."""
+    profile = SiteProfile("test", "http://127.0.0.1:9/records/", TEMPLATE_ORIG, str(tmp_path / "sync"))
+    with activate(profile):
+        yield profile
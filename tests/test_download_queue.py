@@ -0,0 +1,80 @@
+import json
+from types import SimpleNamespace
+
+import record_store
+import download_queue
+from download_queue import DownloadScheduler
+
+TODAY = "2025-12-04"
+OLD = "2025-12-01"
+
+
+def store(day, records):
+    for i, record in enumerate(records, 1):
+        record_store.ingest_bytes(day, f"r{i:03d}.json", json.dumps(record).encode("utf-8"))
+
+
+def day_records(prefix):
+    return [
+        {"type": "start_shift", "shift": "1", "photo": f"{prefix}_in1.jpg"},
+        {"type": "record_update", "shift": "1", "cage_number": "590", "photo": f"{prefix}_590.jpg"},
+        {"type": "end_shift", "shift": "1", "photo": f"{prefix}_out1.jpg"},
+        {"type": "start_shift", "shift": "2", "photo": f"{prefix}_in2.jpg"},
+        {"type": "end_shift", "shift": "2", "photo": f"{prefix}_out2.jpg"},
+    ]
+
+
+def photos(prefix):
+    return [f"{prefix}_{n}.jpg" for n in ("extra", "in1", "590", "out1", "in2", "out2")]
+
+
+def drain(scheduler):
+    order = []
+    while True:
+        job = scheduler.pop()
+        if job is None:
+            return order
+        order.append((job.day, job.name))
+        scheduler.done(job)
+
+
+def test_todays_sign_photos_come_before_older_days(site):
+    store(OLD, day_records("old"))
+    store(TODAY, day_records("new"))
+    scheduler = DownloadScheduler(TODAY, aging_seconds=3600)
+    scheduler.add_day(OLD, [], photos("old"))
+    scheduler.add_day(TODAY, [], photos("new"))
+    scheduler.add_day(OLD, ["late.json"], [])
+
+    order = drain(scheduler)
+    assert order[0] == (OLD, "late.json")
+    # every photo of today the report shows, then the old day's readiness photos
+    assert {name for _, name in order[1:6]} == {f"new_{n}.jpg" for n in ("in1", "590", "out1", "in2", "out2")}
+    assert {name for _, name in order[6:8]} == {"old_590.jpg", "old_out2.jpg"}
+    assert order[8] == (TODAY, "new_extra.jpg")
+    assert len(order) == 13
+    assert scheduler.day_pending(TODAY) == scheduler.day_pending(OLD) == 0
+
+
+def test_photos_wait_for_their_days_records(site):
+    scheduler = DownloadScheduler(TODAY, aging_seconds=3600)
+    scheduler.add_day(TODAY, ["r001.json"], ["new_in1.jpg"])
+    job = scheduler.pop()
+    assert job.kind == "data"
+    assert scheduler.pop() is None
+    store(TODAY, day_records("new"))
+    scheduler.done(job)
+    assert scheduler.pop().name == "new_in1.jpg"
+
+
+def test_waiting_jobs_age_past_new_work(site, monkeypatch):
+    clock = SimpleNamespace(now=0.0)
+    monkeypatch.setattr(download_queue, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    scheduler = DownloadScheduler(TODAY, aging_seconds=10)
+    scheduler.add_day(OLD, [], ["old_extra.jpg"])      # band OTHER
+    clock.now = 49
+    scheduler.add_day(TODAY, ["r001.json"], [])        # band RECORDS_TODAY
+    assert scheduler.pop().name == "r001.json"
+    clock.now = 51
+    scheduler.add_day(TODAY, ["r002.json"], [])
+    assert scheduler.pop().name == "old_extra.jpg"
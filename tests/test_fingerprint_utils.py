@@ -0,0 +1,70 @@
+import os
+from docx import Document
+
+import fingerprint_utils
+from fingerprint_utils import compute_render_fingerprint
+
+
+def template(tmp_path):
+    doc = Document()
+    doc.add_paragraph("Cage (1c590) / 1c591")
+    doc.add_paragraph("(pic_590)")
+    path = str(tmp_path / "template.docx")
+    doc.save(path)
+    return path
+
+
+def photo(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_only_referenced_inputs_count(tmp_path):
+    tpl = template(tmp_path)
+    base, inputs = compute_render_fingerprint(tpl, {"(1c590)": "1M,0L", "(1c591)": "0M,0L"}, {})
+    # the bare form of (1c591) is in the template, so the XML pass fills it
+    assert set(inputs["text"]) == {"(1c590)", "(1c591)"}
+
+    unused, _ = compute_render_fingerprint(
+        tpl, {"(1c590)": "1M,0L", "(1c591)": "0M,0L", "(1c700)": "5M,5L"}, {"(pic_700)": None})
+    assert unused == base
+
+    changed, _ = compute_render_fingerprint(tpl, {"(1c590)": "2M,0L", "(1c591)": "0M,0L"}, {})
+    assert changed != base
+
+
+def test_image_content_counts_not_its_path(tmp_path):
+    tpl = template(tmp_path)
+    first = photo(tmp_path, "a.jpg", b"one")
+    fp, inputs = compute_render_fingerprint(tpl, {}, {"(pic_590)": first})
+    assert inputs["images"]["(pic_590)"] is not None
+
+    same, _ = compute_render_fingerprint(tpl, {}, {"(pic_590)": photo(tmp_path, "b.jpg", b"one")})
+    assert same == fp
+
+    other, _ = compute_render_fingerprint(tpl, {}, {"(pic_590)": photo(tmp_path, "c.jpg", b"two")})
+    missing, inputs = compute_render_fingerprint(tpl, {}, {"(pic_590)": str(tmp_path / "gone.jpg")})
+    assert len({fp, other, missing}) == 3
+    assert inputs["images"]["(pic_590)"] is None
+
+
+def test_photo_hashes_are_cached_until_the_file_changes(tmp_path, monkeypatch):
+    tpl = template(tmp_path)
+    path = photo(tmp_path, "a.jpg", b"one")
+    hashed = []
+    real = fingerprint_utils.file_sha256
+    monkeypatch.setattr(fingerprint_utils, "file_sha256", lambda p, *a: hashed.append(p) or real(p, *a))
+
+    first, _ = compute_render_fingerprint(tpl, {}, {"(pic_590)": path})
+    again, _ = compute_render_fingerprint(tpl, {}, {"(pic_590)": path})
+    assert again == first
+    assert hashed.count(path) == 1
+
+    with open(path, "wb") as f:
+        f.write(b"two!")
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+    changed, _ = compute_render_fingerprint(tpl, {}, {"(pic_590)": path})
+    assert changed != first
+    assert hashed.count(path) == 2
@@ -0,0 +1,95 @@
+import json
+from datetime import date
+import numpy as np
+import pytest
+
+import history_store
+from history_store import CageHistory, PlaceIndex, day_counts, rollup, month_keys, week_keys
+from site_profiles import SiteProfile, activate
+from config import TEMPLATE_ORIG
+
+PLACES = {"North": [10, 12], "Empty": [], "South": [11, 13, 14]}
+
+
+def update(shift, cage, myna, local):
+    return {"type": "record_update", "shift": shift, "cage_number": str(cage),
+            "myna_captured": str(myna), "local_released": str(local)}
+
+
+@pytest.fixture
+def registry_site(tmp_path):
+    path = tmp_path / "registry.json"
+    path.write_text(json.dumps({"places": PLACES}))
+    profile = SiteProfile("history", "http://127.0.0.1:9/records/", TEMPLATE_ORIG,
+                          str(tmp_path / "sync"), registry=str(path))
+    with activate(profile):
+        yield profile
+
+
+def test_day_counts_sum_per_shift_and_cage():
+    records = [
+        {"type": "start_shift", "shift": "1"},
+        update("1", 10, 2, 1),
+        update("1", 10, 1, "bad"),
+        update("2", 14, 3, 0),
+        update("1", 99, 5, 5),      # outside the slot range
+    ]
+    counts = day_counts(records, 10, 5)
+    assert counts[0, 0, 0] == 3 and counts[0, 1, 0] == 1
+    assert counts[1, 0, 4] == 3
+    assert counts.sum() == 7
+
+
+def test_place_totals_include_empty_places():
+    index = PlaceIndex(PLACES, 10, 5)
+    counts = np.arange(5, dtype=np.int32)   # cage 10 -> 0, ..., cage 14 -> 4
+    assert index.totals(counts).tolist() == [0 + 2, 0, 1 + 3 + 4]
+
+
+def test_rollup_groups_months_and_weeks():
+    days = np.array([date(2025, 1, d).toordinal() for d in (30, 31)]
+                    + [date(2025, 2, d).toordinal() for d in (1, 3)], dtype=np.int32)
+    counts = np.arange(4, dtype=np.int32)
+    keys, monthly = rollup(days, counts, month_keys(days))
+    assert keys.tolist() == [2025 * 12, 2025 * 12 + 1]
+    assert monthly.tolist() == [1, 5]
+
+    keys, weekly = rollup(days, counts, week_keys(days))
+    # 2025-01-27 and 2025-02-03 are Mondays
+    assert [date.fromordinal(int(k)) for k in keys] == [date(2025, 1, 27), date(2025, 2, 3)]
+    assert weekly.tolist() == [3, 3]
+
+
+def test_put_keeps_days_sorted_and_replaces():
+    history = CageHistory(10, 5)
+    history.put("2025-03-02", day_counts([update("1", 10, 1, 0)], 10, 5))
+    history.put("2025-03-01", day_counts([update("1", 11, 2, 0)], 10, 5))
+    history.put("2025-03-02", day_counts([update("1", 10, 4, 0)], 10, 5))
+    assert [date.fromordinal(int(d)).isoformat() for d in history.days] == ["2025-03-01", "2025-03-02"]
+    assert history.counts[1, 0, 0, 0] == 4
+
+
+def test_cover_widens_the_slot_range():
+    history = CageHistory(10, 5)
+    history.put("2025-03-01", day_counts([update("1", 12, 1, 0)], 10, 5))
+    history.cover({"West": [8, 16]})
+    assert (history.first_cage, history.slots) == (8, 9)
+    assert history.counts[0, 0, 0, 12 - 8] == 1
+
+
+def test_monthly_summary_from_saved_store(registry_site):
+    history_store.update_day("2025-01-31", [update("1", 10, 2, 1), update("2", 13, 1, 0)])
+    history_store.update_day("2025-02-01", [update("1", 12, 4, 0)])
+    history_store.update_day("2024-12-31", [update("1", 12, 9, 9)])
+    registry_site.scratch.clear()   # read back from cage_history.npz
+
+    summary = history_store.monthly_summary(2025)
+    assert summary["months"] == ["2025-01", "2025-02"]
+    assert summary["places"] == list(PLACES)
+    place = summary["place"]   # (months, places, shift, myna/local)
+    assert place[0, 0].tolist() == [[2, 1], [0, 0]]
+    assert place[0, 2].tolist() == [[0, 0], [1, 0]]
+    assert place[1, 0, 0, 0] == 4
+    assert place[:, 1].sum() == 0
+    text = history_store.format_monthly_summary(summary)
+    assert "2025-01" in text and "All places" in text
@@ -0,0 +1,74 @@
+import os
+import json
+import pytest
+
+import record_store
+from cancel_utils import CancelToken, SyncCancelled
+from import_utils import import_source, classify
+from sync_day import download_db
+from conftest import DAY
+
+
+class CancelAfter(CancelToken):
+    """Fires on the n-th cancellation check."""
+
+    def __init__(self, checks):
+        super().__init__()
+        self.checks = checks
+
+    def raise_if_cancelled(self):
+        self.checks -= 1
+        if self.checks < 0:
+            self.cancel("test")
+        super().raise_if_cancelled()
+
+
+def write_export(root):
+    data = os.path.join(root, DAY, "data")
+    os.makedirs(data)
+    records = [
+        {"type": "start_shift", "shift": "1", "timestamp": f"{DAY} 03:00:00"},
+        {"type": "record_update", "shift": "1", "cage_number": "590", "myna_captured": "2", "local_released": "1"},
+        {"type": "record_update", "shift": "1", "cage_number": "591", "myna_captured": "1", "local_released": "0"},
+    ]
+    for i, record in enumerate(records, 1):
+        with open(os.path.join(data, f"record_{i:03d}.json"), "w") as f:
+            json.dump(record, f)
+    return root
+
+
+def test_classify():
+    assert classify(f"export/{DAY}/data/record_001.json") == (DAY, "data", "record_001.json")
+    assert classify(f"{DAY}/photos/590.jpg") == (DAY, "photos", "590.jpg")
+    assert classify("loose/590.jpg", day=DAY) == (DAY, "photos", "590.jpg")
+    assert classify("loose/590.jpg") is None
+    assert classify(f"{DAY}/photos/590_162.jpg") is None
+    assert classify(f"{DAY}/notes.txt") is None
+
+
+def test_cancelled_import_is_finished_by_the_retry(site, tmp_path):
+    source = write_export(str(tmp_path / "export"))
+
+    # cancelled after two of the three records were stored
+    with pytest.raises(SyncCancelled):
+        import_source(source, cancel=CancelAfter(2))
+    entry = download_db()[DAY]
+    assert sorted(entry["data"]) == ["record_001.json", "record_002.json"]
+    assert entry.get("render_pending")
+    assert len(record_store.known_hashes(DAY)) == 2
+
+    result = import_source(source)
+    assert result["skipped"] == 2
+    entry = download_db()[DAY]
+    assert sorted(entry["data"]) == ["record_001.json", "record_002.json", "record_003.json"]
+    assert not entry.get("render_pending")
+    assert "import_unfinished" not in entry
+    assert os.path.exists(os.path.join(site.output_dir, f"Daily_Report_{DAY}_partial.docx"))
+
+
+def test_reimport_is_all_duplicates(site, tmp_path):
+    source = write_export(str(tmp_path / "export"))
+    import_source(source, render=False)
+    result = import_source(source, render=False)
+    assert result["skipped"] == 3
+    assert result["days"][DAY] == {"data": 0, "photos": 0, "originals": 0}
@@ -0,0 +1,49 @@
+import os
+
+from local_watch import LocalWatcher, classify
+from conftest import DAY
+
+
+def test_classify():
+    assert classify(f"{DAY}/data/r1.json") == (DAY, "data", "r1.json")
+    assert classify(f"{DAY}\\photos\\590.JPG") == (DAY, "photos", "590.JPG")
+    assert classify(f"{DAY}/photos/590_162.jpg") is None
+    assert classify(f"{DAY}/data/r1.json.part") is None
+    assert classify(f"{DAY}/data/.r1.json") is None
+    assert classify(f"{DAY}/data/notes.txt") is None
+    assert classify(f"{DAY}/reports/x.json") is None
+    assert classify("2025-1-4/data/r1.json") is None
+    assert classify(f"{DAY}/data/sub/r1.json") is None
+
+
+def touch(root, *parts):
+    path = os.path.join(root, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write("{}")
+
+
+def test_polling_reports_new_files_once(tmp_path):
+    root = str(tmp_path)
+    touch(root, DAY, "data", "old.json")
+    changes = []
+    watcher = LocalWatcher(root, changes.append, debounce=0)
+    watcher.poll_once()
+    watcher._primed = True
+    watcher._flush(force=True)
+    assert changes == []   # the first pass only records what is there
+
+    touch(root, DAY, "data", "new.json")
+    touch(root, DAY, "photos", "590.jpg")
+    touch(root, DAY, "photos", "590_162.jpg")
+    touch(root, "2025-12-05", "data", "r1.json")
+    watcher.poll_once()
+    watcher._flush(force=True)
+    assert changes == [{
+        DAY: {"data": {"new.json"}, "photos": {"590.jpg"}},
+        "2025-12-05": {"data": {"r1.json"}, "photos": set()},
+    }]
+
+    watcher.poll_once()
+    watcher._flush(force=True)
+    assert len(changes) == 1
@@ -0,0 +1,68 @@
+import time
+
+from notify_utils import Notifier, NullBackend, MAX_LINES
+
+
+class FailingBackend:
+    name = "failing"
+
+    def show(self, title, msg):
+        raise RuntimeError("no notification service")
+
+
+def notifier(backend, **kwargs):
+    kwargs.setdefault("coalesce", 0.05)
+    kwargs.setdefault("min_interval", 0)
+    return Notifier(backends=[backend], **kwargs)
+
+
+def test_burst_on_one_topic_is_one_toast():
+    backend = NullBackend()
+    n = notifier(backend).start()
+    n.notify("Shift 1", "cage 590 updated", topic="shift")
+    n.notify("Shift 1", "cage 591 updated", topic="shift")
+    n.notify("Shift 1", "cage 590 updated", topic="shift")
+    n.notify("Import", "done")
+    n.stop()
+    assert backend.shown == [("Shift 1", "cage 590 updated\ncage 591 updated"), ("Import", "done")]
+
+
+def test_long_bursts_are_cut():
+    backend = NullBackend()
+    n = notifier(backend).start()
+    for i in range(MAX_LINES + 2):
+        n.notify("Sync", f"day {i}")
+    n.stop()
+    (title, msg), = backend.shown
+    assert msg.splitlines()[-1] == "(+2 more)"
+    assert len(msg.splitlines()) == MAX_LINES + 1
+
+
+def test_full_queue_drops_new_topics():
+    n = notifier(NullBackend(), maxsize=2)
+    assert n.notify("a", "1") and n.notify("b", "1")
+    assert not n.notify("c", "1")
+    assert n.notify("a", "2")   # merging needs no room
+
+
+def test_topic_waits_min_interval():
+    backend = NullBackend()
+    n = notifier(backend, coalesce=0, min_interval=0.3).start()
+    n.notify("Sync", "first")
+    deadline = time.monotonic() + 2
+    while not backend.shown and time.monotonic() < deadline:
+        time.sleep(0.01)
+    n.notify("Sync", "second")
+    time.sleep(0.1)
+    assert backend.shown == [("Sync", "first")]
+    n.stop()
+    assert backend.shown == [("Sync", "first"), ("Sync", "second")]
+
+
+def test_failing_backend_is_replaced():
+    fallback = NullBackend()
+    n = Notifier(backends=[FailingBackend(), fallback], coalesce=0, min_interval=0).start()
+    n.notify("Sync", "hello")
+    n.stop()
+    assert n.backend is fallback
+    assert fallback.shown == [("Sync", "hello")]
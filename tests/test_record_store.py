@@ -0,0 +1,53 @@
+import os
+import json
+
+import record_store
+from conftest import DAY
+
+
+def raw(record):
+    return json.dumps(record).encode("utf-8")
+
+
+def test_same_content_is_stored_once(site):
+    assert record_store.ingest_bytes(DAY, "a.json", raw({"v": 1}))
+    assert not record_store.ingest_bytes(DAY, "a.json", raw({"v": 1}))
+    assert record_store.ingest_bytes(DAY, "b.json", raw({"v": 2}))
+    with open(record_store.store_path(DAY)) as f:
+        assert len(f.readlines()) == 2
+
+
+def test_last_upload_of_a_name_wins(site):
+    record_store.ingest_bytes(DAY, "b.json", raw({"v": 1}))
+    record_store.ingest_bytes(DAY, "a.json", raw({"v": 1}))
+    record_store.ingest_bytes(DAY, "b.json", raw({"v": 2}))
+    records = record_store.load_records(DAY)
+    assert [(r["_filename"], r["v"]) for r in records] == [("a.json", 1), ("b.json", 2)]
+    assert record_store.get_records(DAY, ["b.json", "missing.json"])[0]["v"] == 2
+    size, sha = record_store.stored_hash(DAY, "b.json")
+    assert size == len(raw({"v": 2}))
+    assert record_store.known_hashes(DAY)[sha] == "b.json"
+
+
+def test_torn_last_line_is_dropped(site):
+    record_store.ingest_bytes(DAY, "a.json", raw({"v": 1}))
+    path = record_store.store_path(DAY)
+    with open(path, "ab") as f:
+        f.write(b'{"name": "b.json", "si')
+    record_store.forget_day(DAY)
+    assert [r["_filename"] for r in record_store.load_records(DAY)] == ["a.json"]
+    assert record_store.stored_hash(DAY, "b.json") is None
+    # the next append starts on a clean line
+    record_store.ingest_bytes(DAY, "b.json", raw({"v": 2}))
+    record_store.forget_day(DAY)
+    assert [r["_filename"] for r in record_store.load_records(DAY)] == ["a.json", "b.json"]
+
+
+def test_loose_record_files_are_imported(site):
+    folder = os.path.join(site.local_dir, DAY, "data")
+    os.makedirs(folder)
+    for name, v in (("r1.json", 1), ("r2.json", 2)):
+        with open(os.path.join(folder, name), "wb") as f:
+            f.write(raw({"v": v}))
+    assert [r["v"] for r in record_store.load_records(DAY)] == [1, 2]
+    assert os.listdir(folder) == []
@@ -0,0 +1,137 @@
+import io
+import os
+import json
+from docx import Document
+from PIL import Image
+
+import metrics
+import record_store
+import xml_utils
+from xml_utils import inject_images_into_members, read_docx_members, placeholders_in_paragraphs
+from db_utils import load_render_state
+from doc_utils import create_partial_report_with_shift_signs
+from conftest import DAY
+
+
+def jpeg_bytes(size=(64, 48), color=(200, 40, 40)):
+    buf = io.BytesIO()
+    Image.new("RGB", size, color).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+def split_docx(runs):
+    doc = Document()
+    p = doc.add_paragraph()
+    for text in runs:
+        p.add_run(text)
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+def drawing_count(members_or_path):
+    members = members_or_path if isinstance(members_or_path, dict) else read_docx_members(members_or_path)
+    return members["word/document.xml"].count(b"<w:drawing>")
+
+
+def add_record(day, name, record):
+    record_store.ingest_bytes(day, name, json.dumps(record).encode("utf-8"))
+
+
+def add_photo(site, day, name):
+    folder = os.path.join(site.local_dir, day, "photos")
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, name), "wb") as f:
+        f.write(jpeg_bytes())
+
+
+def test_split_placeholder_gets_its_picture():
+    members = read_docx_members(split_docx(["(pic_", "590", ")"]))
+    inject_images_into_members(members, {"(pic_590)": jpeg_bytes()})
+    assert drawing_count(members) == 1
+    assert placeholders_in_paragraphs(members, ["(pic_590)"]) == set()
+
+
+def test_split_placeholder_keeps_other_paragraphs():
+    doc = Document()
+    doc.add_paragraph("before")
+    p = doc.add_paragraph()
+    for text in ("(pic", "_59", "0)"):
+        p.add_run(text)
+    doc.add_paragraph("(pic_591)")
+    buf = io.BytesIO()
+    doc.save(buf)
+    members = read_docx_members(buf.getvalue())
+    inject_images_into_members(members, {"(pic_590)": jpeg_bytes(), "(pic_591)": None})
+    assert drawing_count(members) == 1
+    assert b"before" in members["word/document.xml"]
+    assert placeholders_in_paragraphs(members, ["(pic_590)", "(pic_591)"]) == {"(pic_591)"}
+
+
+def test_split_placeholder_width_matches_fallback():
+    members = read_docx_members(split_docx(["(pic_", "590", ")"]))
+    inject_images_into_members(members, {"(pic_590)": jpeg_bytes((100, 50))})
+    xml = members["word/document.xml"].decode("utf-8")
+    assert f'cx="{xml_utils.FALLBACK_WIDTH_EMU}" cy="{xml_utils.FALLBACK_WIDTH_EMU // 2}"' in xml
+
+
+def test_incremental_patch_handles_split_placeholder(site):
+    # cage 590's picture placeholder is split over three runs in the template
+    add_record(DAY, "record_001.json", {"type": "start_shift", "shift": "1", "timestamp": f"{DAY} 03:00:00"})
+    add_record(DAY, "record_002.json", {"type": "record_update", "shift": "1", "cage_number": "589",
+                                        "myna_captured": "1", "local_released": "0", "photo": "589.jpg"})
+    add_photo(site, DAY, "589.jpg")
+    first = create_partial_report_with_shift_signs(DAY)
+    assert load_render_state(DAY).get("slots"), "first render must leave a slot map for patching"
+
+    add_record(DAY, "record_003.json", {"type": "record_update", "shift": "1", "cage_number": "590",
+                                        "myna_captured": "2", "local_released": "1", "photo": "590.jpg"})
+    add_photo(site, DAY, "590.jpg")
+    incremental = metrics.get("render_total", mode="incremental") or 0
+    patched = create_partial_report_with_shift_signs(DAY)
+    assert metrics.get("render_total", mode="incremental") == incremental + 1
+    patched_members = read_docx_members(patched)
+    assert placeholders_in_paragraphs(patched_members, ["(pic_590)"]) == set()
+
+    # a full rebuild of the same inputs has the same pictures
+    os.remove(os.path.join(site.render_state_dir, os.listdir(site.render_state_dir)[0]))
+    rebuilt = create_partial_report_with_shift_signs(DAY)
+    assert rebuilt == first == patched
+    assert drawing_count(patched_members) == drawing_count(rebuilt)
+
+
+def paragraphs(docx_bytes):
+    """(text, drawings) of every document paragraph."""
+    from lxml import etree
+    root = etree.fromstring(read_docx_members(docx_bytes)["word/document.xml"])
+    return [(xml_utils.paragraph_text(p), len(p.findall(".//" + xml_utils.W_NS + "drawing")))
+            for p in root.iter(xml_utils.W_NS + "p")]
+
+
+def test_streaming_and_python_docx_renders_agree():
+    from doc_utils import DayModel, compile_template, render_docx, render_docx_streaming
+    from doc_utils import PLACES_CAGES, PLACE_TOTAL_PLACEHOLDERS
+    from config import TEMPLATE_ORIG
+
+    text = {}
+    images = {}
+    for cages in PLACES_CAGES.values():
+        for c in cages:
+            text[f"(1c{c})"] = f"{c % 4}M,{c % 3}L"
+            text[f"(2c{c})"] = "0"
+            images[f"(pic_{c})"] = jpeg_bytes(color=(c % 256, 80, 80))
+    for n, (total, myna, local) in enumerate(PLACE_TOTAL_PLACEHOLDERS.values()):
+        text.update({total: str(3 * n), myna: str(2 * n), local: str(n)})
+    model = DayModel(DAY, text, images)
+    template = compile_template(TEMPLATE_ORIG)
+
+    full = render_docx(model, template)
+    streamed = io.BytesIO()
+    render_docx_streaming(model, template, streamed)
+
+    expected = paragraphs(full)
+    got = paragraphs(streamed.getvalue())
+    assert len(got) == len(expected)
+    diff = [(i, e, g) for i, (e, g) in enumerate(zip(expected, got)) if e != g]
+    assert diff == []
+    assert sum(n for _, n in got) == len(images)
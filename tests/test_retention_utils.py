@@ -0,0 +1,114 @@
+import io
+import os
+import zipfile
+from datetime import datetime, timedelta
+from PIL import Image
+
+import record_store
+import retention_utils
+from retention_utils import archivable, apply_retention, rehydrate_day, archive_path
+from sync_day import download_db, deletable_files, record_verified
+from fingerprint_utils import file_sha256
+from config import ARCHIVE_AFTER_DAYS
+
+
+def days_ago(n):
+    return (datetime.now() - timedelta(days=n)).strftime("%Y-%m-%d")
+
+
+def nothing_pending(day):
+    return []
+
+
+def make_day(site, day):
+    record_store.ingest_bytes(day, "r1.json", b'{"type": "start_shift", "shift": "1"}')
+    photos = os.path.join(site.local_dir, day, "photos")
+    os.makedirs(photos)
+    for name in ("590.jpg", "590_162.jpg"):
+        with open(os.path.join(photos, name), "wb") as f:
+            f.write(b"\xff\xd8not really a jpeg")
+
+
+def test_archivable():
+    db = {"a": {"finalized": True}, "b": {}, "c": {"finalized": True}}
+    assert archivable(db, "a", nothing_pending)
+    assert not archivable(db, "b", nothing_pending)
+    assert not archivable(db, "missing", nothing_pending)
+    assert not archivable(db, "c", lambda day: ["590.jpg"])
+
+
+def test_old_finalized_days_are_archived_and_rehydrated(site, monkeypatch):
+    monkeypatch.setattr(retention_utils, "DISK_BUDGET_MB", 0)
+    old, young, open_day = days_ago(ARCHIVE_AFTER_DAYS + 1), days_ago(1), days_ago(ARCHIVE_AFTER_DAYS + 2)
+    db = {old: {"finalized": True}, young: {"finalized": True}, open_day: {}}
+    for day in db:
+        make_day(site, day)
+
+    assert apply_retention(db, nothing_pending, force=True) != 0
+    assert db[old]["archived"] == f"{old}.zip"
+    assert not os.path.exists(os.path.join(site.local_dir, old))
+    assert os.path.isdir(os.path.join(site.local_dir, young))
+    assert os.path.isdir(os.path.join(site.local_dir, open_day))
+    assert [r["_filename"] for r in record_store.load_archived_records(archive_path(old))] == ["r1.json"]
+
+    # throttled until RETENTION_INTERVAL has passed
+    db[young]["finalized"] = False
+    assert apply_retention(db, nothing_pending) == 0
+
+    assert rehydrate_day(db, old)
+    assert "archived" not in db[old]
+    assert sorted(os.listdir(os.path.join(site.local_dir, old, "photos"))) == ["590.jpg"]
+    assert [r["_filename"] for r in record_store.load_records(old)] == ["r1.json"]
+
+
+def test_disk_budget_archives_young_days_oldest_first(site, monkeypatch):
+    monkeypatch.setattr(retention_utils, "DISK_BUDGET_MB", 1)
+    # push the sync folder over a 1 MB budget with an unarchivable day
+    big = days_ago(0)
+    make_day(site, big)
+    with open(os.path.join(site.local_dir, big, "photos", "big.jpg"), "wb") as f:
+        f.write(os.urandom(1024 * 1024))
+    older, newer = days_ago(2), days_ago(1)
+    db = {big: {}, older: {"finalized": True}, newer: {"finalized": True}}
+    make_day(site, older)
+    make_day(site, newer)
+
+    apply_retention(db, nothing_pending, force=True)
+    assert db[older].get("archived") and db[newer].get("archived")
+    assert "archived" not in db[big]
+
+
+def full_size_jpeg(path):
+    # noise at quality 100 shrinks when re-encoded at ARCHIVE_JPEG_QUALITY
+    img = Image.frombytes("RGB", (256, 256), os.urandom(256 * 256 * 3))
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=100)
+    with open(path, "wb") as f:
+        f.write(buf.getvalue())
+
+
+def test_archived_day_keeps_server_cleanup_going(site, monkeypatch):
+    monkeypatch.setattr(retention_utils, "DISK_BUDGET_MB", 0)
+    day = days_ago(ARCHIVE_AFTER_DAYS + 1)
+    record = b'{"type": "start_shift", "shift": "1"}'
+    record_store.ingest_bytes(day, "r1.json", record)
+    photo = os.path.join(site.local_dir, day, "photos", "590.jpg")
+    os.makedirs(os.path.dirname(photo))
+    full_size_jpeg(photo)
+
+    db = download_db()
+    db[day] = {"data": ["r1.json", "r2.json"], "photos": ["590.jpg"], "finalized": True}
+    record_verified(day, "data", "r1.json", {"size": len(record), "sha256": record_store.stored_hash(day, "r1.json")[1]})
+    record_verified(day, "photos", "590.jpg", {"size": os.path.getsize(photo), "sha256": file_sha256(photo)})
+    before = os.path.getsize(photo)
+    assert deletable_files(day) == {"data": ["r1.json"], "photos": ["590.jpg"]}
+
+    # verified files the server has not deleted yet do not hold the day back
+    apply_retention(db, nothing_pending, force=True)
+    assert db[day]["archived"]
+    with zipfile.ZipFile(archive_path(day)) as z:
+        assert z.getinfo("photos/590.jpg").file_size < before
+    assert deletable_files(day) == {"data": ["r1.json"], "photos": ["590.jpg"]}
+
+    db[day]["server_deleted"] = ["data/r1.json"]
+    assert deletable_files(day) == {"data": [], "photos": ["590.jpg"]}
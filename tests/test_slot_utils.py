@@ -0,0 +1,85 @@
+import zipfile
+from docx import Document
+
+from slot_utils import expected_paragraph_text, index_slots, patch_slots
+from xml_utils import read_docx_members, paragraph_text, W_NS
+
+
+def write_docx(path, paragraphs):
+    doc = Document()
+    for text in paragraphs:
+        doc.add_paragraph(text)
+    doc.save(path)
+    return path
+
+
+def texts(path):
+    from lxml import etree
+    root = etree.fromstring(read_docx_members(path)["word/document.xml"])
+    return [paragraph_text(p) for p in root.iter(W_NS + "p")]
+
+
+TEMPLATE = ["Cage 590: (1c590)", "Cage 591: (1c591) and 1c590", "Total (total)", "Footer"]
+
+
+def rendered(tmp_path, mapping):
+    template = write_docx(str(tmp_path / "template.docx"), TEMPLATE)
+    out = write_docx(str(tmp_path / "out.docx"), [expected_paragraph_text(t, mapping) for t in TEMPLATE])
+    return template, out
+
+
+def test_expected_text_replaces_bare_variant():
+    mapping = {"(1c590)": "2M,1L"}
+    assert expected_paragraph_text("(1c590) / 1c590", mapping) == "2M,1L / 2M,1L"
+
+
+def test_patch_matches_full_render(tmp_path):
+    mapping = {"(1c590)": "1M,0L", "(1c591)": "0M,0L", "(total)": "1"}
+    template, out = rendered(tmp_path, mapping)
+    slot_map = index_slots(out, template, mapping)
+    assert sum(len(s) for s in slot_map["parts"].values()) == 3
+    assert slot_map["invalid"] == []
+
+    new_mapping = dict(mapping, **{"(1c590)": "12M,3L", "(total)": "15"})
+    patched = str(tmp_path / "patched.docx")
+    new_map = patch_slots(out, patched, slot_map, ["(1c590)", "(total)"], new_mapping)
+    assert new_map is not None
+    assert texts(patched) == [expected_paragraph_text(t, new_mapping) for t in TEMPLATE]
+    with zipfile.ZipFile(patched) as z:
+        assert z.testzip() is None
+
+    # the returned map describes the patched file, so patches chain
+    again = str(tmp_path / "again.docx")
+    last = dict(new_mapping, **{"(1c591)": "4M,4L"})
+    assert patch_slots(patched, again, new_map, ["(1c591)"], last) is not None
+    assert texts(again) == [expected_paragraph_text(t, last) for t in TEMPLATE]
+
+
+def test_patch_refuses_unknown_or_unmapped_keys(tmp_path):
+    mapping = {"(1c590)": "1M,0L", "(1c591)": "0M,0L", "(total)": "1"}
+    template, out = rendered(tmp_path, mapping)
+    slot_map = index_slots(out, template, mapping)
+    target = str(tmp_path / "patched.docx")
+    assert patch_slots(out, target, slot_map, ["(1c600)"], mapping) is None
+
+    slot_map["invalid"] = ["Total (total)"]
+    assert patch_slots(out, target, slot_map, ["(total)"], mapping) is None
+
+
+def test_patch_refuses_changed_output(tmp_path):
+    mapping = {"(1c590)": "1M,0L", "(1c591)": "0M,0L", "(total)": "1"}
+    template, out = rendered(tmp_path, mapping)
+    slot_map = index_slots(out, template, mapping)
+    # the report was edited (or re-rendered) behind the slot map's back
+    write_docx(out, [expected_paragraph_text(t, dict(mapping, **{"(1c591)": "9M,9L"})) for t in TEMPLATE])
+    assert patch_slots(out, str(tmp_path / "patched.docx"), slot_map, ["(total)"], mapping) is None
+
+
+def test_paragraph_count_change_records_no_slots(tmp_path):
+    mapping = {"(1c590)": "1M,0L", "(1c591)": "0M,0L", "(total)": "1"}
+    template = write_docx(str(tmp_path / "template.docx"), TEMPLATE)
+    out = write_docx(str(tmp_path / "out.docx"),
+                     [expected_paragraph_text(t, mapping) for t in TEMPLATE] + ["extra"])
+    slot_map = index_slots(out, template, mapping)
+    assert slot_map["parts"] == {}
+    assert len(slot_map["invalid"]) == 3
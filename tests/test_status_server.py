@@ -0,0 +1,126 @@
+import json
+import socket
+import http.client
+import pytest
+
+import metrics
+from logger import log
+from status_server import StatusServer
+from sync_engine import RUNNING
+
+TOKEN = "test-token"
+
+
+class StubEngine:
+    state = RUNNING
+    busy = False
+    interval = 10
+    push_connected = False
+    cycles = 0
+    last_cycle_started = None
+    last_cycle_seconds = None
+    pending_rerenders = []
+    pending_imports = []
+    pending_local_changes = {}
+
+    def __init__(self):
+        self.woken = 0
+        self.rerenders = []
+
+    def sync_now(self):
+        self.woken += 1
+        return True
+
+    def request_rerender(self, day, profile):
+        self.rerenders.append((day, profile))
+        return True
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def server():
+    engine = StubEngine()
+    srv = StatusServer(engine, port=free_port(), token=TOKEN)
+    assert srv.start()
+    yield srv
+    srv.stop()
+
+
+def request(srv, method, path, headers=None, host=None):
+    conn = http.client.HTTPConnection("127.0.0.1", srv.port, timeout=5)
+    conn.putrequest(method, path, skip_host=True)
+    conn.putheader("Host", host or f"127.0.0.1:{srv.port}")
+    for k, v in (headers or {}).items():
+        conn.putheader(k, v)
+    conn.putheader("Content-Length", "0")
+    conn.endheaders()
+    resp = conn.getresponse()
+    body = json.loads(resp.read() or b"{}")
+    conn.close()
+    return resp.status, body
+
+
+AUTH = {"Authorization": f"Bearer {TOKEN}"}
+
+
+def test_post_needs_token(server):
+    assert request(server, "POST", "/sync-now")[0] == 401
+    assert request(server, "POST", "/sync-now", {"Authorization": "Bearer wrong"})[0] == 401
+    assert server.engine.woken == 0
+    assert request(server, "POST", "/sync-now", AUTH)[0] == 200
+    assert server.engine.woken == 1
+
+
+def test_foreign_host_refused(server):
+    # DNS rebinding: the browser sends the attacker's host name
+    assert request(server, "POST", "/sync-now", AUTH, host=f"evil.example:{server.port}")[0] == 403
+    assert request(server, "GET", "/status", host="evil.example")[0] == 403
+    assert request(server, "GET", "/status", host=f"localhost:{server.port}")[0] == 200
+    assert server.engine.woken == 0
+
+
+def test_origin_refused(server):
+    assert request(server, "POST", "/sync-now", dict(AUTH, Origin="https://example.com"))[0] == 403
+    assert request(server, "GET", "/status", {"Origin": "null"})[0] == 403
+    assert server.engine.woken == 0
+
+
+def test_control_token_created_once(tmp_path):
+    from status_server import control_token
+    path = str(tmp_path / "status_token")
+    token = control_token(path)
+    assert len(token) >= 32
+    assert control_token(path) == token
+
+
+def test_rerender_rejects_impossible_date(server):
+    assert request(server, "POST", "/rerender/2025-13-45", AUTH)[0] == 400
+    assert request(server, "POST", "/rerender/2025-02-30", AUTH)[0] == 400
+    assert server.engine.rerenders == []
+    assert request(server, "POST", "/rerender/2025-12-04", AUTH)[0] == 200
+    assert server.engine.rerenders == [("2025-12-04", "default")]
+
+
+def test_restart_does_not_duplicate_the_collector():
+    engine = StubEngine()
+    before = len(metrics._collectors)
+    for _ in range(2):
+        srv = StatusServer(engine, port=free_port(), token=TOKEN)
+        assert srv.start()
+        assert len(metrics._collectors) == before + 1
+        srv.stop()
+    assert len(metrics._collectors) == before
+
+
+def test_prometheus_text_types_and_escaping(server):
+    log("counted")
+    metrics.inc("profile_turns_total", profile='site "A"\\2')
+    text = metrics.prometheus_text()
+    assert "# TYPE log_lines_total counter" in text
+    assert "# TYPE log_queue_depth gauge" in text
+    assert 'profile_turns_total{profile="site \\"A\\"\\\\2"} 1' in text
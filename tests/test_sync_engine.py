@@ -0,0 +1,39 @@
+import time
+import threading
+
+from sync_engine import SyncEngine
+
+
+def wait_for(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_failing_rerender_does_not_abort_cycle():
+    cycles = []
+    cycled = threading.Event()
+
+    def cycle(token):
+        cycles.append(time.monotonic())
+        cycled.set()
+
+    def rerender(day, token):
+        raise ValueError(f"time data {day!r} does not match format '%Y-%m-%d'")
+
+    engine = SyncEngine(interval=3600, cycle=cycle, rerender=rerender, push=False, watch=False)
+    engine.start()
+    try:
+        assert cycled.wait(10)
+        assert wait_for(lambda: not engine.busy)
+        cycled.clear()
+        assert engine.request_rerender("2025-13-45")
+        # the cycle after the failed re-render still runs
+        assert cycled.wait(10)
+        assert engine.pending_rerenders == []
+    finally:
+        engine.stop()
+        engine.join(10)
@@ -12,6 +12,7 @@ class ModernUI:
         - report_btn
         - open_reports_btn
         - open_last_btn
+        - import_btn
         - interval_entry
         - notifications_switch
         - progress
@@ -109,6 +110,7 @@ class ModernUI:
 
         # internal pulse state
         self._pulse_phase = 0
+        self._pulse_job = None
         self._start_status_pulse_loop()
 
         # =========================
@@ -373,7 +375,18 @@ class ModernUI:
             fg_color="#1f2937",
             hover_color="#111827"
         )
-        self.open_last_btn.pack(fill="x", padx=16, pady=(6, 14))
+        self.open_last_btn.pack(fill="x", padx=16, pady=6)
+
+        self.import_btn = ctk.CTkButton(
+            right_panel,
+            text="📥  Import Exported Records",
+            font=("Segoe UI", 12),
+            corner_radius=999,
+            height=34,
+            fg_color="#1f2937",
+            hover_color="#111827"
+        )
+        self.import_btn.pack(fill="x", padx=16, pady=(6, 14))
 
         hint_label = ctk.CTkLabel(
             right_panel,
@@ -402,6 +415,16 @@ class ModernUI:
     def _start_status_pulse_loop(self):
         self._animate_status_pill()
 
+    def pause_animations(self):
+        """Stop the pill pulse timer (window hidden / minimized)."""
+        if self._pulse_job is not None:
+            self.root.after_cancel(self._pulse_job)
+            self._pulse_job = None
+
+    def resume_animations(self):
+        if self._pulse_job is None:
+            self._animate_status_pill()
+
     def _animate_status_pill(self):
         """
         Pulse when 'Running' — purple/blue glow.
@@ -425,7 +448,7 @@ class ModernUI:
             self.status_pill.configure(text_color="#f97373")
 
         # schedule the next animation frame
-        self.root.after(100, self._animate_status_pill)
+        self._pulse_job = self.root.after(100, self._animate_status_pill)
 
 
     def _add_custom_title_bar(self):
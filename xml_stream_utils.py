@@ -0,0 +1,277 @@
+import re
+import zipfile
+from lxml import etree
+from logger import log, debug
+from config import EMU_PER_PIXEL
+from xml_utils import MediaWriter, RelationshipRegistry, ensure_content_type_defaults, build_drawing_xml
+from xml_utils import zip_info, member_sort_key, CONTENT_TYPES, NSMAP
+from xml_utils import paragraph_text, clear_runs, split_candidates, FALLBACK_WIDTH_EMU
+from cancel_utils import check_cancelled
+
+# Streaming render of the word/*.xml parts of a report.
+#
+# A part is read from the template zip in CHUNK_SIZE pieces and cut at the
+# end of every top-level <w:p> element. Each paragraph is parsed on its own
+# (wrapped in an element carrying the part's namespace declarations), gets
+# the same treatment the python-docx passes give it (text replacement that
+# collapses the runs, Arial 11 on document runs, picture fallback) plus the
+# string replacements of inject_images_into_members, and is written straight
+# into the output zip entry. Markup between paragraphs (table, row and cell
+# tags, sectPr) only gets the string replacements. Memory therefore follows
+# the largest paragraph, not the size of document.xml.
+
+CHUNK_SIZE = 64 * 1024
+
+W = "{%s}" % NSMAP["w"]
+XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+_P_TOKEN = re.compile(rb"<w:p[ >/]|</w:p>")
+_ROOT_TAG = re.compile(rb"<w:(?:document|hdr|ftr)\b[^>]*>")
+_XMLNS = re.compile(rb'\sxmlns(?::[\w.-]+)?="[^"]*"')
+
+# python-docx passes the report has always used: text + arial on the
+# document, text only on headers/footers, nothing on other parts
+_TEXT_PARTS = re.compile(r"^word/(document|header\d*|footer\d*)\.xml$")
+
+# CT_RPr child order (python-docx inserts font and size in schema order too)
+_RPR_ORDER = [
+    "rStyle", "rFonts", "b", "bCs", "i", "iCs", "caps", "smallCaps", "strike", "dstrike",
+    "outline", "shadow", "emboss", "imprint", "noProof", "snapToGrid", "vanish", "webHidden",
+    "color", "spacing", "w", "kern", "position", "sz", "szCs", "highlight", "u", "effect",
+    "bdr", "shd", "fitText", "vertAlign", "rtl", "cs", "em", "lang", "eastAsianLayout",
+    "specVanish", "oMath",
+]
+
+
+def iter_paragraph_segments(stream, chunk_size=CHUNK_SIZE):
+    """
+    Yields (markup, paragraph) byte pairs from an XML part: whatever precedes
+    a top-level w:p and that paragraph. The last pair is (tail, b"").
+    """
+    buf = b""
+    scan = 0
+    depth = 0
+    para_start = None
+    while True:
+        chunk = stream.read(chunk_size)
+        buf += chunk
+        pos = scan
+        waiting = False
+        while True:
+            m = _P_TOKEN.search(buf, pos)
+            if not m:
+                break
+            if m.group().startswith(b"</"):
+                depth -= 1
+                pos = m.end()
+                if depth == 0:
+                    yield buf[:para_start], buf[para_start:pos]
+                    buf = buf[pos:]
+                    pos = 0
+                    para_start = None
+                continue
+            end = buf.find(b">", m.start())
+            if end == -1:
+                # the start tag continues in the next chunk
+                pos = m.start()
+                waiting = True
+                break
+            if buf[end - 1:end] != b"/":
+                if depth == 0:
+                    para_start = m.start()
+                depth += 1
+            pos = end + 1
+        if not chunk:
+            yield buf, b""
+            return
+        # a token may be cut by the chunk boundary; look at the last bytes again
+        scan = pos if waiting else max(pos, len(buf) - 5)
+
+
+def _add_text_run(p, text):
+    r = etree.SubElement(p, W + "r")
+    t = etree.SubElement(r, W + "t")
+    t.text = text
+    if text != text.strip():
+        t.set(XML_SPACE, "preserve")
+    return r
+
+
+def _rpr_child(rpr, tag):
+    el = rpr.find(W + tag)
+    if el is not None:
+        return el
+    el = etree.Element(W + tag)
+    rank = _RPR_ORDER.index(tag)
+    for i, child in enumerate(rpr):
+        name = etree.QName(child).localname
+        if name in _RPR_ORDER and _RPR_ORDER.index(name) > rank:
+            rpr.insert(i, el)
+            return el
+    rpr.append(el)
+    return el
+
+
+def _force_arial(p, half_points=22):
+    for r in p.findall(W + "r"):
+        rpr = r.find(W + "rPr")
+        if rpr is None:
+            rpr = etree.Element(W + "rPr")
+            r.insert(0, rpr)
+        fonts = _rpr_child(rpr, "rFonts")
+        for attr in ("ascii", "hAnsi", "eastAsia"):
+            fonts.set(W + attr, "Arial")
+        _rpr_child(rpr, "sz").set(W + "val", str(half_points))
+
+
+class StreamRenderer:
+    """
+    Renders the word/*.xml parts of one report from a template zip into an
+    output zip. mapping is the python-docx text mapping, xml_mapping the
+    string replacements for the raw XML and images placeholder -> bytes.
+    """
+
+    def __init__(self, mapping, xml_mapping, images, media_writer, relationships, cancel=None):
+        self.mapping = mapping
+        self.xml_mapping = xml_mapping
+        self.images = images
+        self.media_writer = media_writer
+        self.relationships = relationships
+        self.cancel = cancel
+        self._media = {}
+        self._missing_logged = set()
+        self._wrap_open = b"<wrap>"
+        self.paragraphs = 0
+
+    # -- paragraph passes --
+    def _tree_pass(self, para, arial):
+        wrap = etree.fromstring(self._wrap_open + para + b"</wrap>")
+        for p in wrap.iter(W + "p"):
+            text = paragraph_text(p)
+            for key, val in self.mapping.items():
+                if key in text:
+                    text = text.replace(key, str(val))
+                    clear_runs(p)
+                    _add_text_run(p, text)
+                    text = paragraph_text(p)
+            if arial:
+                _force_arial(p)
+        return self._unwrap(wrap)
+
+    def _unwrap(self, wrap):
+        out = etree.tostring(wrap, encoding="UTF-8", xml_declaration=False)
+        return out[out.index(b">") + 1:-len(b"</wrap>")]
+
+    def _media_for(self, placeholder):
+        if placeholder not in self._media:
+            self._media[placeholder] = self.media_writer.add_bytes(self.images[placeholder])
+        return self._media[placeholder]
+
+    def _string_pass(self, part_name, txt):
+        for tkey, tval in self.xml_mapping.items():
+            if tkey in txt:
+                txt = txt.replace(tkey, str(tval))
+        for placeholder, img_data in self.images.items():
+            if placeholder not in txt:
+                continue
+            if not img_data:
+                if placeholder not in self._missing_logged:
+                    self._missing_logged.add(placeholder)
+                    log(f"Image missing for placeholder {placeholder}")
+                continue
+            try:
+                media_fname, w_px, h_px = self._media_for(placeholder)
+                rid = self.relationships.image_rel(part_name, media_fname)
+            except Exception as e:
+                log(f"Failed adding image for {placeholder}: {e}")
+                continue
+            txt = txt.replace(placeholder, build_drawing_xml(rid, int(w_px * EMU_PER_PIXEL), int(h_px * EMU_PER_PIXEL)))
+        return txt
+
+    def _fallback_pass(self, part_name, para):
+        """Pictures for placeholders split by whitespace or runs (insert_image_at_placeholder)."""
+        pending = split_candidates(para, [ph for ph, data in self.images.items() if data])
+        if not pending:
+            return para
+        wrap = etree.fromstring(self._wrap_open + para + b"</wrap>")
+        changed = False
+        for p in wrap.iter(W + "p"):
+            clean = "".join(paragraph_text(p).split())
+            for placeholder in pending:
+                if placeholder not in clean:
+                    continue
+                try:
+                    media_fname, w_px, h_px = self._media_for(placeholder)
+                    rid = self.relationships.image_rel(part_name, media_fname)
+                except Exception as e:
+                    log(f"Image insert failed at {placeholder}: {e}")
+                    continue
+                cy = int(FALLBACK_WIDTH_EMU * h_px / max(1, w_px))
+                clear_runs(p)
+                p.append(etree.fromstring(build_drawing_xml(rid, FALLBACK_WIDTH_EMU, cy)))
+                clean = ""
+                changed = True
+                log(f"Fallback inserted {placeholder} in {part_name}")
+        return self._unwrap(wrap) if changed else para
+
+    # -- parts --
+    def render_part(self, part_name, src, dst):
+        text_part = bool(_TEXT_PARTS.match(part_name))
+        arial = part_name == "word/document.xml"
+        first = True
+        for markup, para in iter_paragraph_segments(src):
+            if first:
+                first = False
+                root = _ROOT_TAG.search(markup)
+                if root:
+                    self._wrap_open = b"<wrap" + b"".join(_XMLNS.findall(root.group())) + b">"
+            dst.write(self._string_pass(part_name, markup.decode("utf-8")).encode("utf-8"))
+            if not para:
+                continue
+            check_cancelled(self.cancel)
+            self.paragraphs += 1
+            if text_part:
+                para = self._tree_pass(para, arial)
+            para = self._string_pass(part_name, para.decode("utf-8")).encode("utf-8")
+            if text_part:
+                para = self._fallback_pass(part_name, para)
+            dst.write(para)
+
+
+def stream_render_docx(template_source, out, mapping, xml_mapping, images, cancel=None):
+    """
+    Writes the rendered report for template_source (path or stream of the
+    template docx) to out (path or writable stream). Output is deterministic
+    (fixed member order and timestamps). Returns the StreamRenderer for its
+    counters.
+    """
+    with zipfile.ZipFile(template_source) as zin, zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zout:
+        names = zin.namelist()
+        media = {}
+        media_writer = MediaWriter(media, names=names)
+        rels = {n: zin.read(n) for n in names if n.startswith("word/") and n.endswith(".rels")}
+        relationships = RelationshipRegistry(rels)
+        renderer = StreamRenderer(mapping, xml_mapping, images, media_writer, relationships, cancel)
+
+        xml_parts = sorted(n for n in names if n.startswith("word/") and n.endswith(".xml"))
+        for name in xml_parts:
+            with zin.open(name) as src, zout.open(zip_info(name), "w") as dst:
+                renderer.render_part(name, src, dst)
+
+        relationships.flush()
+        content_types = {CONTENT_TYPES: zin.read(CONTENT_TYPES)} if CONTENT_TYPES in names else {}
+        if media_writer.written or media_writer.duplicates:
+            ensure_content_type_defaults(content_types, media_writer.extensions)
+            log(f"Media: {media_writer.summary()}")
+
+        rest = (set(names) | set(media) | set(rels)) - set(xml_parts)
+        for name in sorted(rest, key=member_sort_key):
+            for source in (content_types, rels, media):
+                if name in source:
+                    data = source[name]
+                    break
+            else:
+                data = zin.read(name)
+            zout.writestr(zip_info(name), data)
+    debug(f"Streamed {renderer.paragraphs} paragraphs from {len(xml_parts)} XML parts")
+    return renderer
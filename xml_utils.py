@@ -1,16 +1,20 @@
 import os
 import zipfile
-import shutil
-import uuid
+import posixpath
 import re
+import io
+import hashlib
 from lxml import etree
 from PIL import Image
 from logger import log
-from config import MEDIA_EXT, EMU_PER_PIXEL
+from config import MEDIA_EXT, EMU_PER_PIXEL, REPORT_JPEG_QUALITY, REPORT_MAX_IMAGE_PX, REPORT_JPEG_MAX_KB
 
 
 W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
 
+# fixed zip member timestamp (earliest DOS date) for reproducible output
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
 
 NSMAP = {
     'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main',
@@ -115,65 +119,339 @@ def replace_placeholder_across_wt_nodes(xml_bytes, placeholder, drawing_snippet)
     return new_bytes, 1
 
 
+
+# pictures for placeholders split across runs are inserted at this width,
+# like the python-docx fallback of a full render (width_inches=1.8)
+FALLBACK_WIDTH_EMU = int(1.8 * 914400)
+
+_TAG = re.compile(rb"<[^>]*>")
+
+
+def paragraph_text(p):
+    """Joined w:t text of paragraph p as python-docx sees it (runs and hyperlink runs)."""
+    return "".join(t.text or "" for t in p.xpath("w:r/w:t|w:hyperlink/w:r/w:t", namespaces=NSMAP))
+
+
+def clear_runs(p):
+    """Empties the runs of p, keeping their formatting."""
+    for r in p.findall(W_NS + "r"):
+        for child in list(r):
+            if child.tag != W_NS + "rPr":
+                r.remove(child)
+
+
+def split_candidates(xml_bytes, placeholders):
+    """Placeholders present in the tag-stripped, whitespace-free text of an XML part."""
+    text = b"".join(_TAG.sub(b"", xml_bytes).split())
+    return [ph for ph in placeholders if ph.encode("utf-8") in text]
+
+
+def replace_split_placeholders(xml_bytes, placeholders, drawing_for):
+    """
+    Pictures for placeholders whose text is split over several runs (or
+    spread by whitespace) in one paragraph, which a plain string replace
+    cannot see. The joined w:t text of each paragraph is matched; a match
+    clears the paragraph's runs and appends the drawing, as the python-docx
+    fallback of a full render does. drawing_for(placeholder) returns the
+    drawing XML, or None to leave the placeholder. Returns (xml bytes,
+    placeholders inserted).
+    """
+    pending = split_candidates(xml_bytes, placeholders)
+    if not pending:
+        return xml_bytes, []
+    root = etree.fromstring(xml_bytes)
+    inserted = []
+    for p in root.iter(W_NS + "p"):
+        clean = "".join(paragraph_text(p).split())
+        for placeholder in pending:
+            if placeholder not in clean:
+                continue
+            drawing = drawing_for(placeholder)
+            if drawing is None:
+                continue
+            clear_runs(p)
+            p.append(etree.fromstring(drawing))
+            clean = ""
+            inserted.append(placeholder)
+    if not inserted:
+        return xml_bytes, []
+    return etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True), inserted
+
+
+def placeholders_in_paragraphs(members, placeholders):
+    """Placeholders still in the visible text of word/*.xml, split across runs or not."""
+    found = set()
+    for name in sorted(n for n in members if n.startswith("word/") and n.endswith(".xml")):
+        pending = [ph for ph in split_candidates(members[name], placeholders) if ph not in found]
+        if not pending:
+            continue
+        root = etree.fromstring(members[name])
+        for p in root.iter(W_NS + "p"):
+            clean = "".join(paragraph_text(p).split())
+            found.update(ph for ph in pending if ph in clean)
+    return found
+
+def member_sort_key(name):
+    # [Content_Types].xml first, then package rels, then everything by name
+    if name == "[Content_Types].xml":
+        return (0, name)
+    if name.startswith("_rels/"):
+        return (1, name)
+    return (2, name)
+
+
+def zip_info(arcname):
+    info = zipfile.ZipInfo(arcname, date_time=ZIP_EPOCH)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.external_attr = 0o644 << 16
+    return info
+
+
+def write_docx_members(output_docx, members):
+    """
+    Write (arcname, bytes) pairs as a docx zip with a fixed timestamp and a
+    stable member order, so identical inputs give byte-identical files.
+    """
+    with zipfile.ZipFile(output_docx, 'w', zipfile.ZIP_DEFLATED) as zout:
+        for arcname, data in sorted(members, key=lambda m: member_sort_key(m[0])):
+            zout.writestr(zip_info(arcname), data)
+
+
+def normalize_docx_zip(docx_path):
+    """Rewrite an existing docx (e.g. one saved by python-docx) deterministically."""
+    with zipfile.ZipFile(docx_path, 'r') as zin:
+        members = [(name, zin.read(name)) for name in zin.namelist()]
+    tmp_path = docx_path + ".norm"
+    write_docx_members(tmp_path, members)
+    os.replace(tmp_path, docx_path)
+
+
 def ensure_dir(path):
     if not os.path.exists(path):
         os.makedirs(path, exist_ok=True)
 
-def next_media_name(media_dir):
-    existing = set(os.listdir(media_dir)) if os.path.exists(media_dir) else set()
-    i = 1
-    while True:
-        name = f"image{i:03d}{MEDIA_EXT}"
-        if name not in existing:
-            return name
-        i += 1
-
-def add_image_file_to_media(tmpdir, image_src):
-    media_dir = os.path.join(tmpdir, "word", "media")
-    ensure_dir(media_dir)
-    fname = next_media_name(media_dir)
-    out_path = os.path.join(media_dir, fname)
-    img = Image.open(image_src)
-    try:
-        if MEDIA_EXT.lower() == ".png":
-            img.save(out_path, format="PNG")
+CONTENT_TYPES = "[Content_Types].xml"
+MEDIA_PREFIX = "word/media/"
+
+JPEG_MAGIC = b"\xff\xd8\xff"
+PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+
+# extension -> content type for the media we embed
+MEDIA_CONTENT_TYPES = {
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+}
+
+_MEDIA_NAME_RE = re.compile(r"^image(\d+)\.[A-Za-z0-9]+$")
+
+
+class MediaWriter:
+    """
+    Writes images into word/media of one document being rendered.
+
+    members is the package as an in-memory {name: bytes} dict. Already-encoded
+    JPEG and PNG data is copied byte-for-byte (only the header is read for the
+    pixel size), anything else is converted to MEDIA_EXT. Photos wider or
+    taller than REPORT_MAX_IMAGE_PX, or JPEGs over REPORT_JPEG_MAX_KB, are
+    re-encoded as JPEG at REPORT_JPEG_QUALITY; the drawing keeps the source
+    pixel size, so only resolution changes. Identical images are stored once,
+    keyed by content hash, and names come from a counter.
+    """
+
+    def __init__(self, members, names=None):
+        # names: member names already taken when members holds only new media
+        self.members = members
+        highest = 0
+        for name in (members if names is None else names):
+            if not name.startswith(MEDIA_PREFIX):
+                continue
+            m = _MEDIA_NAME_RE.match(name[len(MEDIA_PREFIX):])
+            if m:
+                highest = max(highest, int(m.group(1)))
+        self._counter = highest
+        self._by_hash = {}
+        self.extensions = set()
+        self.written = 0
+        self.written_bytes = 0
+        self.source_bytes = 0
+        self.duplicates = 0
+        self.duplicate_bytes = 0
+        self.converted = 0
+        self.reencoded = 0
+
+    def _policy_jpeg(self, img, data, ext):
+        """JPEG bytes per the report image policy, or None to embed data as-is."""
+        too_large = max(img.size) > REPORT_MAX_IMAGE_PX
+        too_heavy = ext == "jpeg" and len(data) > REPORT_JPEG_MAX_KB * 1024
+        if not (too_large or too_heavy) or img.mode in ("RGBA", "LA", "P"):
+            return None
+        work = img.convert("RGB")
+        if too_large:
+            work.thumbnail((REPORT_MAX_IMAGE_PX, REPORT_MAX_IMAGE_PX), Image.LANCZOS)
+        buf = io.BytesIO()
+        work.save(buf, "JPEG", quality=REPORT_JPEG_QUALITY, optimize=True)
+        out = buf.getvalue()
+        return out if len(out) < len(data) else None
+
+    def _next_name(self, ext):
+        self._counter += 1
+        return f"image{self._counter:03d}.{ext}"
+
+    def add(self, image_src):
+        """add_bytes() for an image file."""
+        with open(image_src, "rb") as f:
+            return self.add_bytes(f.read())
+
+    def add_bytes(self, data):
+        """Returns (media file name, width px, height px)."""
+        digest = hashlib.sha256(data).hexdigest()
+        if digest in self._by_hash:
+            self.duplicates += 1
+            self.duplicate_bytes += len(data)
+            return self._by_hash[digest]
+
+        if data.startswith(JPEG_MAGIC):
+            ext = "jpeg"
+        elif data.startswith(PNG_MAGIC):
+            ext = "png"
         else:
-            img.save(out_path)
-        w_px, h_px = img.size
-        img.close()
-        return fname, w_px, h_px
-    except Exception as e:
-        img.close()
-        raise
-
-def ensure_rels_file(rels_full):
-    if not os.path.exists(rels_full):
-        root = etree.Element("{http://schemas.openxmlformats.org/package/2006/relationships}Relationships")
-        tree = etree.ElementTree(root)
-        tree.write(rels_full, xml_declaration=True, encoding="utf-8")
-
-def add_image_relationship(rels_full_path, target_media_filename):
-    parser = etree.XMLParser(remove_blank_text=True)
-    tree = etree.parse(rels_full_path, parser)
-    root = tree.getroot()
-    existing_ids = [el.get('Id') for el in root.findall('.//{http://schemas.openxmlformats.org/package/2006/relationships}Relationship')]
-    maxn = 0
-    for eid in existing_ids:
-        if eid and eid.startswith("rId"):
-            try:
-                n = int(eid[3:])
-                if n > maxn:
-                    maxn = n
-            except Exception:
-                pass
-    new_id = f"rId{maxn + 1}"
-    RelTag = "{http://schemas.openxmlformats.org/package/2006/relationships}Relationship"
-    rel = etree.SubElement(root, RelTag)
-    rel.set("Id", new_id)
-    rel.set("Type", "http://schemas.openxmlformats.org/officeDocument/2006/relationships/image")
-    rel.set("Target", "media/" + target_media_filename)
-    tree.write(rels_full_path, xml_declaration=True, encoding="utf-8")
-    return new_id
+            ext = None
+
+        # Image.open only parses the header; size is known without decoding pixels
+        img = Image.open(io.BytesIO(data))
+        try:
+            w_px, h_px = img.size
+            policy = self._policy_jpeg(img, data, ext) if ext else None
+            if policy is not None:
+                ext = "jpeg"
+            fname = self._next_name(ext or MEDIA_EXT.lstrip(".").lower())
+            if policy is not None:
+                out = policy
+                self.reencoded += 1
+            elif ext:
+                out = data
+            else:
+                buf = io.BytesIO()
+                img.save(buf, format=Image.registered_extensions().get(MEDIA_EXT.lower(), "PNG"))
+                out = buf.getvalue()
+                self.converted += 1
+        finally:
+            img.close()
+
+        self.members[MEDIA_PREFIX + fname] = out
+        self.extensions.add(os.path.splitext(fname)[1].lstrip(".").lower())
+        self.written += 1
+        self.written_bytes += len(out)
+        self.source_bytes += len(data)
+        self._by_hash[digest] = (fname, w_px, h_px)
+        return self._by_hash[digest]
+
+    def summary(self):
+        return (f"{self.written} images embedded ({self.written_bytes / 1024:.1f} KB, "
+                f"{self.converted} converted, {self.reencoded} re-encoded), {self.duplicates} duplicates reused "
+                f"({self.duplicate_bytes / 1024:.1f} KB saved)")
+
+
+def ensure_content_type_defaults(members, extensions):
+    """Make sure [Content_Types].xml declares a Default for every media extension used."""
+    content = members.get(CONTENT_TYPES)
+    if not extensions or content is None:
+        return
+    ct_ns = "http://schemas.openxmlformats.org/package/2006/content-types"
+    root = etree.fromstring(content)
+    declared = {el.get("Extension", "").lower() for el in root.findall("{%s}Default" % ct_ns)}
+    missing = [e for e in sorted(extensions) if e not in declared and e in MEDIA_CONTENT_TYPES]
+    if not missing:
+        return
+    for ext in missing:
+        el = etree.Element("{%s}Default" % ct_ns)
+        el.set("Extension", ext)
+        el.set("ContentType", MEDIA_CONTENT_TYPES[ext])
+        root.insert(0, el)
+    members[CONTENT_TYPES] = etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+
+
+REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+IMAGE_REL_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/image"
+
+
+class RelationshipRegistry:
+    """
+    .rels files of the parts touched by one render, kept parsed in memory.
+
+    Each .rels member is parsed at most once, new ids come from a per-part
+    counter, a media target gets a single image relationship per part no
+    matter how many placeholders use it, and flush() stores every changed
+    .rels member once at the end.
+    """
+
+    def __init__(self, members):
+        self.members = members
+        self._parts = {}
+
+    @staticmethod
+    def rels_name_for(part_name):
+        folder, fname = posixpath.split(part_name)
+        return posixpath.join(folder, "_rels", fname + ".rels")
+
+    def _load(self, rels_name):
+        entry = self._parts.get(rels_name)
+        if entry is not None:
+            return entry
+
+        content = self.members.get(rels_name)
+        if content is not None:
+            parser = etree.XMLParser(remove_blank_text=True)
+            root = etree.fromstring(content, parser)
+        else:
+            root = etree.Element("{%s}Relationships" % REL_NS)
+
+        maxn = 0
+        targets = {}
+        for el in root.findall("{%s}Relationship" % REL_NS):
+            eid = el.get("Id") or ""
+            if eid.startswith("rId"):
+                try:
+                    maxn = max(maxn, int(eid[3:]))
+                except ValueError:
+                    pass
+            if el.get("Type") == IMAGE_REL_TYPE and el.get("TargetMode") != "External":
+                targets.setdefault(el.get("Target"), eid)
+
+        entry = {"root": root, "next": maxn + 1, "targets": targets, "dirty": False}
+        self._parts[rels_name] = entry
+        return entry
+
+    def image_rel(self, part_name, media_fname):
+        """rId of the image relationship from part_name to media/<media_fname>."""
+        entry = self._load(self.rels_name_for(part_name))
+        target = "media/" + media_fname
+        rid = entry["targets"].get(target)
+        if rid:
+            return rid
+
+        rid = f"rId{entry['next']}"
+        entry["next"] += 1
+        rel = etree.SubElement(entry["root"], "{%s}Relationship" % REL_NS)
+        rel.set("Id", rid)
+        rel.set("Type", IMAGE_REL_TYPE)
+        rel.set("Target", target)
+        entry["targets"][target] = rid
+        entry["dirty"] = True
+        return rid
+
+    def flush(self):
+        written = 0
+        for rels_name, entry in self._parts.items():
+            if not entry["dirty"]:
+                continue
+            self.members[rels_name] = etree.tostring(
+                entry["root"], xml_declaration=True, encoding="UTF-8", standalone=True
+            )
+            entry["dirty"] = False
+            written += 1
+        return written
+
 
 def build_drawing_xml(rel_id, cx, cy):
     drawing_xml = f'''
@@ -216,113 +494,140 @@ def build_drawing_xml(rel_id, cx, cy):
     '''
     return " ".join(drawing_xml.split())
 
-def inject_images_into_docx(input_docx, output_docx, placeholder_image_map, text_map=None):
-    if not os.path.exists(input_docx):
-        raise FileNotFoundError("Input docx not found: " + str(input_docx))
-
-    tmpdir = input_docx + "_tmp_" + uuid.uuid4().hex
-    if os.path.exists(tmpdir):
-        shutil.rmtree(tmpdir)
-    os.makedirs(tmpdir)
+def inject_images_into_members(members, placeholder_images, text_map=None):
+    """
+    Replaces text_map keys and image placeholders in every word/*.xml part of
+    members ({name: bytes}, changed in place). placeholder_images maps a
+    placeholder to image bytes, or None when the photo is missing.
+    """
+    added_media = {}
+    media_writer = MediaWriter(members)
+    relationships = RelationshipRegistry(members)
 
-    with zipfile.ZipFile(input_docx, 'r') as zin:
-        zin.extractall(tmpdir)
+    # sorted so media numbering does not depend on zip order
+    for part_name in sorted(n for n in members if n.startswith("word/") and n.endswith(".xml")):
+        try:
+            txt = members[part_name].decode('utf-8')
+        except Exception:
+            continue
 
-    word_dir = os.path.join(tmpdir, "word")
-    ensure_dir(word_dir)
-    media_dir = os.path.join(word_dir, "media")
-    ensure_dir(media_dir)
+        modified = False
 
-    added_media = {}
+        if text_map:
+            for tkey, tval in text_map.items():
+                if tkey in txt:
+                    txt = txt.replace(tkey, str(tval))
+                    modified = True
 
-    for root, dirs, files in os.walk(word_dir):
-        for fname in files:
-            if not fname.endswith(".xml"):
+        for placeholder, img_data in placeholder_images.items():
+            if not placeholder in txt:
                 continue
-            xml_path = os.path.join(root, fname)
-            try:
-                with open(xml_path, 'rb') as f:
-                    txt = f.read().decode('utf-8')
-            except Exception:
+            if not img_data:
+                log(f"Image missing for placeholder {placeholder}")
                 continue
 
-            modified = False
+            if placeholder in added_media:
+                media_fname, w_px, h_px = added_media[placeholder]
+            else:
+                try:
+                    media_fname, w_px, h_px = media_writer.add_bytes(img_data)
+                except Exception as e:
+                    log(f"Failed adding image to media for {placeholder}: {e}")
+                    continue
+                added_media[placeholder] = (media_fname, w_px, h_px)
 
-            if text_map:
-                for tkey, tval in text_map.items():
-                    if tkey in txt:
-                        txt = txt.replace(tkey, str(tval))
-                        modified = True
+            try:
+                rId = relationships.image_rel(part_name, media_fname)
+            except Exception as e:
+                log(f"Failed to add relationship for media {media_fname}: {e}")
+                continue
 
-            for placeholder, img_path in placeholder_image_map.items():
-                if not placeholder in txt:
-                    continue
-                if not img_path or not os.path.exists(img_path):
-                    log(f"Image missing for placeholder {placeholder}: {img_path}")
-                    continue
+            cx = int(w_px * EMU_PER_PIXEL)
+            cy = int(h_px * EMU_PER_PIXEL)
 
-                if img_path in added_media:
-                    media_fname, w_px, h_px = added_media[img_path]
+            drawing_snippet = build_drawing_xml(rId, cx, cy)
+
+            
+            if placeholder in txt:
+                new_txt = txt.replace(placeholder, drawing_snippet)
+                if new_txt != txt:
+                    txt = new_txt
+                    modified = True
                 else:
+                    
                     try:
-                        media_fname, w_px, h_px = add_image_file_to_media(tmpdir, img_path)
+                        new_bytes, replaced = replace_placeholder_across_wt_nodes(txt.encode('utf-8'), placeholder, drawing_snippet)
+                        if replaced:
+                            txt = new_bytes.decode('utf-8')
+                            modified = True
+                            log(f"Performed node-level replacement for placeholder {placeholder} in {part_name}")
                     except Exception as e:
-                        log(f"Failed adding image to media for {img_path}: {e}")
-                        continue
-                    added_media[img_path] = (media_fname, w_px, h_px)
-
-                xml_rel = os.path.relpath(xml_path, tmpdir)
-                rels_path = os.path.join(os.path.dirname(xml_rel), "_rels", os.path.basename(xml_rel) + ".rels")
-                rels_full = os.path.join(tmpdir, rels_path)
-                ensure_dir(os.path.dirname(rels_full))
-                if not os.path.exists(rels_full):
-                    root_rels = etree.Element("{http://schemas.openxmlformats.org/package/2006/relationships}Relationships")
-                    tree = etree.ElementTree(root_rels)
-                    tree.write(rels_full, xml_declaration=True, encoding="utf-8")
+                        log(f"Node-level replacement error for {placeholder} in {part_name}: {e}")
 
-                try:
-                    rId = add_image_relationship(rels_full, media_fname)
-                except Exception as e:
-                    log(f"Failed to add relationship for media {media_fname}: {e}")
-                    continue
+            modified = True
 
-                cx = int(w_px * EMU_PER_PIXEL)
-                cy = int(h_px * EMU_PER_PIXEL)
-
-                drawing_snippet = build_drawing_xml(rId, cx, cy)
-
-                
-                if placeholder in txt:
-                    new_txt = txt.replace(placeholder, drawing_snippet)
-                    if new_txt != txt:
-                        txt = new_txt
-                        modified = True
-                    else:
-                        
-                        try:
-                            new_bytes, replaced = replace_placeholder_across_wt_nodes(txt.encode('utf-8'), placeholder, drawing_snippet)
-                            if replaced:
-                                txt = new_bytes.decode('utf-8')
-                                modified = True
-                                log(f"Performed node-level replacement for placeholder {placeholder} in {xml_path}")
-                        except Exception as e:
-                            log(f"Node-level replacement error for {placeholder} in {xml_path}: {e}")
-
-                modified = True
-
-            if modified:
+        # placeholders split across runs are not in the raw XML as one string
+        split = [ph for ph, data in placeholder_images.items() if data and ph not in txt]
+        if split:
+            def drawing_for(placeholder):
                 try:
-                    with open(xml_path, 'wb') as f:
-                        f.write(txt.encode('utf-8'))
+                    if placeholder not in added_media:
+                        added_media[placeholder] = media_writer.add_bytes(placeholder_images[placeholder])
+                    media_fname, w_px, h_px = added_media[placeholder]
+                    rId = relationships.image_rel(part_name, media_fname)
                 except Exception as e:
-                    log(f"Failed to write xml part {xml_path}: {e}")
+                    log(f"Failed adding image for {placeholder}: {e}")
+                    return None
+                return build_drawing_xml(rId, FALLBACK_WIDTH_EMU, int(FALLBACK_WIDTH_EMU * h_px / max(1, w_px)))
 
-    with zipfile.ZipFile(output_docx, 'w', zipfile.ZIP_DEFLATED) as zout:
-        for foldername, subfolders, filenames in os.walk(tmpdir):
-            for filename in filenames:
-                filepath = os.path.join(foldername, filename)
-                arcname = os.path.relpath(filepath, tmpdir)
-                zout.write(filepath, arcname)
+            try:
+                new_bytes, inserted = replace_split_placeholders(txt.encode('utf-8'), split, drawing_for)
+                if inserted:
+                    txt = new_bytes.decode('utf-8')
+                    modified = True
+                    log(f"Inserted {len(inserted)} split placeholders in {part_name}")
+            except Exception as e:
+                log(f"Split placeholder replacement failed in {part_name}: {e}")
+
+        if modified:
+            members[part_name] = txt.encode('utf-8')
+
+    relationships.flush()
+
+    if media_writer.written or media_writer.duplicates:
+        ensure_content_type_defaults(members, media_writer.extensions)
+        log(f"Media: {media_writer.summary()}")
+    return members
+
+
+def read_docx_members(docx):
+    """{name: bytes} of a docx given as a path, a stream or bytes."""
+    source = io.BytesIO(docx) if isinstance(docx, bytes) else docx
+    with zipfile.ZipFile(source, 'r') as zin:
+        return {name: zin.read(name) for name in zin.namelist()}
+
+
+def pack_docx_members(members):
+    """Deterministic docx bytes of a {name: bytes} package."""
+    buf = io.BytesIO()
+    write_docx_members(buf, members.items())
+    return buf.getvalue()
+
+
+def inject_images_into_docx(input_docx, output_docx, placeholder_image_map, text_map=None):
+    """inject_images_into_members() for files; placeholder_image_map holds image paths."""
+    if not os.path.exists(input_docx):
+        raise FileNotFoundError("Input docx not found: " + str(input_docx))
 
-    shutil.rmtree(tmpdir)
+    members = read_docx_members(input_docx)
+    images = {}
+    for placeholder, img_path in placeholder_image_map.items():
+        if not img_path or not os.path.exists(img_path):
+            images[placeholder] = None
+            continue
+        with open(img_path, 'rb') as f:
+            images[placeholder] = f.read()
+
+    inject_images_into_members(members, images, text_map)
+    write_docx_members(output_docx, members.items())
     return output_docx